@@ -0,0 +1,222 @@
+"""Conciliación por lotes sin Streamlit.
+
+Toma un directorio con pares PARTE_<clave>.* / LISTA_<clave>.xlsx (p. ej. PARTE_2024-05-01_EZE.txt y
+LISTA_2024-05-01_EZE.xlsx), los concilia en un pool de procesos y deja en el directorio de salida
+LIMPIO_/FINAL_ de cada LISTA y un <clave>.json con el resumen del par.
+
+    python batch.py entrada/ --salida salida/ --procesos 4
+    python batch.py entrada/ --multihoja     # todas las hojas de plantel de cada LISTA, repartidas en el pool
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import lru_cache
+from io import BytesIO
+
+from conciliacion import procesar_input, leer_hojas, detectar_duplicados, calcular_analisis, analizar_hojas, separar_resultado, datos_exportacion
+from decisiones import AlmacenDecisiones
+from excel_salida import generar_exportaciones, generar_exportaciones_hojas
+
+EXT_TEXTO = ('.txt', '.tsv')
+EXT_ARCHIVO = ('.xlsx', '.csv')
+
+
+def buscar_pares(directorio):
+    """[(clave, ruta_parte, ruta_lista)] ordenados por clave; los archivos sin pareja se informan y se saltean."""
+    encontrados = {}
+    for nombre in sorted(os.listdir(directorio)):
+        base, ext = os.path.splitext(nombre)
+        if ext.lower() not in EXT_TEXTO + EXT_ARCHIVO: continue
+        tipo = base[:5].upper()
+        if tipo not in ('PARTE', 'LISTA'): continue
+        clave = base[5:].lstrip('_- ')
+        encontrados.setdefault(clave, {})[tipo] = os.path.join(directorio, nombre)
+    pares = []
+    for clave, archivos in sorted(encontrados.items()):
+        if len(archivos) < 2:
+            logging.warning(f"{clave or '(sin clave)'}: falta {'LISTA' if 'PARTE' in archivos else 'PARTE'}, se saltea")
+            continue
+        pares.append((clave, archivos['PARTE'], archivos['LISTA']))
+    return pares
+
+
+def _leer(ruta):
+    """Mismo contrato que los inputs de la app: texto pegado o archivo con .name/.getvalue()."""
+    with open(ruta, 'rb') as f:
+        datos = f.read()
+    if ruta.lower().endswith(EXT_TEXTO): return procesar_input(datos.decode('utf-8-sig'), None), None
+    archivo = BytesIO(datos); archivo.name = os.path.basename(ruta)
+    return procesar_input(None, archivo), datos
+
+
+@lru_cache(maxsize=None)
+def _memoria(ruta):
+    # Una lectura del almacén por proceso del pool, no una por par
+    return AlmacenDecisiones(ruta)
+
+
+def _filas(df, columnas=('Jerarquia', 'Nombre')):
+    return [{c.lower(): str(f[c]) for c in columnas} for f in df]
+
+
+def _resumen_hoja(faltan, sobran, detective):
+    final_verde, final_rojo = separar_resultado(faltan, sobran, detective)
+    return final_verde, final_rojo, {
+        'faltan': _filas(final_verde), 'sobran': _filas(r for _, r in final_rojo.iterrows()),
+        'conflictos': [{'parte': _filas([m['falta']])[0], 'lista': _filas([m['sobra']])[0]} for m in detective],
+    }
+
+
+def conciliar_par(clave, ruta_parte, ruta_lista, salida, umbral_det=65, umbral_auto=95, motor_excel="openpyxl", vectorizado=True, detective_optimo=True, workers=-1, decisiones=None, candidatos=0):
+    """Concilia un par y escribe sus archivos. Devuelve el resumen (el mismo que queda en <clave>.json)."""
+    t0 = time.perf_counter(); ms = {}
+    resumen = {'clave': clave, 'parte': os.path.basename(ruta_parte), 'lista': os.path.basename(ruta_lista), 'error': None}
+    errores = []
+    try:
+        df_p, _ = _leer(ruta_parte)
+        df_l, lista_bytes = _leer(ruta_lista)
+        ms['lectura'] = (time.perf_counter() - t0) * 1000
+        if df_p is None or df_l is None: raise ValueError("Datos no válidos")
+
+        t = time.perf_counter()
+        faltan, sobran, detective, _ = calcular_analisis(df_p, df_l, umbral_det, umbral_auto, vectorizado, detective_optimo, workers=workers, memoria=_memoria(decisiones) if decisiones else None,
+                                                         candidatos=candidatos)
+        final_verde, final_rojo, detalle = _resumen_hoja(faltan, sobran, detective)
+        ms['analisis'] = (time.perf_counter() - t) * 1000
+        resumen.update({'filas_parte': len(df_p), 'filas_lista': len(df_l), **detalle,
+                        'duplicados_parte': detectar_duplicados(df_p, workers=workers), 'duplicados_lista': detectar_duplicados(df_l, workers=workers)})
+
+        if lista_bytes is not None and ruta_lista.lower().endswith('.xlsx'):
+            t = time.perf_counter()
+            borrar, agregar = datos_exportacion(final_verde, final_rojo)
+            personas = [{'Jerarquia': j, 'Nombre': n} for j, n in agregar]
+            limpio, final = generar_exportaciones(BytesIO(lista_bytes), list(borrar), personas, clave=hashlib.sha1(lista_bytes).hexdigest(), motor_excel=motor_excel, avisar=errores.append)
+            for prefijo, datos in (('LIMPIO_', limpio), ('FINAL_', final)):
+                destino = None
+                if datos:
+                    destino = os.path.join(salida, prefijo + os.path.basename(ruta_lista))
+                    with open(destino, 'wb') as f: f.write(datos)
+                resumen[prefijo.rstrip('_').lower()] = destino and os.path.basename(destino)
+            ms['excel'] = (time.perf_counter() - t) * 1000
+    except Exception as e:
+        errores.append(str(e))
+    resumen['error'] = "; ".join(errores) or None
+    ms['total'] = (time.perf_counter() - t0) * 1000
+    resumen['ms'] = {k: round(v, 1) for k, v in ms.items()}
+    with open(os.path.join(salida, f"{clave or 'par'}.json"), 'w', encoding='utf-8') as f:
+        json.dump(resumen, f, ensure_ascii=False, indent=2)
+    return resumen
+
+
+def conciliar_par_hojas(clave, ruta_parte, ruta_lista, salida, pool, umbral_det=65, umbral_auto=95, vectorizado=True, detective_optimo=True, decisiones=None, candidatos=0):
+    """
+    Modo --multihoja: cada hoja con forma de plantel de la LISTA contra el PARTE (o contra su hoja homónima si el
+    PARTE es un xlsx con esas hojas). Las hojas se reparten en `pool`; sale un solo LIMPIO_/FINAL_ con todas corregidas.
+    """
+    t0 = time.perf_counter(); ms = {}
+    resumen = {'clave': clave, 'parte': os.path.basename(ruta_parte), 'lista': os.path.basename(ruta_lista), 'error': None}
+    errores = []
+    try:
+        with open(ruta_lista, 'rb') as f: lista_bytes = f.read()
+        hojas = leer_hojas(lista_bytes, os.path.basename(ruta_lista))
+        parte = None
+        if ruta_parte.lower().endswith('.xlsx'):
+            with open(ruta_parte, 'rb') as f: hojas_parte = dict(leer_hojas(f.read(), os.path.basename(ruta_parte), 'PARTE'))
+            if any(nombre in hojas_parte for nombre, _ in hojas): parte = hojas_parte
+        if parte is None: parte, _ = _leer(ruta_parte)
+        ms['lectura'] = (time.perf_counter() - t0) * 1000
+        if parte is None or not hojas: raise ValueError("Datos no válidos")
+
+        t = time.perf_counter()
+        resultados = analizar_hojas(parte, hojas, umbral_det, umbral_auto, vectorizado, detective_optimo, _memoria(decisiones) if decisiones else None, pool, candidatos)
+        ms['analisis'] = (time.perf_counter() - t) * 1000
+        totales = {nombre: len(df) for nombre, df in hojas}
+        resumen['hojas'] = {}; cambios = {}
+        for nombre, (faltan, sobran, detective) in resultados.items():
+            final_verde, final_rojo, detalle = _resumen_hoja(faltan, sobran, detective)
+            resumen['hojas'][nombre] = {'filas_lista': totales[nombre], **detalle}
+            borrar, agregar = datos_exportacion(final_verde, final_rojo)
+            cambios[nombre] = (list(borrar), [{'Jerarquia': j, 'Nombre': n} for j, n in agregar])
+        resumen['filas_parte'] = sum(len(df) for df in parte.values()) if isinstance(parte, dict) else len(parte)
+        resumen['filas_lista'] = sum(totales.values())
+
+        t = time.perf_counter()
+        limpio, final = generar_exportaciones_hojas(BytesIO(lista_bytes), cambios, clave=hashlib.sha1(lista_bytes).hexdigest(), avisar=errores.append)
+        for prefijo, datos in (('LIMPIO_', limpio), ('FINAL_', final)):
+            destino = None
+            if datos:
+                destino = os.path.join(salida, prefijo + os.path.basename(ruta_lista))
+                with open(destino, 'wb') as f: f.write(datos)
+            resumen[prefijo.rstrip('_').lower()] = destino and os.path.basename(destino)
+        ms['excel'] = (time.perf_counter() - t) * 1000
+    except Exception as e:
+        errores.append(str(e))
+    resumen['error'] = "; ".join(errores) or None
+    ms['total'] = (time.perf_counter() - t0) * 1000
+    resumen['ms'] = {k: round(v, 1) for k, v in ms.items()}
+    with open(os.path.join(salida, f"{clave or 'par'}.json"), 'w', encoding='utf-8') as f:
+        json.dump(resumen, f, ensure_ascii=False, indent=2)
+    return resumen
+
+
+def _estado(r):
+    if r['error']: return f"ERROR: {r['error']}"
+    if 'hojas' in r:
+        return ", ".join(f"{h}: faltan {len(d['faltan'])}, sobran {len(d['sobran'])}, conflictos {len(d['conflictos'])}" for h, d in r['hojas'].items())
+    return f"faltan {len(r['faltan'])}, sobran {len(r['sobran'])}, conflictos {len(r['conflictos'])}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Concilia pares PARTE/LISTA de un directorio sin abrir la app.")
+    parser.add_argument('entrada', help="directorio con PARTE_<clave>.{txt,tsv,csv,xlsx} y LISTA_<clave>.xlsx")
+    parser.add_argument('--salida', help="directorio de salida (por defecto, el de entrada)")
+    parser.add_argument('--procesos', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--umbral-det', type=int, default=65)
+    parser.add_argument('--umbral-auto', type=int, default=95)
+    parser.add_argument('--motor-excel', choices=['openpyxl', 'xml'], default='openpyxl')
+    parser.add_argument('--clasico', action='store_true', help="cálculo fila por fila original (sin motor vectorizado)")
+    parser.add_argument('--multihoja', action='store_true', help="concilia todas las hojas con forma de plantel de cada LISTA (en paralelo) y escribe un solo libro")
+    parser.add_argument('--decisiones', help="SQLite de decisiones guardadas por la app (pares confirmados/rechazados) a aplicar")
+    parser.add_argument('--candidatos', type=int, default=0, metavar='K', help="puntúa solo los K candidatos del índice fonético por nombre (aproximado; 0 = todos)")
+    parser.add_argument('-v', '--verbose', action='store_true')
+    args = parser.parse_args(argv)
+    if args.multihoja and args.motor_excel == 'xml': parser.error("--motor-excel xml no se puede usar con --multihoja (el libro de varias hojas se exporta con openpyxl)")
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+    if not args.verbose: logging.getLogger("control.tiempos").setLevel(logging.WARNING)  # las hojas se miden en los procesos hijos
+
+    salida = args.salida or args.entrada
+    os.makedirs(salida, exist_ok=True)
+    pares = buscar_pares(args.entrada)
+    if not pares:
+        print("No se encontraron pares PARTE/LISTA.", file=sys.stderr)
+        return 1
+
+    opciones = dict(umbral_det=args.umbral_det, umbral_auto=args.umbral_auto, motor_excel=args.motor_excel, vectorizado=not args.clasico, decisiones=args.decisiones, candidatos=args.candidatos,
+                    workers=1 if args.procesos > 1 else -1)  # con varios procesos, rapidfuzz a un hilo por proceso
+    t0 = time.perf_counter(); resumenes = []
+    with ProcessPoolExecutor(max_workers=max(1, args.procesos)) as pool:
+        if args.multihoja:
+            # Los pares van de a uno; lo que se reparte en el pool son las hojas de cada LISTA
+            opciones.pop('motor_excel'); opciones.pop('workers')
+            resultados = (conciliar_par_hojas(clave, parte, lista, salida, pool if args.procesos > 1 else None, **opciones) for clave, parte, lista in pares)
+        else:
+            resultados = (f.result() for f in as_completed([pool.submit(conciliar_par, clave, parte, lista, salida, **opciones) for clave, parte, lista in pares]))
+        for r in resultados:
+            resumenes.append(r)
+            print(f"[{len(resumenes)}/{len(pares)}] {r['clave']}: {_estado(r)} ({r['ms']['total']:.0f} ms)")
+
+    segundos = time.perf_counter() - t0
+    filas = sum(r.get('filas_parte', 0) + r.get('filas_lista', 0) for r in resumenes)
+    errores = sum(1 for r in resumenes if r['error'])
+    print(f"{len(resumenes)} pares ({errores} con error), {filas} filas en {segundos:.2f} s: "
+          f"{len(resumenes) / segundos:.2f} pares/s, {filas / segundos:.0f} filas/s")
+    return 1 if errores else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,82 @@
+"""Tiempo de arranque en frío de la app: primer render de main.py en un proceso nuevo, sin datos cargados.
+
+    python -m bench.arranque                       # JSON a stdout (mismo formato que bench.correr)
+    python -m bench.arranque -r 5 -o arranque.json
+    python -m bench.correr --comparar base.json arranque.json
+
+Cada repetición corre en un intérprete nuevo (como un contenedor recién levantado): se mide la importación
+de los módulos de main.py más la primera ejecución del script, y qué dependencias pesadas cargó ese render. El hilo
+de precarga del núcleo no se arranca en esta medición (correría en paralelo y ensuciaría la lista): ninguna de
+PESADOS debería aparecer. Aparte se mide cuánto tarda esa precarga.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timezone
+
+from bench.correr import _commit
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PESADOS = ('numpy', 'pandas', 'openpyxl', 'scipy', 'rapidfuzz', 'thefuzz', 'motor', 'conciliacion', 'excel_salida')
+
+_PRIMER_RENDER = """
+import json, sys, threading, time
+from streamlit.testing.v1 import AppTest
+precarga = []; arrancar = threading.Thread.start
+def start(hilo):
+    if hilo.name == 'precarga': precarga.append(True)
+    else: arrancar(hilo)
+threading.Thread.start = start
+at = AppTest.from_file('main.py', default_timeout=120)
+t0 = time.perf_counter(); at.run(); ms = (time.perf_counter() - t0) * 1000
+print(json.dumps({'ms': ms, 'error': [str(e.value) for e in at.exception], 'cargados': [m for m in %r if m in sys.modules], 'precarga': bool(precarga)}))
+""" % (PESADOS,)
+
+_PRECARGA = """
+import json, time
+t0 = time.perf_counter(); import conciliacion, excel_salida; print(json.dumps({'ms': (time.perf_counter() - t0) * 1000}))
+"""
+
+
+def _en_proceso_nuevo(codigo):
+    entorno = dict(os.environ, CONTROL_PSA_DECISIONES=os.path.join(tempfile.mkdtemp(), "decisiones.sqlite3"))
+    salida = subprocess.run([sys.executable, '-c', codigo], cwd=RAIZ, env=entorno, capture_output=True, text=True, check=True).stdout
+    return json.loads(salida.strip().splitlines()[-1])
+
+
+def correr(repeticiones=3, progreso=None):
+    """Lista de resultados {'filas', 'etapa', 'ms', 'ms_min', 'ms_mediana', 'detalle'} (filas = 0: no hay datos)."""
+    resultados = []
+    for etapa, codigo in (('primer_render', _PRIMER_RENDER), ('precarga_nucleo', _PRECARGA)):
+        corridas = [_en_proceso_nuevo(codigo) for _ in range(repeticiones)]
+        tiempos = [c['ms'] for c in corridas]
+        detalle = {k: v for k, v in corridas[-1].items() if k != 'ms'}
+        resultados.append({'filas': 0, 'etapa': etapa, 'ms': [round(t, 2) for t in tiempos], 'ms_min': round(min(tiempos), 2),
+                           'ms_mediana': round(statistics.median(tiempos), 2), 'detalle': detalle})
+        if progreso: progreso(f"{etapa:<24} {min(tiempos):>10.1f} ms  {detalle or ''}")
+    return resultados
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument('-r', '--repeticiones', type=int, default=3)
+    parser.add_argument('-o', '--salida', help="archivo JSON (por defecto, stdout)")
+    args = parser.parse_args(argv)
+
+    resultados = correr(args.repeticiones, progreso=lambda m: print(m, file=sys.stderr))
+    informe = {'commit': _commit(), 'fecha': datetime.now(timezone.utc).isoformat(timespec='seconds'), 'python': platform.python_version(),
+               'plataforma': platform.platform(), 'repeticiones': args.repeticiones, 'resultados': resultados}
+    texto = json.dumps(informe, ensure_ascii=False, indent=2)
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f: f.write(texto)
+    else: print(texto)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
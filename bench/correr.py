@@ -0,0 +1,113 @@
+"""Benchmark de las etapas de "ANALIZAR AHORA" y de las descargas, sobre datos sintéticos.
+
+    python -m bench.correr                          # 100 / 1k / 10k / 50k filas, JSON a stdout
+    python -m bench.correr -n 100 1000 -o base.json
+    python -m bench.correr --comparar base.json nuevo.json
+
+Cada etapa se mide por separado (mejor de --repeticiones corridas) y el resultado lleva el commit,
+para poder comparar corridas entre commits.
+"""
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from io import BytesIO
+
+from bench.generador import generar_par, libro_lista
+from conciliacion import procesar_input, calcular_analisis, separar_resultado, datos_exportacion
+from excel_salida import borrar_sobrantes_excel, generar_excel_completo
+
+TAMANOS = (100, 1000, 10000, 50000)
+
+
+def _archivo(datos, nombre):
+    """Lo mínimo de un UploadedFile de Streamlit: .name y .getvalue()."""
+    archivo = BytesIO(datos); archivo.name = nombre
+    return archivo
+
+
+def _medir(funcion, repeticiones):
+    tiempos = []; resultado = None
+    for _ in range(repeticiones):
+        t0 = time.perf_counter(); resultado = funcion(); tiempos.append((time.perf_counter() - t0) * 1000)
+    return resultado, tiempos
+
+
+def _commit():
+    try: return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError): return None
+
+
+def correr(tamanos=TAMANOS, repeticiones=3, semilla=0, vectorizado=True, detective_optimo=True, progreso=None, candidatos=0):
+    """Lista de resultados {'filas', 'etapa', 'ms', 'ms_min', 'ms_mediana', 'detalle'} por tamaño y etapa."""
+    resultados = []
+    for n in tamanos:
+        texto_parte, personas = generar_par(n, semilla)
+        lista_bytes = libro_lista(personas, semilla=semilla)
+
+        def anotar(etapa, tiempos, **detalle):
+            resultados.append({'filas': n, 'etapa': etapa, 'ms': [round(t, 2) for t in tiempos], 'ms_min': round(min(tiempos), 2),
+                               'ms_mediana': round(statistics.median(tiempos), 2), 'detalle': detalle})
+            if progreso: progreso(f"{n:>6} {etapa:<24} {min(tiempos):>10.1f} ms")
+
+        df_p, t = _medir(lambda: procesar_input(texto_parte, None), repeticiones)
+        anotar('procesar_input_parte', t, filas_validas=len(df_p))
+        df_l, t = _medir(lambda: procesar_input(None, _archivo(lista_bytes, 'LISTA.xlsx')), repeticiones)
+        anotar('procesar_input_lista', t, filas_validas=len(df_l), bytes=len(lista_bytes))
+
+        (faltan, sobran, detective, _), t = _medir(lambda: calcular_analisis(df_p, df_l, 65, 95, vectorizado, detective_optimo, candidatos=candidatos), repeticiones)
+        final_verde, final_rojo = separar_resultado(faltan, sobran, detective)
+        anotar('calcular_analisis', t, faltan=len(final_verde), sobran=len(final_rojo), conflictos=len(detective))
+
+        borrar, agregar = datos_exportacion(final_verde, final_rojo)
+        personas_agregar = [{'Jerarquia': j, 'Nombre': nm} for j, nm in agregar]
+        salida, t = _medir(lambda: borrar_sobrantes_excel(BytesIO(lista_bytes), list(borrar)), repeticiones)
+        anotar('borrar_sobrantes_excel', t, borrar=len(borrar), ok=salida is not None)
+        salida, t = _medir(lambda: generar_excel_completo(BytesIO(lista_bytes), list(borrar), personas_agregar), repeticiones)
+        anotar('generar_excel_completo', t, borrar=len(borrar), agregar=len(agregar), ok=salida is not None)
+    return resultados
+
+
+def comparar(base, nuevo):
+    """Tabla texto con ms_min de cada (filas, etapa) en ambas corridas y la razón nuevo/base."""
+    previos = {(r['filas'], r['etapa']): r['ms_min'] for r in base['resultados']}
+    lineas = [f"{'filas':>6} {'etapa':<24} {base.get('commit') or 'base':>10} {nuevo.get('commit') or 'nuevo':>10}  razón"]
+    for r in nuevo['resultados']:
+        antes = previos.get((r['filas'], r['etapa']))
+        if antes is None: continue
+        lineas.append(f"{r['filas']:>6} {r['etapa']:<24} {antes:>10.1f} {r['ms_min']:>10.1f}  {r['ms_min'] / antes if antes else float('nan'):.2f}x")
+    return "\n".join(lineas)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument('-n', '--tamanos', type=int, nargs='+', default=list(TAMANOS))
+    parser.add_argument('-r', '--repeticiones', type=int, default=3)
+    parser.add_argument('--semilla', type=int, default=0)
+    parser.add_argument('--clasico', action='store_true', help="motor fila por fila original")
+    parser.add_argument('--candidatos', type=int, default=0, metavar='K', help="índice fonético con K candidatos por nombre (ver bench.recall)")
+    parser.add_argument('-o', '--salida', help="archivo JSON (por defecto, stdout)")
+    parser.add_argument('--comparar', nargs=2, metavar=('BASE', 'NUEVO'), help="compara dos corridas guardadas")
+    args = parser.parse_args(argv)
+
+    if args.comparar:
+        with open(args.comparar[0]) as a, open(args.comparar[1]) as b: print(comparar(json.load(a), json.load(b)))
+        return 0
+
+    resultados = correr(args.tamanos, args.repeticiones, args.semilla, not args.clasico, progreso=lambda m: print(m, file=sys.stderr),
+                        candidatos=args.candidatos)
+    informe = {'commit': _commit(), 'fecha': datetime.now(timezone.utc).isoformat(timespec='seconds'), 'python': platform.python_version(),
+               'plataforma': platform.platform(), 'repeticiones': args.repeticiones, 'semilla': args.semilla, 'resultados': resultados}
+    texto = json.dumps(informe, ensure_ascii=False, indent=2)
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f: f.write(texto)
+    else: print(texto)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
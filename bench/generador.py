@@ -0,0 +1,96 @@
+"""Generador de planteles sintéticos para los benchmarks: texto de PARTE y libro LISTA con la forma de los reales."""
+import random
+from io import BytesIO
+
+import openpyxl
+from openpyxl.styles import Alignment, Border, Font, PatternFill, Side
+
+from normalizacion import EQUIVALENCIAS
+
+NOMBRES = ["JUAN", "PEDRO", "MARÍA", "JOSÉ", "LUIS", "ANA", "CARLOS", "SOFÍA", "MIGUEL", "LAURA", "DIEGO", "MARTÍN",
+           "LUCÍA", "RAÚL", "INÉS", "GERMÁN", "NICOLÁS", "VALERIA", "ROCÍO", "JOAQUÍN", "FLORENCIA", "IVÁN"]
+APELLIDOS = ["PÉREZ", "GÓMEZ", "GONZÁLEZ", "RODRÍGUEZ", "FERNÁNDEZ", "LÓPEZ", "MARTÍNEZ", "SÁNCHEZ", "ROMERO", "SOSA",
+             "BENÍTEZ", "ÁLVAREZ", "MUÑOZ", "PEÑA", "ACUÑA", "IBÁÑEZ", "DÍAZ", "TORRES", "RUIZ", "GIMÉNEZ", "QUIROGA",
+             "CASTRO", "MOLINA", "ORTIZ", "SILVA", "NÚÑEZ", "ROJAS", "MÉNDEZ", "AGÜERO", "VILLALBA"]
+NOTAS = ["(FRANCO)", "(LIC)", "(CURSO)", "(ART)", "(COMISIÓN)", "(TARDE)"]
+JERARQUIAS = sorted(set(EQUIVALENCIAS.values()))
+GRAFIAS = {j: [k for k, v in EQUIVALENCIAS.items() if v == j] for j in JERARQUIAS}  # todas las formas de escribir cada jerarquía
+
+# Proporciones de cada caso entre los que están en ambos lados
+P_SOLO_PARTE, P_SOLO_LISTA, P_TYPO, P_INVERTIDO, P_SIN_ACENTOS, P_NOTA = 0.07, 0.08, 0.08, 0.04, 0.3, 0.05
+
+
+def _grafia(r, jerarquia):
+    g = r.choice(GRAFIAS[jerarquia])
+    return r.choice([g, g.upper(), g.title()])
+
+
+def _typo(r, nombre):
+    i = r.randrange(len(nombre))
+    return r.choice([nombre[:i] + nombre[i + 1:], nombre[:i] + nombre[i:i + 2][::-1] + nombre[i + 2:]])
+
+
+def _sin_acentos(nombre):
+    return nombre.translate(str.maketrans("ÁÉÍÓÚÜ", "AEIOUU"))
+
+
+def plantel(n, semilla=0):
+    """n personas (jerarquía canónica, nombre) con repeticiones de apellidos como en una base real."""
+    r = random.Random(semilla)
+    def nombre():
+        nombres = r.sample(NOMBRES, 2) if r.random() < 0.6 else [r.choice(NOMBRES)]  # segundo nombre en la mayoría
+        return " ".join([r.choice(APELLIDOS), r.choice(APELLIDOS)] + nombres)
+    return [(r.choice(JERARQUIAS), nombre()) for _ in range(n)]
+
+
+def generar_par(n, semilla=0):
+    """
+    (texto_parte, personas_lista): el PARTE como texto tabulado (como se pega en la app) y las filas
+    de la LISTA, con distintas grafías de jerarquía, acentos, notas entre paréntesis, typos y altas/bajas.
+    """
+    r = random.Random(semilla)
+    parte, lista = [], []
+    for jerarquia, nombre in plantel(n, semilla):
+        x = r.random()
+        if x < P_SOLO_PARTE: parte.append((_grafia(r, jerarquia), nombre)); continue
+        if x < P_SOLO_PARTE + P_SOLO_LISTA: lista.append((jerarquia, nombre)); continue
+        en_lista = nombre
+        y = r.random()
+        if y < P_TYPO: en_lista = _typo(r, nombre)
+        elif y < P_TYPO + P_INVERTIDO: en_lista = " ".join(reversed(nombre.split()))
+        en_parte = _sin_acentos(nombre) if r.random() < P_SIN_ACENTOS else nombre
+        if r.random() < P_NOTA: en_parte = f"{en_parte} {r.choice(NOTAS)}"
+        parte.append((_grafia(r, jerarquia), en_parte)); lista.append((jerarquia, en_lista))
+    r.shuffle(parte)
+    return "\n".join(f"{j}\t{nm}" for j, nm in parte), lista
+
+
+def libro_lista(personas, arribos=12, semilla=0):
+    """Bytes de un xlsx con hoja LISTA: título combinado, nombres en celdas combinadas, bordes y sección ARRIBO A2."""
+    r = random.Random(semilla)
+    wb = openpyxl.Workbook(); ws = wb.active; ws.title = "LISTA"
+    fino = Side(style="thin"); borde = Border(left=fino, right=fino, top=fino, bottom=fino)
+    ws["A1"] = "LISTA DE GUARDIA"; ws["A1"].font = Font(bold=True, size=14); ws.merge_cells("A1:F1")
+    ws["A2"] = "SERVICIO"; ws.merge_cells("A2:F2")
+    for col, titulo in enumerate(["Nº", "JERARQUÍA", "APELLIDO Y NOMBRE", "", "FUNCIÓN", "OBS"], start=1):
+        c = ws.cell(3, col, titulo or None); c.font = Font(bold=True); c.border = borde
+        c.fill = PatternFill(fill_type="solid", fgColor="FFD9D9D9")
+    ws.merge_cells("C3:D3")
+
+    def fila(num, orden, jerarquia, nombre):
+        valores = [orden, jerarquia, nombre, None, r.choice(["PUESTO 1", "PUESTO 2", "RAYOS", "PLATAFORMA", None]), None]
+        for col, v in enumerate(valores, start=1):
+            c = ws.cell(num, col, v); c.border = borde; c.font = Font(name="Arial", size=10)
+        ws.cell(num, 3).alignment = Alignment(horizontal="left")
+        ws.merge_cells(start_row=num, start_column=3, end_row=num, end_column=4)
+        ws.row_dimensions[num].height = 15
+
+    num = 4
+    for i, (jerarquia, nombre) in enumerate(personas[:len(personas) - arribos]):
+        fila(num, i + 1, jerarquia, nombre); num += 1
+    ws.cell(num, 1, "ARRIBO A2").font = Font(bold=True); ws.merge_cells(start_row=num, start_column=1, end_row=num, end_column=6)
+    num += 1
+    for i, (jerarquia, nombre) in enumerate(personas[len(personas) - arribos:]):
+        fila(num, i + 1, jerarquia, nombre); num += 1
+    salida = BytesIO(); wb.save(salida)
+    return salida.getvalue()
@@ -0,0 +1,328 @@
+"""Núcleo de la conciliación PARTE ↔ LISTA, sin Streamlit.
+
+La app (main.py) y el procesamiento por lotes (batch.py) usan estas mismas funciones;
+las decisiones del operador (pares confirmados/rechazados) se pasan explícitamente.
+"""
+import logging
+from concurrent.futures import FIRST_COMPLETED, wait
+from io import StringIO
+
+import numpy as np
+import pandas as pd
+
+import motor
+from decisiones import IndiceDecisiones, huellas
+import medicion
+from medicion import etapa
+from trabajos import avance, tramo
+from delta import CorridaPrevia
+from resultado import ResultadoAnalisis
+from excel_lista import cargar_hojas_xlsx, cargar_lista_xlsx
+from normalizacion import normalizar_jerarquias, limpiar_nombre, limpiar_nombres
+
+# --- LECTURA ---
+def leer_excel_inteligente(archivo_bytes, filename, info=None):
+    """DataFrame ['Jerarquia', 'Nombre'] de la hoja LISTA; si se pasa `info` (dict) se completa con los datos de la carga."""
+    try:
+        df, info_carga = cargar_lista_xlsx(archivo_bytes)
+        logging.info(f"Carga {filename}: hoja={info_carga['hoja']} filas={info_carga['filas_leidas']} {info_carga['ms']:.0f} ms")
+        if info is not None: info.update(info_carga)
+        return df
+    except: return None
+
+def procesar_input(texto_input, archivo_input, info=None, origen=None):
+    """DataFrame con j_norm, n_clean y unique_id; `origen` ('PARTE'/'LISTA') solo etiqueta las etapas medidas."""
+    df = None
+    with etapa('lectura', origen=origen) as medida:
+        if archivo_input:
+            file_bytes = archivo_input.getvalue()
+            if archivo_input.name.endswith('csv'):
+                try: df = pd.read_csv(archivo_input, header=None); df = df.iloc[:, :2]; df.columns = ['Jerarquia', 'Nombre']
+                except: pass
+            else:
+                df = leer_excel_inteligente(file_bytes, archivo_input.name, info)
+        elif texto_input:
+            try:
+                df = pd.read_csv(StringIO(texto_input), sep='\t', header=None, engine='python')
+                if len(df.columns) < 2: df = pd.read_csv(StringIO(texto_input), sep=',', header=None, engine='python')
+                df = df.iloc[:, :2]; df.columns = ['Jerarquia', 'Nombre']
+            except: pass
+        medida['filas'] = 0 if df is None else len(df)
+
+    if df is not None and not df.empty: return normalizar(df, origen)
+    return None
+
+def normalizar(df, origen=None):
+    """Agrega j_norm, n_clean y unique_id a un DataFrame ['Jerarquia', 'Nombre'] leído; descarta las filas sin jerarquía."""
+    with etapa('normalizacion', origen=origen) as medida:
+        df['j_norm'] = normalizar_jerarquias(df['Jerarquia'])
+        df = df[df['j_norm'] != ""]
+        df['n_clean'] = limpiar_nombres(df['Nombre'])
+        df['unique_id'] = df['Nombre'] + "_" + df.index.astype(str)
+        medida['filas'] = len(df)
+    return df
+
+def leer_hojas(archivo_bytes, filename, origen='LISTA'):
+    """[(hoja, df)] ya normalizados de todas las hojas con forma de plantel del libro, leído una sola vez."""
+    with etapa('lectura', origen=origen) as medida:
+        try: hojas = cargar_hojas_xlsx(archivo_bytes)
+        except Exception as e:
+            logging.error(f"Carga {filename}: {e}"); hojas = []
+        medida.update(hojas=len(hojas), filas=sum(len(df) for df, _ in hojas))
+    logging.info(f"Carga {filename}: hojas={[info['hoja'] for _, info in hojas]}")
+    resultado = []
+    for df, info in hojas:
+        df = normalizar(df, f"{origen}:{info['hoja']}")
+        if not df.empty: resultado.append((info['hoja'], df))
+    return resultado
+
+# --- ANALISIS ---
+def detectar_duplicados(df, umbral=motor.UMBRAL_DUPLICADO, workers=-1):
+    """
+    Grupos de filas que parecen la misma persona cargada dos veces (idénticas, con un typo o con los apellidos
+    invertidos) dentro de la misma jerarquía: [{'jerarquia', 'nombres', 'ids', 'exacto'}], los más grandes primero.
+    """
+    if df is None or df.empty: return []
+    jerarquias, nombres, ids, limpios = (df[c].tolist() for c in ('Jerarquia', 'Nombre', 'unique_id', 'n_clean'))
+    grupos = [{'jerarquia': str(jerarquias[filas[0]]), 'nombres': [str(nombres[i]) for i in filas], 'ids': [ids[i] for i in filas],
+               'exacto': len({limpios[i] for i in filas}) == 1}
+              for _, filas in motor.agrupar_parecidos(limpios, df['j_norm'].tolist(), umbral, workers=workers)]
+    return sorted(grupos, key=lambda g: -len(g['ids']))
+
+def calcular_analisis(df_p, df_l, umbral_det, umbral_auto, vectorizado=True, detective_optimo=True, confirmados=None, rechazados=None, workers=-1, memoria=None, delta=None, candidatos=0):
+    """
+    Devuelve (faltan, sobran, detective, estado): filas de PARTE sin match, filas de LISTA sin match,
+    sugerencias [{'falta', 'sobra'}] y el EstadoMatching (None en el modo clásico fila por fila).
+    `confirmados`/`rechazados` son decisiones.IndiceDecisiones con las decisiones del operador; `memoria`
+    (decisiones.AlmacenDecisiones, mejor una instantanea()) agrega las de sesiones anteriores, que se aplican antes de
+    puntuar: los pares confirmados se emparejan sin puntuar y los rechazados nunca entran al auto-match.
+    `delta` (delta.CorridaPrevia, solo motor vectorizado) reutiliza los pares de la corrida anterior y guarda esta.
+    `candidatos` (k > 0, solo motor vectorizado): el auto-match puntúa cada nombre solo contra sus k candidatos del índice fonético.
+    """
+    confirmados = confirmados if confirmados is not None else IndiceDecisiones()
+    rechazados = rechazados if rechazados is not None else IndiceDecisiones()
+    with etapa('memoria', decisiones=len(memoria) if memoria else 0) as medida:
+        pre_p, pre_l, veto = _prepaso_memoria(df_p, df_l, memoria)
+        medida['pares'] = int((pre_p >= 0).sum()); medida['vetados'] = sum(len(ks) for ks in veto.values())
+    if vectorizado:
+        de_memoria = pre_p >= 0
+        if delta is not None:
+            with etapa('delta') as medida:
+                reu_p, reu_l = delta.reutilizar(df_p, df_l, _opciones_delta(umbral_auto, candidatos), de_memoria, pre_l)
+                for i, ks in veto.items():  # un par reutilizado que después se rechazó vuelve a puntuarse
+                    if reu_p[i] in ks: reu_l[reu_p[i]] = False; reu_p[i] = -1
+                pre_p = np.where(reu_p >= 0, reu_p, pre_p); pre_l = pre_l | reu_l
+                medida.update(delta.resumen)
+        return _calcular_analisis_vectorizado(df_p, df_l, umbral_det, umbral_auto, detective_optimo, confirmados, rechazados, workers, pre_p, pre_l, veto, memoria, delta, de_memoria, candidatos)
+    from thefuzz import fuzz  # solo el motor clásico fila por fila
+    with etapa('auto_match', filas=len(df_p), filas_lista=len(df_l)), tramo(0.15, 0.8, "Auto-match"):
+        sobran = df_l.copy(); sobran['found'] = pre_l
+        pos_l = {uid: k for k, uid in enumerate(sobran['unique_id'])}
+        faltan_temp = []
+        for n, ((idx_p, row_p), previo) in enumerate(zip(df_p.iterrows(), pre_p)):
+            if n % 200 == 0: avance(n / len(df_p))
+            if previo >= 0: continue
+            candidatos = sobran[sobran['j_norm'] == row_p['j_norm']]
+            encontrado = False
+            for idx_l, row_l in candidatos.iterrows():
+                if row_l['found'] or pos_l[row_l['unique_id']] in veto.get(n, ()): continue
+                if fuzz.token_set_ratio(row_p['n_clean'], row_l['n_clean']) >= umbral_auto:
+                    encontrado = True; sobran.at[idx_l, 'found'] = True; break
+            if not encontrado:
+                k = _primer_confirmado_libre(row_p['unique_id'], pos_l, sobran['found'].values, confirmados)
+                if k is not None: encontrado = True; sobran.iat[k, sobran.columns.get_loc('found')] = True
+            if not encontrado: faltan_temp.append(row_p)
+    return faltan_temp, *_fase_detective(faltan_temp, sobran, umbral_det, umbral_auto, detective_optimo, rechazados, vectorizado=False, memoria=memoria)
+
+def _calcular_analisis_vectorizado(df_p, df_l, umbral_det, umbral_auto, detective_optimo, confirmados, rechazados, workers, pre_p, pre_l, veto, memoria, delta, de_memoria, candidatos):
+    # Motor por bloques: hash join exacto + matriz de scores solo para el residuo (sin los pares ya recordados)
+    resto_p = np.flatnonzero(pre_p < 0); resto_l = np.flatnonzero(~pre_l)
+    en_resto_p = {i: t for t, i in enumerate(resto_p)}; en_resto_l = {k: t for t, k in enumerate(resto_l)}
+    prohibidos = {en_resto_p[i]: {en_resto_l[k] for k in ks if k in en_resto_l} for i, ks in veto.items() if i in en_resto_p}
+    with etapa('auto_match', filas=len(resto_p), filas_lista=len(resto_l), candidatos=candidatos), tramo(0.15, 0.8, "Auto-match"):
+        n_p, j_p, n_l, j_l = df_p['n_clean'].tolist(), df_p['j_norm'].tolist(), df_l['n_clean'].tolist(), df_l['j_norm'].tolist()
+        m, u = motor.emparejar_automatico([n_p[i] for i in resto_p], [j_p[i] for i in resto_p], [n_l[k] for k in resto_l], [j_l[k] for k in resto_l], umbral_auto, workers, candidatos, prohibidos)
+        match_p = pre_p.copy(); match_p[resto_p[m >= 0]] = resto_l[m[m >= 0]]
+        usado_l = pre_l.copy(); usado_l[resto_l[u]] = True
+        pos_l = {uid: k for k, uid in enumerate(df_l['unique_id'])}
+        faltan_temp = []
+        for idx_p, row_p in df_p[match_p < 0].iterrows():
+            k = _primer_confirmado_libre(row_p['unique_id'], pos_l, usado_l, confirmados)
+            if k is not None: usado_l[k] = True
+            else: faltan_temp.append(row_p)
+        sobran = df_l.copy(); sobran['found'] = usado_l
+    if delta is not None:
+        with etapa('guardado_delta'): delta.guardar(df_p, df_l, np.where(de_memoria, -1, match_p), _opciones_delta(umbral_auto, candidatos))
+    return faltan_temp, *_fase_detective(faltan_temp, sobran, umbral_det, umbral_auto, detective_optimo, rechazados, workers=workers, memoria=memoria)
+
+def _opciones_delta(umbral_auto, candidatos):
+    # Lo que decide qué pares salen del auto-match: con otras opciones los pares guardados no valen
+    return {'umbral_auto': umbral_auto, 'vectorizado': True, 'candidatos': candidatos}
+
+def _prepaso_memoria(df_p, df_l, memoria):
+    # Pares confirmados en sesiones anteriores: cada PARTE toma la primera LISTA libre con una huella confirmada.
+    # Los rechazados quedan como veto {fila PARTE: {filas LISTA}} para el auto-match
+    pre_p = np.full(len(df_p), -1, dtype=np.int64); pre_l = np.zeros(len(df_l), dtype=bool); veto = {}
+    if not memoria: return pre_p, pre_l, veto
+    pos_huella_l = {}
+    for k, h in enumerate(huellas(df_l)): pos_huella_l.setdefault(h, []).append(k)
+    for i, h in enumerate(huellas(df_p)):
+        libres = [k for hl in memoria.confirmados_de(h) for k in pos_huella_l.get(hl, ()) if not pre_l[k]]
+        if libres: k = min(libres); pre_p[i] = k; pre_l[k] = True
+        vetadas = {k for hl in memoria.rechazados_de(h) for k in pos_huella_l.get(hl, ())}
+        if vetadas: veto[i] = vetadas
+    return pre_p, pre_l, veto
+
+def _rechazados_con_memoria(rechazados, faltan_temp, df_sobran_reales, memoria):
+    # Los rechazos recordados se traducen a los unique_id de esta corrida; se suman a los de la sesión en una copia
+    if not memoria or not memoria.rechazados or not faltan_temp: return rechazados
+    uids_huella_s = {}
+    for uid, h in zip(df_sobran_reales['unique_id'], huellas(df_sobran_reales)): uids_huella_s.setdefault(h, []).append(uid)
+    total = IndiceDecisiones()
+    for uid_f, uid_s, etiqueta in rechazados.pares(): total.agregar(uid_f, uid_s, etiqueta)
+    for f, h in zip(faltan_temp, huellas(pd.DataFrame(faltan_temp))):
+        for hl, etiqueta in memoria.rechazados_de(h).items():
+            for uid_s in uids_huella_s.get(hl, ()): total.agregar(f['unique_id'], uid_s, etiqueta)
+    return total
+
+def _primer_confirmado_libre(uid_p, pos_l, usado_l, confirmados):
+    # Lookup directo en el índice de confirmados; ante varios, la primera fila libre de LISTA
+    libres = [pos_l[uid] for uid in confirmados.de_parte(uid_p) if uid in pos_l and not usado_l[pos_l[uid]]]
+    return min(libres) if libres else None
+
+def _fase_detective(faltan_temp, sobran, umbral_det, umbral_auto, optimo, rechazados, vectorizado=True, workers=-1, memoria=None):
+    rechazados = _rechazados_con_memoria(rechazados, faltan_temp, sobran[~sobran['found']], memoria)
+    with etapa('detective', filas=len(faltan_temp), filas_lista=int((~sobran['found']).sum())), tramo(0.8, 1.0, "Detective"):
+        return _detective(faltan_temp, sobran, umbral_det, umbral_auto, optimo, rechazados, vectorizado, workers)
+
+def _detective(faltan_temp, sobran, umbral_det, umbral_auto, optimo, rechazados, vectorizado, workers):
+    detective_matches = []
+    df_sobran_reales = sobran[~sobran['found']]
+    if vectorizado or optimo:
+        # Una sola matriz F×S guardada como estado mutable (las decisiones no re-analizan todo)
+        prohibidos = [(uid_f, uid_s) for uid_f, uid_s, _ in rechazados.pares()]
+        estado = motor.EstadoMatching([f['unique_id'] for f in faltan_temp], [f['n_clean'] for f in faltan_temp], df_sobran_reales['unique_id'].tolist(), df_sobran_reales['n_clean'].tolist(), umbral_det, umbral_auto, optimo, prohibidos, workers)
+        return df_sobran_reales, [{'falta': faltan_temp[i], 'sobra': df_sobran_reales.iloc[k]} for i, k in estado.sugerencias()], estado
+    from thefuzz import fuzz
+
+    for f in faltan_temp:
+        best_match = None; best_score = 0
+        rechazados_f = rechazados.de_parte(f['unique_id'])
+        for idx_s, s in df_sobran_reales.iterrows():
+            if s['unique_id'] in rechazados_f: continue
+            score = fuzz.token_sort_ratio(f['n_clean'], s['n_clean'])
+            if score > umbral_det and score < umbral_auto:
+                if score > best_score: best_score = score; best_match = s
+        if best_match is not None:
+            detective_matches.append({'falta': f, 'sobra': best_match})
+    return df_sobran_reales, detective_matches, None
+
+def analisis_completo(texto_p, archivo_p, texto_l, archivo_l, umbral_det, umbral_auto, vectorizado=True, detective_optimo=True,
+                      confirmados=None, rechazados=None, memoria=None, base_delta=None, perfilar=False, candidatos=0):
+    """
+    Lectura + duplicados + calcular_analisis de punta a punta, pensado para correr en un trabajos.Ejecutor.
+    Devuelve un dict con el resultado ('resultado': ResultadoAnalisis, 'estado': EstadoMatching), los tiempos
+    por etapa ('crono') y el perfil; 'error' si los datos no sirven.
+    `base_delta` (nombre de la LISTA o "texto") activa el modo delta sobre esa base y la hoja leída.
+    """
+    r = {'error': None}
+    with medicion.perfil(perfilar) as perfil, medicion.cronometro('analisis') as crono:
+        with tramo(0.0, 0.15, "Leyendo datos"):
+            info = {}
+            df_p = procesar_input(texto_p, archivo_p, origen='PARTE')
+            df_l = procesar_input(texto_l, archivo_l, info, origen='LISTA')
+            r['info_carga'] = info or None
+        if df_p is None or df_l is None:
+            r['error'] = "Datos no válidos."
+        else:
+            r['duplicados'] = {}
+            for origen, df in (('PARTE', df_p), ('LISTA', df_l)):
+                with etapa('duplicados', origen=origen, filas=len(df)) as medida:
+                    r['duplicados'][origen] = detectar_duplicados(df); medida['grupos'] = len(r['duplicados'][origen])
+            previa = CorridaPrevia(f"{base_delta}/{info.get('hoja', '')}") if base_delta is not None and vectorizado else None
+            faltan, sobran, detective, r['estado'] = calcular_analisis(df_p, df_l, umbral_det, umbral_auto, vectorizado, detective_optimo,
+                                                                      confirmados, rechazados, memoria=memoria, delta=previa, candidatos=candidatos)
+            r['resultado'] = ResultadoAnalisis(df_p, df_l, faltan, sobran, detective)
+            r.update(resumen_delta=previa.resumen if previa else None, total_parte=len(df_p), total_lista=len(df_l))
+    r.update(crono=crono, perfil=perfil)
+    return r
+
+def analizar_hojas(parte, hojas, umbral_det, umbral_auto, vectorizado=True, detective_optimo=True, memoria=None, pool=None, candidatos=0):
+    """
+    {hoja: (faltan, sobran, detective)} conciliando cada hoja de `hojas` ([(nombre, df)] de leer_hojas).
+    `parte` es un DataFrame (el mismo PARTE contra todas las hojas) o {hoja: DataFrame}; las hojas sin PARTE
+    se saltean. Con `pool` (ProcessPoolExecutor) las hojas corren en paralelo, con rapidfuzz a un hilo por proceso.
+    """
+    tareas = [(nombre, parte.get(nombre) if isinstance(parte, dict) else parte, df_l) for nombre, df_l in hojas]
+    tareas = [t for t in tareas if t[1] is not None]
+    opciones = dict(umbral_det=umbral_det, umbral_auto=umbral_auto, vectorizado=vectorizado, detective_optimo=detective_optimo, memoria=memoria,
+                   candidatos=candidatos)
+    resultados = {}
+    if pool is None or len(tareas) < 2:
+        for n, (nombre, df_p, df_l) in enumerate(tareas):
+            with tramo(n / len(tareas), (n + 1) / len(tareas), f"Hoja {nombre}"):
+                resultados[nombre] = calcular_analisis(df_p, df_l, **opciones)[:3]
+        return resultados
+    futuros = {pool.submit(_analizar_hoja, df_p, df_l, opciones): nombre for nombre, df_p, df_l in tareas}
+    pendientes = set(futuros)
+    try:
+        while pendientes:
+            avance((len(futuros) - len(pendientes)) / len(futuros))  # corta acá si el trabajo se canceló
+            listos, pendientes = wait(pendientes, timeout=0.5, return_when=FIRST_COMPLETED)
+            for futuro in listos:
+                nombre = futuros[futuro]
+                faltan, sobran, detective, etapas = futuro.result()
+                resultados[nombre] = (faltan, sobran, detective)
+                for e in etapas: medicion.registrar(e.pop('etapa'), e.pop('ms'), hoja=nombre, **e)
+    except BaseException:
+        for futuro in pendientes: futuro.cancel()
+        raise
+    return {nombre: resultados[nombre] for nombre, _, _ in tareas}
+
+def _analizar_hoja(df_p, df_l, opciones):
+    # Corre en un proceso del pool: las etapas vuelven con el resultado para sumarlas al cronómetro del padre
+    with medicion.cronometro('hoja') as crono:
+        faltan, sobran, detective, _ = calcular_analisis(df_p, df_l, workers=1, **opciones)
+    return faltan, sobran, detective, crono.etapas
+
+def analisis_hojas(texto_p, archivo_p, archivo_l, umbral_det, umbral_auto, vectorizado=True, detective_optimo=True, memoria=None, pool=None, perfilar=False, candidatos=0):
+    """
+    Modo multi-hoja de analisis_completo: el PARTE contra cada hoja con forma de plantel de la LISTA.
+    Devuelve el mismo tipo de dict, con 'hojas' = {hoja: {'resultado': ResultadoAnalisis, 'total_lista'}}.
+    """
+    r = {'error': None, 'info_carga': None}
+    with medicion.perfil(perfilar) as perfil, medicion.cronometro('analisis') as crono:
+        with tramo(0.0, 0.15, "Leyendo datos"):
+            df_p = procesar_input(texto_p, archivo_p, origen='PARTE')
+            hojas = leer_hojas(archivo_l.getvalue(), archivo_l.name) if archivo_l is not None else []
+        if df_p is None or not hojas:
+            r['error'] = "Datos no válidos." if df_p is None or archivo_l is None else "La LISTA no tiene hojas con forma de plantel."
+        else:
+            r['duplicados'] = {}
+            for origen, df in [('PARTE', df_p)] + [(f"LISTA {nombre}", df) for nombre, df in hojas]:
+                with etapa('duplicados', origen=origen, filas=len(df)) as medida:
+                    r['duplicados'][origen] = detectar_duplicados(df); medida['grupos'] = len(r['duplicados'][origen])
+            with tramo(0.15, 1.0, "Conciliando hojas"):
+                resultados = analizar_hojas(df_p, hojas, umbral_det, umbral_auto, vectorizado, detective_optimo, memoria, pool, candidatos)
+            df_hojas = dict(hojas)
+            r['hojas'] = {nombre: {'resultado': ResultadoAnalisis(df_p, df_hojas[nombre], f, s, d), 'total_lista': len(df_hojas[nombre])}
+                          for nombre, (f, s, d) in resultados.items()}
+            r['total_parte'] = len(df_p)
+    r.update(crono=crono, perfil=perfil)
+    return r
+
+# --- RESULTADO ---
+def separar_resultado(faltan, sobran, detective):
+    """(final_verde, final_rojo): faltantes y sobrantes que no están en conflicto con una sugerencia del detective."""
+    ids_conflict_f = {m['falta']['unique_id'] for m in detective}
+    ids_conflict_s = [m['sobra']['unique_id'] for m in detective]
+    final_verde = [f for f in faltan if f['unique_id'] not in ids_conflict_f]
+    final_rojo = sobran[~sobran['unique_id'].isin(ids_conflict_s)]
+    return final_verde, final_rojo
+
+def datos_exportacion(final_verde, final_rojo):
+    """(borrar, agregar) como tuplas hashables: nombres limpios a borrar y (jerarquía, nombre) a insertar. final_verde: filas o DataFrame."""
+    borrar = tuple(sorted({limpiar_nombre(n) for n in final_rojo['Nombre']}))
+    if isinstance(final_verde, pd.DataFrame): final_verde = final_verde[['Jerarquia', 'Nombre']].to_dict('records')
+    agregar = tuple((str(p['Jerarquia']), str(p['Nombre'])) for p in final_verde)
+    return borrar, agregar
@@ -0,0 +1,163 @@
+"""Decisiones del operador que sobreviven a la sesión, sin Streamlit.
+
+Los pares confirmados/rechazados en la app se guardan en un SQLite local por huella
+(jerarquía normalizada + nombre limpio), no por unique_id: la misma persona vuelve a
+reconocerse al día siguiente aunque cambie de fila. El almacén se lee una vez por proceso
+y queda en memoria; cada decisión nueva se escribe en el momento.
+"""
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+RUTA_DEFECTO = os.environ.get("CONTROL_PSA_DECISIONES") or os.path.join(os.path.expanduser("~"), ".control_psa", "decisiones.sqlite3")
+CONFIRMADO, RECHAZADO = "confirmado", "rechazado"
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS decisiones (
+    huella_parte TEXT NOT NULL,
+    huella_lista TEXT NOT NULL,
+    tipo TEXT NOT NULL CHECK (tipo IN ('confirmado', 'rechazado')),
+    etiqueta TEXT NOT NULL DEFAULT '',
+    fecha TEXT NOT NULL,
+    PRIMARY KEY (huella_parte, huella_lista)
+)"""
+
+
+def huella(j_norm, n_clean):
+    """Huella estable de una persona: jerarquía normalizada + palabras del nombre limpio sin importar el orden."""
+    texto = f"{j_norm}\x1f{' '.join(sorted(str(n_clean).split()))}"
+    return hashlib.blake2b(texto.encode(), digest_size=10).hexdigest()
+
+
+def huellas(df):
+    """Huella de cada fila de un DataFrame procesado (columnas j_norm y n_clean), en orden."""
+    return [huella(j, n) for j, n in zip(df['j_norm'], df['n_clean'])]
+
+
+class IndiceDecisiones:
+    """Pares confirmados o rechazados por el operador en esta sesión, indexados por unique_id de PARTE."""
+
+    def __init__(self):
+        self.por_parte = {}  # uid PARTE -> {uid LISTA: etiqueta}
+
+    def agregar(self, uid_f, uid_s, etiqueta=""):
+        self.por_parte.setdefault(uid_f, {})[uid_s] = etiqueta
+
+    def quitar(self, uid_f, uid_s):
+        self.por_parte.get(uid_f, {}).pop(uid_s, None)
+        if not self.por_parte.get(uid_f): self.por_parte.pop(uid_f, None)
+
+    def de_parte(self, uid_f):
+        return self.por_parte.get(uid_f, {})
+
+    def copia(self):
+        nuevo = IndiceDecisiones()
+        for uid_f, uid_s, etiqueta in self.pares(): nuevo.agregar(uid_f, uid_s, etiqueta)
+        return nuevo
+
+    def pares(self):
+        """[(uid_f, uid_s, etiqueta)] en orden de alta."""
+        return [(uid_f, uid_s, etiqueta) for uid_f, d in self.por_parte.items() for uid_s, etiqueta in d.items()]
+
+    def __contains__(self, par):
+        return par[1] in self.por_parte.get(par[0], {})
+
+    def __len__(self):
+        return sum(len(d) for d in self.por_parte.values())
+
+    def __bool__(self):
+        return bool(self.por_parte)
+
+
+class AlmacenDecisiones:
+    """Pares de huellas (PARTE, LISTA) decididos. Sin ruta (o si el archivo no se puede abrir) queda solo en memoria."""
+
+    def __init__(self, ruta=RUTA_DEFECTO):
+        self.ruta = ruta
+        self.confirmados = {}  # huella PARTE -> {huella LISTA: etiqueta}
+        self.rechazados = {}   # huella PARTE -> {huella LISTA: etiqueta}
+        self.version = 0  # cambia con cada decisión: distingue dos estados del almacén sin compararlo entero
+        self._lock = threading.Lock()
+        if ruta: self._cargar()
+
+    def __getstate__(self):
+        # A otro proceso viaja una copia de solo lectura: sin archivo (no escribe) y sin el lock
+        copia = self.instantanea()
+        return {'ruta': None, 'confirmados': copia.confirmados, 'rechazados': copia.rechazados, 'version': copia.version}
+
+    def __setstate__(self, estado):
+        self.__dict__.update(estado); self._lock = threading.Lock()
+
+    def _conectar(self):
+        return closing(sqlite3.connect(self.ruta, timeout=5))
+
+    def _cargar(self):
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.ruta)), exist_ok=True)
+            with self._conectar() as con, con:
+                con.execute(_ESQUEMA)
+                filas = con.execute("SELECT huella_parte, huella_lista, tipo, etiqueta FROM decisiones ORDER BY fecha").fetchall()
+        except (OSError, sqlite3.Error) as e:
+            logging.error(f"Decisiones: no se pudo abrir {self.ruta} ({e}); se guardan solo en memoria")
+            self.ruta = None
+            return
+        for hp, hl, tipo, etiqueta in filas: self._indice(tipo).setdefault(hp, {})[hl] = etiqueta
+
+    def _indice(self, tipo):
+        return self.confirmados if tipo == CONFIRMADO else self.rechazados
+
+    def _escribir(self, sql, parametros):
+        if not self.ruta: return
+        try:
+            with self._conectar() as con, con: con.execute(sql, parametros)
+        except sqlite3.Error as e:
+            logging.error(f"Decisiones: no se pudo escribir en {self.ruta} ({e})")
+
+    def guardar(self, tipo, hp, hl, etiqueta=""):
+        """Registra (o reemplaza) la decisión sobre el par; confirmar un par rechazado lo saca de rechazados y viceversa."""
+        with self._lock:
+            otro = self.rechazados if tipo == CONFIRMADO else self.confirmados
+            otro.get(hp, {}).pop(hl, None)
+            self._indice(tipo).setdefault(hp, {})[hl] = etiqueta; self.version += 1
+            self._escribir("INSERT OR REPLACE INTO decisiones VALUES (?, ?, ?, ?, ?)", (hp, hl, tipo, etiqueta, time.strftime('%Y-%m-%dT%H:%M:%S')))
+
+    def olvidar(self, hp, hl):
+        with self._lock:
+            for indice in (self.confirmados, self.rechazados):
+                indice.get(hp, {}).pop(hl, None)
+                if not indice.get(hp): indice.pop(hp, None)
+            self.version += 1
+            self._escribir("DELETE FROM decisiones WHERE huella_parte = ? AND huella_lista = ?", (hp, hl))
+
+    def olvidar_todo(self):
+        with self._lock:
+            self.confirmados.clear(); self.rechazados.clear(); self.version += 1
+            self._escribir("DELETE FROM decisiones", ())
+
+    def instantanea(self):
+        """
+        Copia en memoria (sin archivo) del estado actual con su `version`: lo que recibe un análisis en segundo plano,
+        así las decisiones que otras sesiones tomen mientras corre no le cambian los índices a mitad de camino.
+        """
+        copia = AlmacenDecisiones(ruta=None)
+        with self._lock:
+            copia.confirmados = {hp: dict(d) for hp, d in self.confirmados.items()}
+            copia.rechazados = {hp: dict(d) for hp, d in self.rechazados.items()}
+            copia.version = self.version
+        return copia
+
+    def confirmados_de(self, hp):
+        with self._lock: return dict(self.confirmados.get(hp, {}))
+
+    def rechazados_de(self, hp):
+        with self._lock: return dict(self.rechazados.get(hp, {}))
+
+    def __len__(self):
+        with self._lock: return sum(len(d) for d in self.confirmados.values()) + sum(len(d) for d in self.rechazados.values())
+
+    def __bool__(self):
+        with self._lock: return bool(self.confirmados or self.rechazados)
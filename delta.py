@@ -0,0 +1,98 @@
+"""Modo delta: reutiliza el auto-match de la corrida anterior de la misma base/hoja, sin Streamlit.
+
+Se guarda en disco el PARTE y la LISTA normalizados (j_norm, n_clean) y qué fila de LISTA tomó
+cada fila de PARTE. En la corrida siguiente las filas se comparan por contenido (no por posición,
+que cambia al insertar o borrar): los pares cuyas dos filas siguen igual se conservan y solo las
+filas agregadas, editadas, quitadas o sin pareja pasan por el scoring.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from collections import defaultdict, deque
+
+import numpy as np
+
+DIR_DELTA = os.environ.get("CONTROL_PSA_DELTA") or os.path.join(os.path.expanduser("~"), ".control_psa", "delta")
+VERSION = 2  # subir si cambia el criterio del auto-match: invalida las corridas guardadas
+
+
+def _claves(df):
+    return [f"{j}\x1f{n}" for j, n in zip(df['j_norm'], df['n_clean'])]
+
+
+def _correspondencia(previas, nuevas):
+    """Posición previa de cada fila nueva (-1 si es nueva); las repetidas se aparean en orden."""
+    libres = defaultdict(deque)
+    for k, c in enumerate(previas): libres[c].append(k)
+    return np.array([libres[c].popleft() if libres[c] else -1 for c in nuevas], dtype=np.int64)
+
+
+class CorridaPrevia:
+    """Última corrida guardada para `clave` (p. ej. "LISTA_EZE.xlsx/LISTA"); `resumen` queda con los números del delta."""
+
+    def __init__(self, clave, directorio=DIR_DELTA):
+        self.clave = clave
+        self.ruta = os.path.join(directorio, hashlib.sha1(clave.encode()).hexdigest()[:16] + ".json")
+        self.resumen = {}
+        self._previa = self._leer()
+
+    def _leer(self):
+        try:
+            with open(self.ruta, encoding='utf-8') as f: previa = json.load(f)
+        except FileNotFoundError: return None
+        except (OSError, ValueError) as e:
+            logging.error(f"Delta: no se pudo leer {self.ruta} ({e})")
+            return None
+        return previa if previa.get('version') == VERSION and previa.get('clave') == self.clave else None
+
+    def reutilizar(self, df_p, df_l, motor, ocupado_p=None, ocupado_l=None):
+        """
+        (pre_p, pre_l): LISTA asignada a cada PARTE (-1 si hay que puntuarla) y máscara de LISTA tomadas,
+        con los pares de la corrida anterior cuyas dos filas no cambiaron. `ocupado_*` excluye filas ya asignadas.
+        `motor` ({'umbral_auto', 'vectorizado', 'candidatos'}): con otras opciones que la previa no se reutiliza nada.
+        """
+        pre_p = np.full(len(df_p), -1, dtype=np.int64); pre_l = np.zeros(len(df_l), dtype=bool)
+        previa = self._previa
+        if previa is None or previa['motor'] != motor:
+            self.resumen = {'previa': previa is not None, 'reutilizados': 0, 'a_puntuar_parte': len(df_p), 'a_puntuar_lista': len(df_l)}
+            return pre_p, pre_l
+        nueva_de_p = np.full(len(previa['parte']), -1, dtype=np.int64); nueva_de_l = np.full(len(previa['lista']), -1, dtype=np.int64)
+        previa_p = _correspondencia(previa['parte'], _claves(df_p)); previa_l = _correspondencia(previa['lista'], _claves(df_l))
+        nueva_de_p[previa_p[previa_p >= 0]] = np.flatnonzero(previa_p >= 0)
+        nueva_de_l[previa_l[previa_l >= 0]] = np.flatnonzero(previa_l >= 0)
+
+        match = np.asarray(previa['match_p'], dtype=np.int64)
+        ip = np.flatnonzero(match >= 0)
+        nuevo_p = nueva_de_p[ip]; nuevo_l = nueva_de_l[match[ip]]
+        vigente = (nuevo_p >= 0) & (nuevo_l >= 0)
+        nuevo_p, nuevo_l = nuevo_p[vigente], nuevo_l[vigente]
+        if ocupado_p is not None:
+            libre = ~ocupado_p[nuevo_p] & ~ocupado_l[nuevo_l]
+            nuevo_p, nuevo_l = nuevo_p[libre], nuevo_l[libre]
+        pre_p[nuevo_p] = nuevo_l; pre_l[nuevo_l] = True
+        self.resumen = {
+            'previa': True, 'reutilizados': len(nuevo_p),
+            'agregadas_parte': int((previa_p < 0).sum()), 'quitadas_parte': int((nueva_de_p < 0).sum()),
+            'agregadas_lista': int((previa_l < 0).sum()), 'quitadas_lista': int((nueva_de_l < 0).sum()),
+            'a_puntuar_parte': int(len(df_p) - len(nuevo_p)), 'a_puntuar_lista': int(len(df_l) - len(nuevo_l)),
+        }
+        return pre_p, pre_l
+
+    def guardar(self, df_p, df_l, match_p, motor):
+        """Deja esta corrida como la previa: match_p son solo los pares del auto-match (no las decisiones del operador)."""
+        datos = {'version': VERSION, 'clave': self.clave, 'motor': dict(motor),
+                 'parte': _claves(df_p), 'lista': _claves(df_l), 'match_p': [int(k) for k in match_p]}
+        temporal = None
+        try:
+            os.makedirs(os.path.dirname(self.ruta), exist_ok=True)
+            # Un temporal propio por escritura: dos sesiones (hilos del mismo proceso) pueden guardar la misma base a la vez
+            fd, temporal = tempfile.mkstemp(dir=os.path.dirname(self.ruta), prefix=os.path.basename(self.ruta) + ".", suffix=".tmp")
+            with os.fdopen(fd, 'w', encoding='utf-8') as f: json.dump(datos, f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(temporal, self.ruta)  # atómico: otra sesión nunca lee un archivo a medio escribir
+        except OSError as e:
+            logging.error(f"Delta: no se pudo guardar {self.ruta} ({e})")
+            if temporal is not None and os.path.exists(temporal): os.unlink(temporal)
+            return
+        self._previa = datos
@@ -0,0 +1,124 @@
+"""Lectura de la LISTA desde xlsx: carga en streaming (openpyxl read-only) y disposición de la hoja."""
+import threading
+import time
+from collections import OrderedDict
+from io import BytesIO
+from itertools import chain, islice
+
+import pandas as pd
+
+from normalizacion import contiene_jerarquia, limpiar_nombre
+
+FILAS_MUESTRA = 200  # filas usadas para detectar las columnas jerarquía/nombre
+FILAS_LAYOUT, COLS_LAYOUT = 49, 19  # zona sondeada por los generadores de Excel
+MAX_DISPOSICIONES = 32
+MIN_JERARQUIAS_PLANTEL = 3  # jerarquías reconocidas en la muestra para tomar una hoja como plantel (modo multi-hoja)
+_disposiciones = OrderedDict()  # hash del archivo -> disposición de su hoja LISTA
+_lock_disposiciones = threading.Lock()  # la comparten los hilos de script de todas las sesiones
+
+
+def _abrir(archivo_bytes):
+    import openpyxl  # recién cuando llega un xlsx: pegar texto no paga la importación
+
+    return openpyxl.load_workbook(BytesIO(archivo_bytes), read_only=True, data_only=True)
+
+
+def hoja_lista(wb):
+    return wb['LISTA'] if 'LISTA' in wb.sheetnames else wb.worksheets[0]
+
+
+def detectar_columna_jerarquia(filas):
+    """Índice (0-based) de la columna con más jerarquías reconocibles, y cantidad de columnas usadas."""
+    conteo = {}; ultima_col = -1
+    for fila in filas:
+        for c, v in enumerate(fila):
+            if v is None: continue
+            ultima_col = max(ultima_col, c)
+            if contiene_jerarquia(str(v).lower()): conteo[c] = conteo.get(c, 0) + 1
+    if not conteo: return -1, ultima_col + 1
+    return max(sorted(conteo), key=conteo.get), ultima_col + 1
+
+
+def cargar_lista_xlsx(archivo_bytes, filas_muestra=FILAS_MUESTRA):
+    """
+    Devuelve (df, info). df tiene columnas ['Jerarquia', 'Nombre'] con índice = fila de la hoja - 1
+    (igual que pd.read_excel(header=None)), o None si no se encuentra la columna de jerarquía.
+    info = {'hoja', 'col_jerarquia', 'filas_leidas', 'ms'}.
+    """
+    t0 = time.perf_counter()
+    wb = _abrir(archivo_bytes)
+    try:
+        df, info = _leer_hoja(hoja_lista(wb), filas_muestra)
+    finally:
+        wb.close()
+    info['ms'] = (time.perf_counter() - t0) * 1000
+    return df, info
+
+
+def cargar_hojas_xlsx(archivo_bytes, filas_muestra=FILAS_MUESTRA, min_jerarquias=MIN_JERARQUIAS_PLANTEL):
+    """
+    Todas las hojas con forma de plantel en una sola carga: [(df, info)] en el orden del libro, con el
+    mismo df/info que cargar_lista_xlsx (info['ms'] es el de la carga entera).
+    """
+    t0 = time.perf_counter()
+    wb = _abrir(archivo_bytes)
+    try:
+        hojas = [(df, info) for df, info in (_leer_hoja(ws, filas_muestra) for ws in wb.worksheets)
+                 if df is not None and info['jerarquias_muestra'] >= min_jerarquias]
+    finally:
+        wb.close()
+    ms = (time.perf_counter() - t0) * 1000
+    for _, info in hojas: info['ms'] = ms
+    return hojas
+
+
+def _leer_hoja(ws, filas_muestra):
+    filas = ws.iter_rows(values_only=True)
+    muestra = list(islice(filas, filas_muestra))
+    col_j, n_cols = detectar_columna_jerarquia(muestra)
+    info = {'hoja': ws.title, 'col_jerarquia': col_j + 1, 'filas_leidas': len(muestra), 'ms': 0.0, 'jerarquias_muestra': 0}
+    df = None
+    if col_j != -1 and col_j + 1 < n_cols:
+        info['jerarquias_muestra'] = sum(1 for f in muestra if len(f) > col_j and f[col_j] is not None and contiene_jerarquia(str(f[col_j]).lower()))
+        # Solo se materializan las dos columnas útiles
+        datos = [(f[col_j] if len(f) > col_j else None, f[col_j + 1] if len(f) > col_j + 1 else None) for f in chain(muestra, filas)]
+        info['filas_leidas'] = len(datos)
+        while datos and datos[-1] == (None, None): datos.pop()
+        df = pd.DataFrame(datos, columns=['Jerarquia', 'Nombre'])
+    return df, info
+
+
+def analizar_hoja(ws, clave=None):
+    """
+    Una sola pasada por iter_rows(values_only=True): columnas jerarquía/nombre (1-based, -1 si no hay),
+    fila del marcador "ARRIBO A2" (-1 si no hay) e índice nombre limpio -> filas.
+    Con `clave` (hash del archivo original) el resultado queda cacheado; solo vale para la hoja recién cargada.
+    """
+    if clave is not None:
+        with _lock_disposiciones:
+            disp = _disposiciones.get(clave)
+            if disp is not None: _disposiciones.move_to_end(clave); return disp
+    return analizar_filas(ws.iter_rows(values_only=True), clave)
+
+
+def analizar_filas(filas, clave=None):
+    """Núcleo de analizar_hoja sobre tuplas de valores (una por fila, empezando en la fila 1)."""
+    filas = iter(filas)
+    cabecera = list(islice(filas, FILAS_LAYOUT))
+    col_j, _ = detectar_columna_jerarquia([f[:COLS_LAYOUT] for f in cabecera])
+    disp = {'col_jerarquia': -1, 'col_nombre': -1, 'fila_arribo': -1, 'filas_por_nombre': {}}
+    if col_j != -1:
+        disp['col_jerarquia'] = col_j + 1; disp['col_nombre'] = col_j + 2
+        filas_por_nombre = disp['filas_por_nombre']
+        for num, fila in enumerate(chain(cabecera, filas), start=1):
+            if disp['fila_arribo'] == -1:
+                row_str = " ".join(str(v).upper() for v in fila[:9])
+                if "ARRIBO A2" in row_str or "ARRIBOS A2" in row_str: disp['fila_arribo'] = num
+            nombre = fila[col_j + 1] if len(fila) > col_j + 1 else None
+            if nombre: filas_por_nombre.setdefault(limpiar_nombre(str(nombre)), []).append(num)
+
+    if clave is not None:
+        with _lock_disposiciones:
+            _disposiciones[clave] = disp
+            if len(_disposiciones) > MAX_DISPOSICIONES: _disposiciones.popitem(last=False)
+    return disp
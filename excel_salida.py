@@ -0,0 +1,254 @@
+"""Escritura de la LISTA corregida con openpyxl (y despacho al motor de parcheo XML).
+
+Sin Streamlit: los errores se informan con la función `avisar` (por defecto logging.error),
+que la app reemplaza por st.error.
+"""
+import logging
+from bisect import bisect_right, insort
+from copy import copy
+from io import BytesIO
+
+import openpyxl
+from openpyxl.styles import PatternFill
+from openpyxl.worksheet.cell_range import CellRange
+
+import excel_xml
+from medicion import etapa
+from excel_lista import hoja_lista, analizar_hoja
+from normalizacion import abreviar_jerarquia, limpiar_nombre
+
+# --- HELPERS PARA CORRECCIÓN DE FORMATO Y COLOR ---
+
+RED_FILL = PatternFill(fill_type="solid", fgColor="FFFF0000") # Rojo Intenso
+
+class IndiceMerges:
+    """Índice de rangos combinados por fila (intervalos de columnas ordenados), construido una vez por hoja."""
+
+    def __init__(self, ws):
+        self.ws = ws
+        self.por_fila = {}
+        self._indexar(ws.merged_cells.ranges)
+
+    def _indexar(self, rangos):
+        for rng in rangos:
+            for r in range(rng.min_row, rng.max_row + 1):
+                insort(self.por_fila.setdefault(r, []), (rng.min_col, rng.max_col, id(rng), rng))
+
+    def ancla(self, row: int, col: int):
+        """Si (row,col) cae dentro de un merge, devuelve la celda ancla (min_row,min_col). O(log n)."""
+        intervalos = self.por_fila.get(row)
+        if intervalos:
+            i = bisect_right(intervalos, (col, float('inf'))) - 1
+            if i >= 0 and col <= intervalos[i][1]:
+                rng = intervalos[i][3]
+                return rng.min_row, rng.min_col
+        return row, col
+
+    def insertar_filas(self, fila_insercion: int, cantidad: int):
+        """Corre los merges in situ tras ws.insert_rows; solo se re-combinan los que cruzan la inserción."""
+        merged = self.ws.merged_cells
+        cruzan = [rng for rng in merged.ranges if rng.min_row < fila_insercion <= rng.max_row]
+        for rng in cruzan: merged.remove(rng)
+        corridos = [rng for rng in merged.ranges if rng.min_row >= fila_insercion]
+        for rng in corridos: rng.shift(row_shift=cantidad)
+        merged.ranges = set(merged.ranges)  # el hash de CellRange depende de sus coordenadas
+        for rng in cruzan:
+            self.ws.merge_cells(start_row=rng.min_row, start_column=rng.min_col, end_row=rng.max_row + cantidad, end_column=rng.max_col)
+        nuevos = [rng for rng in merged.ranges if rng.min_row < fila_insercion <= rng.max_row]
+
+        # Índice: se rehacen solo las filas desde la inserción y las de los rangos que cruzaban
+        viejos = {id(rng) for rng in cruzan}
+        for r in list(self.por_fila):
+            if r >= fila_insercion: del self.por_fila[r]
+            elif viejos: self.por_fila[r] = [t for t in self.por_fila[r] if t[2] not in viejos]
+        self._indexar(corridos + nuevos)
+
+def pintar_celda(ws, row: int, col: int, fill, merges=None):
+    r, c = (merges or IndiceMerges(ws)).ancla(row, col)
+    ws.cell(row=r, column=c).fill = fill
+
+def pintar_cambio(ws, row: int, col_jerarquia: int, col_nombre: int, fill=RED_FILL, merges=None):
+    # pinta jerarquía + nombre (respetando merges)
+    merges = merges or IndiceMerges(ws)
+    pintar_celda(ws, row, col_jerarquia, fill, merges)
+    pintar_celda(ws, row, col_nombre, fill, merges)
+
+def snapshot_row_dims(ws, desde_fila: int):
+    snap = {}
+    for r, dim in list(ws.row_dimensions.items()):
+        if r >= desde_fila:
+            snap[r] = {
+                "height": dim.height, "hidden": dim.hidden, "outlineLevel": dim.outlineLevel,
+                "collapsed": dim.collapsed, "thickTop": dim.thickTop, "thickBot": dim.thickBot
+            }
+    return snap
+
+def aplicar_row_dims_corridos(ws, snap, desde_fila: int, cantidad: int):
+    for r in list(ws.row_dimensions.keys()):
+        if r >= desde_fila: del ws.row_dimensions[r]
+    for old_r in sorted(snap.keys()):
+        new_r = old_r + cantidad
+        dim = ws.row_dimensions[new_r]
+        props = snap[old_r]
+        for k, v in props.items(): 
+            if hasattr(dim, k): setattr(dim, k, v)
+
+def correr_formulas_matriciales(ws, desde_fila: int, cantidad: int):
+    # insert_rows mueve la celda pero no el ref de su fórmula matricial: sin esto el libro queda inválido
+    for coord, ref in ws.array_formulae.items():
+        rango = CellRange(ref)
+        if rango.min_row >= desde_fila:
+            rango.shift(row_shift=cantidad); ws[coord].value.ref = rango.coord
+
+ATRIBUTOS_ESTILO = ('font', 'border', 'fill', 'number_format', 'protection', 'alignment')
+
+def _estilo_publico(celda):
+    return {a: copy(getattr(celda, a)) for a in ATRIBUTOS_ESTILO}
+
+def plantilla_estilos_fila(ws, fila: int):
+    """
+    Estilo de cada celda con formato de la fila modelo, capturado una sola vez como ids del libro
+    (fuente, borde, relleno, formato, protección, alineación): aplicarlo no crea objetos de estilo nuevos.
+    Solo recorre las celdas que existen en la fila, sin crear las vacías hasta max_column.
+    Usa ws._cells y cell._style (internos de openpyxl); si no están, copia los 6 atributos por la API pública.
+    """
+    celdas = getattr(ws, '_cells', None)
+    if celdas is None: return [(c.column, _estilo_publico(c)) for c in ws[fila] if c.has_style]
+    plantilla = []
+    for col in range(1, ws.max_column + 1):
+        celda = celdas.get((fila, col))
+        if celda is None or not celda.has_style: continue
+        if not hasattr(celda, '_style'): plantilla.append((col, _estilo_publico(celda))); continue
+        estilo = copy(celda._style)
+        estilo.xfId = 0; estilo.quotePrefix = 0; estilo.pivotButton = 0  # mismo alcance que copiar los 6 atributos
+        plantilla.append((col, estilo))
+    return plantilla
+
+def aplicar_estilo(celda, estilo):
+    """Aplica una entrada de plantilla_estilos_fila (ids del libro, o atributos sueltos en el camino público)."""
+    if isinstance(estilo, dict):
+        for a, v in estilo.items(): setattr(celda, a, copy(v))
+    else: celda._style = copy(estilo)
+
+# --- GENERADORES EXCEL ---
+
+def _borrar_nombres(ws, disp, lista_borrar, merges):
+    # Lookup directo en el índice nombre -> filas de la disposición
+    col_jerarquia, col_nombre = disp['col_jerarquia'], disp['col_nombre']
+    for nombre in set([limpiar_nombre(n) for n in lista_borrar]):
+        for fila in disp['filas_por_nombre'].get(nombre, ()):
+            ws.cell(row=fila, column=col_jerarquia).value = None
+            ws.cell(row=fila, column=col_nombre).value = None
+            # 🔴 Marcar cambio en rojo al borrar
+            pintar_cambio(ws, fila, col_jerarquia, col_nombre, RED_FILL, merges)
+
+def _insertar_personas(ws, disp, lista_agregar_dicts, merges):
+    col_jerarquia, col_nombre = disp['col_jerarquia'], disp['col_nombre']
+    target_row = disp['fila_arribo']
+    if target_row != -1 and len(lista_agregar_dicts) > 0:
+        count = len(lista_agregar_dicts)
+        snap_dims = snapshot_row_dims(ws, target_row)
+        
+        ws.insert_rows(target_row, amount=count)
+        merges.insertar_filas(target_row, count)
+        aplicar_row_dims_corridos(ws, snap_dims, target_row, count)
+        correr_formulas_matriciales(ws, target_row, count)
+        
+        source_row_idx = target_row - 1
+        model_dim = ws.row_dimensions[source_row_idx]
+        for i in range(count):
+            rd = ws.row_dimensions[target_row + i]
+            if model_dim.height is not None:
+                rd.height = model_dim.height
+        
+        plantilla = plantilla_estilos_fila(ws, source_row_idx)
+        for i, persona in enumerate(lista_agregar_dicts):
+            current_row = target_row + i
+            for col, estilo in plantilla:
+                aplicar_estilo(ws.cell(row=current_row, column=col), estilo)
+            
+            jerarquia_corta = abreviar_jerarquia(str(persona['Jerarquia']))
+            ws.cell(row=current_row, column=col_jerarquia).value = jerarquia_corta
+            ws.cell(row=current_row, column=col_nombre).value = str(persona['Nombre']).upper()
+            
+            # 🔴 Marcar cambio en rojo al agregar (DESPUÉS DE COPIAR ESTILOS)
+            pintar_cambio(ws, current_row, col_jerarquia, col_nombre, RED_FILL, merges)
+
+def _guardar(wb):
+    output = BytesIO(); wb.save(output); output.seek(0)
+    return output
+
+def borrar_sobrantes_excel(archivo_original, lista_nombres_borrar, clave=None, avisar=logging.error):
+    # Función "Solo Borrar"
+    try:
+        wb = openpyxl.load_workbook(archivo_original)
+        ws = hoja_lista(wb)
+        disp = analizar_hoja(ws, clave)
+        if disp['col_jerarquia'] == -1: return None 
+        _borrar_nombres(ws, disp, lista_nombres_borrar, IndiceMerges(ws))
+        return _guardar(wb)
+    except Exception as e:
+        avisar(f"⚠️ Error al borrar: {e}")
+        return None
+
+def generar_excel_completo(archivo_original, lista_borrar, lista_agregar_dicts, clave=None, avisar=logging.error):
+    # Función "Todo en Uno": Borra + Agrega
+    try:
+        wb = openpyxl.load_workbook(archivo_original)
+        ws = hoja_lista(wb)
+        disp = analizar_hoja(ws, clave)
+        if disp['col_jerarquia'] == -1: return None 
+        merges = IndiceMerges(ws)
+        if lista_borrar: _borrar_nombres(ws, disp, lista_borrar, merges)
+        _insertar_personas(ws, disp, lista_agregar_dicts, merges)
+        return _guardar(wb)
+    except Exception as e:
+        avisar(f"❌ Error crítico generando el Excel: {e}")
+        return None
+
+def generar_exportaciones(archivo_original, lista_borrar, lista_agregar_dicts, clave=None, motor_excel="openpyxl", avisar=logging.error):
+    """Las dos descargas con una sola carga del libro: se guarda LIMPIO_ tras borrar y FINAL_ tras insertar."""
+    if motor_excel == "xml":
+        try:
+            return excel_xml.generar_exportaciones_xml(archivo_original.getvalue(), lista_borrar, lista_agregar_dicts, clave)
+        except excel_xml.FormatoNoSoportado as e:
+            logging.info(f"Parcheo XML no aplicable ({e}); se usa openpyxl")
+        except Exception as e:
+            avisar(f"❌ Error crítico generando el Excel: {e}")
+            return None, None
+    return generar_exportaciones_hojas(archivo_original, {None: (lista_borrar, lista_agregar_dicts)}, clave, avisar)
+
+def generar_exportaciones_hojas(archivo_original, cambios, clave=None, avisar=logging.error):
+    """
+    generar_exportaciones (motor openpyxl) sobre varias hojas con una sola carga del libro:
+    cambios = {nombre de hoja: (lista_borrar, lista_agregar_dicts)}; la clave None es la hoja LISTA.
+    LIMPIO_ y FINAL_ salen con todas las hojas corregidas; las hojas sin columna de jerarquía se saltean.
+    """
+    try:
+        with etapa('carga_libro', motor='openpyxl', bytes=len(archivo_original.getvalue())):
+            wb = openpyxl.load_workbook(archivo_original)
+        hojas = []
+        for nombre, (lista_borrar, lista_agregar_dicts) in cambios.items():
+            ws = hoja_lista(wb) if nombre is None else wb[nombre]
+            # La disposición cacheada es por hoja: la de LISTA conserva la clave del archivo
+            with etapa('disposicion', filas=ws.max_row, hoja=ws.title):
+                disp = analizar_hoja(ws, clave if nombre is None or clave is None else f"{clave}:{nombre}")
+            if disp['col_jerarquia'] == -1: continue
+            hojas.append((ws, disp, IndiceMerges(ws), lista_agregar_dicts))
+            with etapa('borrado', filas=len(lista_borrar), hoja=ws.title):
+                _borrar_nombres(ws, disp, lista_borrar, hojas[-1][2])
+        if not hojas: return None, None
+        with etapa('guardado_libro', salida='LIMPIO'):
+            limpio = _guardar(wb).getvalue()
+    except Exception as e:
+        avisar(f"⚠️ Error al borrar: {e}")
+        return None, None
+    try:
+        for ws, disp, merges, lista_agregar_dicts in hojas:
+            with etapa('insercion', filas=len(lista_agregar_dicts), hoja=ws.title):
+                _insertar_personas(ws, disp, lista_agregar_dicts, merges)
+        with etapa('guardado_libro', salida='FINAL'):
+            return limpio, _guardar(wb).getvalue()
+    except Exception as e:
+        avisar(f"❌ Error crítico generando el Excel: {e}")
+        return limpio, None
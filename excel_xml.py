@@ -0,0 +1,359 @@
+"""Exportación por parcheo directo del xlsx: sin cargar el libro en openpyxl.
+
+Solo se reescribe el XML de la hoja LISTA (valores, filas corridas, refs de merges) y
+styles.xml (un relleno rojo y un clon de cada xf pintado). Las demás partes del zip se
+copian byte a byte. Si la hoja usa algo que este motor no sabe correr (tablas, comentarios,
+hipervínculos, calcChain, fórmulas compartidas o matriciales), se levanta FormatoNoSoportado
+y se usa el motor openpyxl.
+"""
+import html
+import posixpath
+import re
+import zipfile
+from bisect import bisect_right, insort
+from io import BytesIO
+from xml.etree import ElementTree as ET
+from xml.sax.saxutils import escape
+
+from openpyxl.utils.cell import column_index_from_string, get_column_letter, range_boundaries
+
+from excel_lista import analizar_filas
+from medicion import etapa
+from normalizacion import abreviar_jerarquia, limpiar_nombre
+
+NS_MAIN = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+NS_REL = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+RELLENO_ROJO = '<fill><patternFill patternType="solid"><fgColor rgb="FFFF0000"/></patternFill></fill>'
+
+_RE_FILA = re.compile(r'<row\b[^>]*?(?:/>|>.*?</row>)', re.S)
+_RE_CELDA = re.compile(r'<c\b[^>]*?(?:/>|>.*?</c>)', re.S)
+_RE_XF = re.compile(r'<xf\b[^>]*?(?:/>|>.*?</xf>)', re.S)
+_RE_ATRIBUTO = re.compile(r'([\w:.-]+)\s*=\s*"([^"]*)"')
+_RE_REF = re.compile(r'([A-Z]+)(\d+)$')
+_RE_VALOR = re.compile(r'<v>(.*?)</v>', re.S)
+_RE_TEXTO = re.compile(r'<t\b[^>]*>(.*?)</t>', re.S)
+_RE_MERGE = re.compile(r'(<mergeCell\b[^>]*?\bref=")([^"]+)(")')
+_RE_ENTERO = re.compile(r'-?\d+$')
+_NO_SOPORTADO_AL_INSERTAR = ('<tableParts', '<hyperlinks', '<legacyDrawing')
+_RE_FORMULA_CON_RANGO = re.compile(r'<f\b[^>]*\bt="(?:shared|array|dataTable)"')  # llevan un ref que habría que correr; openpyxl las expande
+
+
+class FormatoNoSoportado(ValueError):
+    """El libro tiene partes que el parcheo directo no puede correr sin romperlas."""
+
+
+# --- XML MÍNIMO ---
+
+def _atributos(etiqueta):
+    """Atributos de la etiqueta de apertura, en su orden original (valores sin des-escapar)."""
+    return dict(_RE_ATRIBUTO.findall(etiqueta[:etiqueta.index('>')]))
+
+
+def _etiqueta(nombre, attrs, interior=None):
+    abre = '<' + nombre + ''.join(f' {k}="{v}"' for k, v in attrs.items())
+    return abre + '/>' if not interior else f'{abre}>{interior}</{nombre}>'
+
+
+def _interior(elemento):
+    if elemento.endswith('/>') and '>' not in elemento[:-2]: return ''
+    return elemento[elemento.index('>') + 1:elemento.rindex('</')]
+
+
+def _con_atributos(elemento, **nuevos):
+    """Mismo elemento con atributos reemplazados o agregados en su etiqueta de apertura."""
+    fin = elemento.index('>')
+    if elemento[fin - 1] == '/': fin -= 1
+    cabeza, resto = elemento[:fin], elemento[fin:]
+    for k, v in nuevos.items():
+        patron = re.compile(r'(\s' + re.escape(k) + r'\s*=\s*")[^"]*(")')
+        cabeza, n = patron.subn(lambda m: m.group(1) + v + m.group(2), cabeza)
+        if not n: cabeza += f' {k}="{v}"'
+    return cabeza + resto
+
+
+def _ref(col, fila):
+    return f'{get_column_letter(col)}{fila}'
+
+
+# --- LECTURA ---
+
+def _ruta_hoja(z):
+    """Ruta dentro del zip de la hoja 'LISTA' (o la primera), con el mismo criterio que hoja_lista."""
+    libro = ET.fromstring(z.read('xl/workbook.xml'))
+    hojas = [(h.get('name'), h.get(f'{{{NS_REL}}}id')) for h in libro.iter(f'{{{NS_MAIN}}}sheet')]
+    if not hojas: raise FormatoNoSoportado("el libro no tiene hojas")
+    rid = next((r for n, r in hojas if n == 'LISTA'), hojas[0][1])
+    rels = ET.fromstring(z.read('xl/_rels/workbook.xml.rels'))
+    destino = next((r.get('Target') for r in rels if r.get('Id') == rid), None)
+    if destino is None: raise FormatoNoSoportado("no se encuentra la hoja en workbook.xml.rels")
+    return destino.lstrip('/') if destino.startswith('/') else posixpath.normpath(posixpath.join('xl', destino))
+
+
+def _textos_compartidos(z):
+    if 'xl/sharedStrings.xml' not in z.namelist(): return []
+    t, r = f'{{{NS_MAIN}}}t', f'{{{NS_MAIN}}}r'
+    textos = []
+    for si in ET.fromstring(z.read('xl/sharedStrings.xml')):
+        # Texto plano o rich text; las lecturas fonéticas (rPh) se ignoran, como en openpyxl
+        partes = [e.text or '' for e in si if e.tag == t]
+        partes += [e.text or '' for hijo in si if hijo.tag == r for e in hijo if e.tag == t]
+        textos.append(''.join(partes))
+    return textos
+
+
+def _valor(attrs, interior, compartidos):
+    tipo = attrs.get('t', 'n')
+    if tipo == 'inlineStr': return ''.join(html.unescape(t) for t in _RE_TEXTO.findall(interior))
+    m = _RE_VALOR.search(interior)
+    if not m: return None
+    v = html.unescape(m.group(1))
+    if tipo == 's': return compartidos[int(v)]
+    if tipo == 'b': return bool(int(v))
+    if tipo != 'n': return v
+    try: return int(v) if _RE_ENTERO.match(v) else float(v)
+    except ValueError: return v
+
+
+class _Fila:
+    __slots__ = ('num', 'texto', 'celdas')
+
+    def __init__(self, num, texto):
+        self.num, self.texto, self.celdas = num, texto, None
+
+    def parsear(self):
+        """{col: [attrs, interior]} de las celdas presentes (se parsea una sola vez, a demanda)."""
+        if self.celdas is None:
+            self.celdas = {}
+            for m in _RE_CELDA.finditer(_interior(self.texto)):
+                celda = m.group(0); attrs = _atributos(celda)
+                ref = _RE_REF.match(attrs.get('r', ''))
+                if not ref: raise FormatoNoSoportado("celda sin referencia r")
+                self.celdas[column_index_from_string(ref.group(1))] = [attrs, _interior(celda)]
+        return self.celdas
+
+
+class LibroXml:
+    """Libro abierto como zip: la hoja LISTA se parsea una vez y puede exportarse varias veces."""
+
+    def __init__(self, archivo_bytes, clave=None):
+        self.archivo_bytes = archivo_bytes
+        with zipfile.ZipFile(BytesIO(archivo_bytes)) as z:
+            nombres = z.namelist()
+            self.ruta_hoja = _ruta_hoja(z)
+            self.tiene_calc_chain = 'xl/calcChain.xml' in nombres
+            self.estilos = z.read('xl/styles.xml').decode('utf-8')
+            hoja = z.read(self.ruta_hoja).decode('utf-8')
+            compartidos = _textos_compartidos(z)
+
+        i = hoja.find('<sheetData')
+        if i == -1: raise FormatoNoSoportado("hoja sin sheetData")
+        j = hoja.index('>', i) + 1
+        if hoja[j - 2] == '/':
+            self.cabeza, datos, self.cola = hoja[:j - 2] + '>', '', '</sheetData>' + hoja[j:]
+        else:
+            k = hoja.index('</sheetData>', j)
+            self.cabeza, datos, self.cola = hoja[:j], hoja[j:k], hoja[k:]
+
+        self.filas = []
+        for m in _RE_FILA.finditer(datos):
+            num = _atributos(m.group(0)).get('r')
+            if num is None: raise FormatoNoSoportado("fila sin número r")
+            self.filas.append(_Fila(int(num), m.group(0)))
+        self.pos_fila = {f.num: i for i, f in enumerate(self.filas)}
+        self.formulas_con_rango = _RE_FORMULA_CON_RANGO.search(datos) is not None
+        self.merges = [range_boundaries(m.group(2)) for m in _RE_MERGE.finditer(self.cola)]
+        self.disp = analizar_filas(self._valores(compartidos), clave)
+
+    def _valores(self, compartidos):
+        """Tuplas de valores por fila desde la 1, como iter_rows(values_only=True)."""
+        ultima = 0
+        for fila in self.filas:
+            yield from (() for _ in range(fila.num - ultima - 1))
+            celdas = fila.parsear()
+            valores = [None] * (max(celdas) if celdas else 0)
+            for col, (attrs, interior) in celdas.items(): valores[col - 1] = _valor(attrs, interior, compartidos)
+            ultima = fila.num
+            yield tuple(valores)
+
+    # --- EXPORTACIÓN ---
+    def exportar(self, lista_borrar, lista_agregar_dicts=()):
+        """Bytes del xlsx con los nombres borrados (y las personas insertadas en ARRIBO), o None sin jerarquía."""
+        disp = self.disp
+        if disp['col_jerarquia'] == -1: return None
+        col_j, col_n = disp['col_jerarquia'], disp['col_nombre']
+        target = disp['fila_arribo']
+        cantidad = len(lista_agregar_dicts) if target != -1 else 0
+        if cantidad and (self.tiene_calc_chain or self.formulas_con_rango or any(t in self.cola for t in _NO_SOPORTADO_AL_INSERTAR)):
+            raise FormatoNoSoportado("la hoja tiene referencias que habría que correr fuera de su XML")
+
+        def final(r):  # fila original -> fila tras la inserción
+            return r + cantidad if cantidad and r >= target else r
+
+        merges = self.merges
+        if cantidad:
+            merges = [(c1, r1 + cantidad if r1 >= target else r1, c2, r2 + cantidad if r2 >= target or r1 < target <= r2 else r2)
+                      for c1, r1, c2, r2 in merges]
+        ancla = _IndiceAnclas(merges).ancla
+
+        # ediciones[fila final] = {col: (blanco, pintar)}; las filas nuevas se indexan igual
+        ediciones = {}
+        def editar(fila, col, blanco=False, pintar=False):
+            b, p = ediciones.setdefault(fila, {}).get(col, (False, False))
+            ediciones[fila][col] = (b or blanco, p or pintar)
+
+        for nombre in set(limpiar_nombre(n) for n in lista_borrar):
+            for fila in disp['filas_por_nombre'].get(nombre, ()):
+                editar(final(fila), col_j, blanco=True); editar(final(fila), col_n, blanco=True)
+                for col in (col_j, col_n): editar(*ancla(final(fila), col), pintar=True)
+
+        nuevas = {}
+        if cantidad:
+            modelo = self._fila(target - 1)
+            attrs_modelo = _atributos(modelo.texto) if modelo else {}
+            plantilla = {col: a['s'] for col, (a, _) in (modelo.parsear().items() if modelo else ()) if a.get('s', '0') != '0'}
+            for i, persona in enumerate(lista_agregar_dicts):
+                fila = target + i
+                attrs = {'r': str(fila)}
+                if 'ht' in attrs_modelo: attrs.update(ht=attrs_modelo['ht'], customHeight='1')
+                celdas = {col: [{'r': _ref(col, fila), 's': s}, ''] for col, s in plantilla.items()}
+                valores = ((col_j, abreviar_jerarquia(str(persona['Jerarquia']))), (col_n, str(persona['Nombre']).upper()))
+                for col, texto in valores:
+                    a = celdas.setdefault(col, [{'r': _ref(col, fila)}, ''])[0]
+                    a['t'] = 'inlineStr'
+                    espacio = ' xml:space="preserve"' if texto != texto.strip() else ''
+                    celdas[col][1] = f'<is><t{espacio}>{escape(texto)}</t></is>'
+                nuevas[fila] = (attrs, celdas)
+                for col in (col_j, col_n): editar(*ancla(fila, col), pintar=True)
+
+        # Celdas ya existentes que hay que pintar: su xf define el clon rojo
+        celdas_finales = {}
+        for fila in ediciones:
+            if fila in nuevas: celdas_finales[fila] = nuevas[fila][1]
+            else:
+                original = self._fila(fila - cantidad if cantidad and fila >= target + cantidad else fila)
+                celdas_finales[fila] = {c: [dict(a), i] for c, (a, i) in original.parsear().items()} if original else {}
+        xfs = {int(celdas_finales[f].get(c, [{}])[0].get('s', 0)) for f, cols in ediciones.items() for c, (_, p) in cols.items() if p}
+        estilos, rojo = _agregar_relleno_rojo(self.estilos, xfs) if xfs else (self.estilos, {})
+
+        for fila, cols in ediciones.items():
+            celdas = celdas_finales[fila]
+            for col, (blanco, pintar) in cols.items():
+                attrs, interior = celdas.setdefault(col, [{'r': _ref(col, fila)}, ''])
+                if blanco:
+                    attrs.pop('t', None); celdas[col][1] = ''
+                if pintar: attrs['s'] = str(rojo[int(attrs.get('s', 0))])
+
+        hoja = self._escribir_hoja(target, cantidad, nuevas, celdas_finales, merges)
+        return self._empaquetar(hoja, estilos)
+
+    def _fila(self, num):
+        i = self.pos_fila.get(num)
+        return None if i is None else self.filas[i]
+
+    def _escribir_hoja(self, target, cantidad, nuevas, celdas_finales, merges):
+        def fila_xml(num, attrs, celdas):
+            attrs = {k: v for k, v in attrs.items() if k != 'spans'}; attrs['r'] = str(num)  # spans es solo una pista
+            interior = ''.join(_etiqueta('c', dict(a, r=_ref(col, num)), i) for col, (a, i) in sorted(celdas.items()))
+            return num, _etiqueta('row', attrs, interior)
+
+        salida = []
+        pendientes = sorted(nuevas)
+        for fila in self.filas:
+            num = fila.num
+            if cantidad and num >= target:
+                salida.extend(fila_xml(n, *nuevas[n]) for n in pendientes); pendientes = []
+                num += cantidad
+            if num in celdas_finales and num not in nuevas: salida.append(fila_xml(num, _atributos(fila.texto), celdas_finales[num]))
+            elif num != fila.num: salida.append((num, _correr_fila(fila.texto, cantidad)))
+            else: salida.append((num, fila.texto))
+        salida.extend(fila_xml(n, *nuevas[n]) for n in pendientes)
+        # Celdas a pintar en filas que no estaban en el XML (p. ej. el ancla de un merge vacío)
+        presentes = {num for num, _ in salida}
+        for num in sorted(set(celdas_finales) - presentes): insort(salida, fila_xml(num, {}, celdas_finales[num]))
+
+        cabeza, cola = self.cabeza, self.cola
+        if cantidad:
+            corridos = iter(merges)
+            cola = _RE_MERGE.sub(lambda m: m.group(1) + _rango(*next(corridos)) + m.group(3), cola)
+            cabeza = re.sub(r'(<dimension\b[^>]*?\bref=")([^"]+)(")', lambda m: m.group(1) + _correr_dimension(m.group(2), cantidad) + m.group(3), cabeza)
+        return cabeza + ''.join(texto for _, texto in salida) + cola
+
+    def _empaquetar(self, hoja, estilos):
+        salida = BytesIO()
+        with zipfile.ZipFile(BytesIO(self.archivo_bytes)) as origen, zipfile.ZipFile(salida, 'w') as destino:
+            for info in origen.infolist():
+                if info.filename == self.ruta_hoja: destino.writestr(info, hoja.encode('utf-8'), compress_type=zipfile.ZIP_DEFLATED)
+                elif info.filename == 'xl/styles.xml' and estilos is not self.estilos: destino.writestr(info, estilos.encode('utf-8'), compress_type=zipfile.ZIP_DEFLATED)
+                else: _copiar_crudo(origen, destino, info)
+        return salida.getvalue()
+
+
+def _copiar_crudo(origen, destino, info):
+    """Copia la parte sin tocar su contenido, con el mismo método de compresión."""
+    with origen.open(info) as f:
+        datos = f.read()
+    destino.writestr(info, datos, compress_type=info.compress_type)
+
+
+class _IndiceAnclas:
+    """Mismo criterio que IndiceMerges.ancla, sobre tuplas (min_col, min_row, max_col, max_row)."""
+
+    def __init__(self, rangos):
+        self.por_fila = {}
+        for c1, r1, c2, r2 in rangos:
+            for r in range(r1, r2 + 1): insort(self.por_fila.setdefault(r, []), (c1, c2, r1))
+
+    def ancla(self, row, col):
+        intervalos = self.por_fila.get(row)
+        if intervalos:
+            i = bisect_right(intervalos, (col, float('inf'))) - 1
+            if i >= 0 and col <= intervalos[i][1]: return intervalos[i][2], intervalos[i][0]
+        return row, col
+
+
+def _rango(c1, r1, c2, r2):
+    return f'{_ref(c1, r1)}:{_ref(c2, r2)}'
+
+
+def _correr_fila(texto, cantidad):
+    """Renumera la fila y las refs de sus celdas (las fórmulas no se traducen, igual que insert_rows)."""
+    texto = re.sub(r'(<row\b[^>]*?\br=")(\d+)(")', lambda m: m.group(1) + str(int(m.group(2)) + cantidad) + m.group(3), texto, count=1)
+    return re.sub(r'(<c\b[^>]*?\br="[A-Z]+)(\d+)(")', lambda m: m.group(1) + str(int(m.group(2)) + cantidad) + m.group(3), texto)
+
+
+def _correr_dimension(ref, cantidad):
+    if ':' not in ref: return ref
+    ini, fin = ref.split(':')
+    m = _RE_REF.match(fin)
+    return f'{ini}:{m.group(1)}{int(m.group(2)) + cantidad}' if m else ref
+
+
+def _agregar_relleno_rojo(estilos, xfs):
+    """styles.xml con un fill rojo más y un clon de cada xf de `xfs` que lo aplica. Devuelve (xml, {xf: clon})."""
+    m = re.search(r'<fills\b[^>]*>(.*?)</fills>', estilos, re.S)
+    c = re.search(r'<cellXfs\b[^>]*>(.*?)</cellXfs>', estilos, re.S)
+    if not m or not c: raise FormatoNoSoportado("styles.xml sin fills o cellXfs")
+    id_rojo = len(re.findall(r'<fill\b', m.group(1)))
+    fills = f'<fills count="{id_rojo + 1}">{m.group(1)}{RELLENO_ROJO}</fills>'
+
+    lista = _RE_XF.findall(c.group(1))
+    rojo = {}; clones = []
+    for xf in sorted(xfs):
+        if xf >= len(lista): raise FormatoNoSoportado(f"xf {xf} fuera de cellXfs")
+        rojo[xf] = len(lista) + len(clones)
+        clones.append(_con_atributos(lista[xf], fillId=str(id_rojo), applyFill='1'))
+    cell_xfs = f'<cellXfs count="{len(lista) + len(clones)}">{c.group(1)}{"".join(clones)}</cellXfs>'
+
+    estilos = estilos[:c.start()] + cell_xfs + estilos[c.end():]  # cellXfs va después de fills
+    return estilos[:m.start()] + fills + estilos[m.end():], rojo
+
+
+def generar_exportaciones_xml(archivo_bytes, lista_borrar, lista_agregar_dicts, clave=None):
+    """(LIMPIO_, FINAL_) en bytes con un solo parseo de la hoja; (None, None) si no hay columna de jerarquía."""
+    with etapa('carga_libro', motor='xml', bytes=len(archivo_bytes)):
+        libro = LibroXml(archivo_bytes, clave)
+    with etapa('guardado_libro', salida='LIMPIO', filas=len(lista_borrar)):
+        limpio = libro.exportar(lista_borrar)
+    if limpio is None: return None, None
+    with etapa('guardado_libro', salida='FINAL', filas=len(lista_agregar_dicts)):
+        return limpio, libro.exportar(lista_borrar, lista_agregar_dicts)
@@ -0,0 +1,86 @@
+"""Índice de candidatos para el matching difuso: trigramas sobre una clave fonética española.
+
+Los apellidos cambian sobre todo de grafía (B/V, LL/Y, S/Z/C, H muda, dobles letras) o pierden
+el segundo apellido. Cada palabra del nombre se pasa a su clave fonética y se indexan la clave
+entera y sus trigramas, pesados por rareza (idf). Para cada consulta se devuelven los `k`
+nombres de la LISTA más parecidos (coseno sobre esos rasgos: ante un nombre y sus versiones
+con más palabras, gana el nombre), y solo esos pares se puntúan con rapidfuzz.
+"""
+import re
+
+K_CANDIDATOS = 24
+CELDAS_POR_LOTE = 4_000_000  # tope de la matriz densa consulta × LISTA por lote
+
+_REGLAS_FONETICAS = [(re.compile(p), r) for p, r in (
+    (r'CH', 'x'),              # se protege antes de quitar la H
+    (r'QU(?=[EI])', 'K'), (r'C(?=[EI])', 'S'), (r'C', 'K'), (r'Q', 'K'), (r'Z', 'S'),
+    (r'GU(?=[EI])', 'g'),      # G fuerte (GUERRA, MIGUEL): se protege de la regla de la G suave
+    (r'G(?=[EI])', 'J'),
+    (r'H', ''), (r'[VW]', 'B'), (r'LL', 'Y'), (r'X', 'KS'), (r'x', 'CH'), (r'g', 'G'),
+    (r'(.)\1+', r'\1'),        # dobles letras
+)]
+
+
+def clave_fonetica(palabra):
+    """GONZÁLEZ/GONSALES -> GONSALES, VILLALBA/BIYALBA -> BIYALBA, GUERRA -> GERA, GERMÁN -> JERMAN (la palabra ya viene limpia y en mayúsculas)."""
+    for patron, reemplazo in _REGLAS_FONETICAS: palabra = patron.sub(reemplazo, palabra)
+    return palabra
+
+
+def nombre_fonetico(nombre):
+    """Nombre limpio con cada palabra en su clave fonética: GONZALES PERES JUAN == GONZÁLEZ PÉREZ JUAN."""
+    return " ".join(clave_fonetica(p) for p in str(nombre).split())
+
+
+class IndiceCandidatos:
+    """Índice sobre los nombres limpios de la LISTA (o de un bloque); se arma una vez y se consulta por lotes."""
+
+    def __init__(self, nombres):
+        import numpy as np  # numpy y scipy recién al armar un índice: main.py solo lee K_CANDIDATOS en el primer render
+
+        self._vocabulario = {}  # rasgo -> columna
+        self._por_palabra = {}  # palabra -> columnas de sus rasgos (las palabras se repiten mucho)
+        self.matriz = self._rasgos(nombres, crear=True).astype(bool).astype(np.float32).T.tocsr()  # rasgos × LISTA
+        frecuencia = np.asarray(self.matriz.sum(axis=1)).ravel()
+        self.idf = np.log1p(len(nombres) / np.maximum(frecuencia, 1)).astype(np.float32)
+        self.norma = np.sqrt(np.asarray(self.matriz.multiply(self.idf[:, None] ** 2).sum(axis=0)).ravel()) + 1e-6
+
+    def _columnas(self, palabra, crear):
+        cols = self._por_palabra.get(palabra)
+        if cols is None:
+            clave = clave_fonetica(palabra); rellena = f" {clave} "
+            rasgos = {'#' + clave} | {rellena[i:i + 3] for i in range(len(rellena) - 2)}
+            # las consultas no agrandan el vocabulario ni la caché con palabras que no están en la LISTA
+            if not crear: return [self._vocabulario[r] for r in rasgos if r in self._vocabulario]
+            cols = self._por_palabra[palabra] = [self._vocabulario.setdefault(r, len(self._vocabulario)) for r in rasgos]
+        return cols
+
+    def _rasgos(self, nombres, crear=False):
+        import numpy as np
+        from scipy import sparse
+
+        filas, cols = [], []
+        for i, nombre in enumerate(nombres):
+            c = {col for palabra in str(nombre).split() for col in self._columnas(palabra, crear)}
+            filas.extend([i] * len(c)); cols.extend(c)
+        return sparse.csr_matrix((np.ones(len(filas), dtype=np.float32), (filas, cols)), shape=(len(nombres), len(self._vocabulario)))
+
+    def candidatos(self, consultas, k=K_CANDIDATOS):
+        """(filas, cols): para cada consulta, hasta k posiciones de la LISTA con algún rasgo en común."""
+        import numpy as np
+
+        n_l = self.matriz.shape[1]
+        if not len(consultas) or not n_l: return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        pesos = self._rasgos(consultas).multiply(self.idf).tocsr()
+        lote = max(1, CELDAS_POR_LOTE // n_l)
+        filas, cols = [], []
+        for ini in range(0, len(consultas), lote):
+            s = (pesos[ini:ini + lote] @ self.matriz).toarray() / self.norma
+            if k < n_l:
+                mejores = np.argpartition(-s, k - 1, axis=1)[:, :k]
+            else:
+                mejores = np.broadcast_to(np.arange(n_l), s.shape)
+            f = np.repeat(np.arange(s.shape[0]), mejores.shape[1]); c = mejores.ravel()
+            con_algo = s[f, c] > 0
+            filas.append(f[con_algo] + ini); cols.append(c[con_algo])
+        return np.concatenate(filas).astype(np.int64), np.concatenate(cols).astype(np.int64)
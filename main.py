@@ -1,32 +1,52 @@
 import streamlit as st
-import pandas as pd
-from io import StringIO, BytesIO
-from thefuzz import fuzz
-import re
-import unicodedata
-import openpyxl
-from copy import copy
-from openpyxl.worksheet.cell_range import MultiCellRange
-from openpyxl.utils.cell import range_boundaries, get_column_letter
-from openpyxl.styles import PatternFill
+from io import BytesIO
 import logging
 import base64
+import hashlib
+import importlib
 import os
+import threading
+import medicion
+import decisiones
+import trabajos
+from indice import K_CANDIDATOS
+# pandas, numpy, motor y conciliacion (fuzz, openpyxl, scipy) y excel_salida se importan recién al usarlos: el primer render no los paga
 
 # --- CONFIGURACIÓN ---
 logging.basicConfig(level=logging.ERROR, format='%(asctime)s - %(levelname)s - %(message)s')
 st.set_page_config(page_title="Control PSA V33.0", layout="wide", page_icon="🛡️")
 
 # --- FUNCIONES AUXILIARES (IMAGEN) ---
-def get_img_as_base64(file_path):
-    """Lee una imagen local y la convierte a base64 para HTML"""
+GIF_LADO_PX = 70  # tamaño con el que se muestra en .success-gif-container
+
+def miniatura_gif(datos, lado):
+    """GIF animado reducido a lado×lado (todos los cuadros, mismos tiempos). Sin Pillow devuelve el original."""
+    try:
+        from PIL import Image, ImageSequence
+    except ImportError:
+        return datos
+    im = Image.open(BytesIO(datos))
+    cuadros = [c.convert("RGBA").resize((lado, lado), Image.LANCZOS) for c in ImageSequence.Iterator(im)]
+    duraciones = [c.info.get("duration", im.info.get("duration", 100)) for c in ImageSequence.Iterator(im)]
+    salida = BytesIO()
+    cuadros[0].save(salida, format="GIF", save_all=True, append_images=cuadros[1:], duration=duraciones, loop=im.info.get("loop", 0), optimize=True)
+    return salida.getvalue()
+
+@st.cache_resource(show_spinner=False)
+def gif_exito_b64(file_path="ok.gif", lado=GIF_LADO_PX):
+    """ok.gif leído, reducido y codificado una sola vez por proceso (~60 KB de base64 en vez de ~1.9 MB por render)."""
     try:
         with open(file_path, "rb") as f:
-            data = f.read()
-        return base64.b64encode(data).decode()
+            datos = f.read()
+        return base64.b64encode(miniatura_gif(datos, lado)).decode()
     except Exception:
         return None
 
+@st.cache_resource(show_spinner=False)
+def memoria_decisiones():
+    """Almacén SQLite de decisiones, leído una sola vez por proceso y compartido entre sesiones."""
+    return decisiones.AlmacenDecisiones()
+
 # --- ESTILOS CSS ---
 st.markdown("""
 <style>
@@ -137,337 +157,167 @@ st.markdown("""
 
 st.title("🛡️ CONTROL DE PERSONAL V33")
 
-# --- CONSTANTES ---
-EQUIVALENCIAS = {
-    "oficial ayudante": "OFICIAL AYUDANTE", "of ayte": "OFICIAL AYUDANTE", "of. ayte": "OFICIAL AYUDANTE", "ayte": "OFICIAL AYUDANTE",
-    "oficial principal": "OFICIAL PRINCIPAL", "of ppal": "OFICIAL PRINCIPAL", "of. ppal": "OFICIAL PRINCIPAL", "ppal": "OFICIAL PRINCIPAL",
-    "oficial mayor": "OFICIAL MAYOR", "of mayor": "OFICIAL MAYOR", "of. mayor": "OFICIAL MAYOR",
-    "oficial jefe": "OFICIAL JEFE", "of jefe": "OFICIAL JEFE", "of. jefe": "OFICIAL JEFE",
-    "subinspector": "SUBINSPECTOR", "sub inspector": "SUBINSPECTOR", "subinsp": "SUBINSPECTOR",
-    "inspector": "INSPECTOR", "insp": "INSPECTOR",
-    "comisionado mayor": "COMISIONADO MAYOR", "cdo mayor": "COMISIONADO MAYOR", "cdo. mayor": "COMISIONADO MAYOR", "com mayor": "COMISIONADO MAYOR",
-    "comisionado general": "COMISIONADO GENERAL", "cdo general": "COMISIONADO GENERAL", "cdo. general": "COMISIONADO GENERAL", "cdo gral": "COMISIONADO GENERAL",
-    "psa": "PSA", "aux": "AUXILIAR", "auxiliar": "AUXILIAR"
-}
-
 # --- ESTADOS ---
 if 'analisis_listo' not in st.session_state: st.session_state.analisis_listo = False
-if 'df_faltan' not in st.session_state: st.session_state.df_faltan = []
-if 'df_sobran' not in st.session_state: st.session_state.df_sobran = pd.DataFrame()
-if 'detective_candidates' not in st.session_state: st.session_state.detective_candidates = []
+if 'resultado' not in st.session_state: st.session_state.resultado = None  # ResultadoAnalisis: compartido, no se modifica
 if 'total_parte' not in st.session_state: st.session_state.total_parte = 0
 if 'total_lista' not in st.session_state: st.session_state.total_lista = 0
 if 'checked_items' not in st.session_state: st.session_state.checked_items = set()
-if 'confirmed_pairs' not in st.session_state: st.session_state.confirmed_pairs = {} 
-if 'rejected_pairs' not in st.session_state: st.session_state.rejected_pairs = {}
-
-# --- FUNCIONES DE LIMPIEZA ---
-@st.cache_data
-def normalizar_jerarquia(texto):
-    if pd.isna(texto): return ""
-    texto_limpio = str(texto).strip().lower()
-    if texto_limpio in EQUIVALENCIAS: return EQUIVALENCIAS[texto_limpio]
-    for key, value in EQUIVALENCIAS.items():
-        if key in texto_limpio: return value
-    return "" 
-
-@st.cache_data
-def limpiar_nombre(texto):
-    if pd.isna(texto): return ""
-    texto = str(texto)
-    texto = re.sub(r'\([^)]*\)', '', texto)
-    texto = ''.join(c for c in unicodedata.normalize('NFD', texto) if unicodedata.category(c) != 'Mn')
-    texto = re.sub(r'[^a-zA-Z\s]', '', texto)
-    return texto.strip().upper()
-
-def abreviar_jerarquia(texto):
-    if pd.isna(texto): return ""
-    t = str(texto).upper()
-    t = t.replace("OFICIAL", "OF")
-    t = t.replace("AYUDANTE", "AYTE")
-    t = t.replace("PRINCIPAL", "PPAL")
-    return t
-
-def leer_excel_inteligente(archivo_bytes, filename):
-    try:
-        xls = pd.ExcelFile(BytesIO(archivo_bytes))
-        sheet_name = 'LISTA' if 'LISTA' in xls.sheet_names else xls.sheet_names[0]
-        df = pd.read_excel(xls, sheet_name=sheet_name, header=None)
-        best_col_idx = -1; max_matches = 0
-        for col_idx in range(len(df.columns)):
-            col_data = df.iloc[:, col_idx].astype(str).str.lower()
-            matches = col_data.apply(lambda x: any(k in x for k in EQUIVALENCIAS.keys())).sum()
-            if matches > max_matches: max_matches = matches; best_col_idx = col_idx
-        if best_col_idx != -1 and max_matches > 0 and best_col_idx + 1 < len(df.columns):
-            subset = df.iloc[:, [best_col_idx, best_col_idx+1]].copy()
-            subset.columns = ['Jerarquia', 'Nombre']
-            return subset
-        return None
-    except: return None
-
-def procesar_input(texto_input, archivo_input):
-    df = None
-    if archivo_input:
-        file_bytes = archivo_input.getvalue()
-        if archivo_input.name.endswith('csv'):
-            try: df = pd.read_csv(archivo_input, header=None); df = df.iloc[:, :2]; df.columns = ['Jerarquia', 'Nombre']
-            except: pass
-        else:
-            df = leer_excel_inteligente(file_bytes, archivo_input.name)
-    elif texto_input:
-        try:
-            df = pd.read_csv(StringIO(texto_input), sep='\t', header=None, engine='python')
-            if len(df.columns) < 2: df = pd.read_csv(StringIO(texto_input), sep=',', header=None, engine='python')
-            df = df.iloc[:, :2]; df.columns = ['Jerarquia', 'Nombre']
-        except: pass
-    
-    if df is not None and not df.empty:
-        df['j_norm'] = df['Jerarquia'].apply(normalizar_jerarquia)
-        df = df[df['j_norm'] != ""] 
-        df['n_clean'] = df['Nombre'].apply(limpiar_nombre)
-        df['unique_id'] = df['Nombre'] + "_" + df.index.astype(str)
-        return df
-    return None
-
-# --- EXCEL CORE: HELPERS PARA CORRECCIÓN DE FORMATO Y COLOR ---
-
-RED_FILL = PatternFill(fill_type="solid", fgColor="FFFF0000") # Rojo Intenso
-
-def _merge_anchor(ws, row: int, col: int):
-    """Si (row,col) cae dentro de un merge, devuelve la celda ancla (min_row,min_col)."""
-    for rng in ws.merged_cells.ranges:
-        if rng.min_row <= row <= rng.max_row and rng.min_col <= col <= rng.max_col:
-            return rng.min_row, rng.min_col
-    return row, col
-
-def pintar_celda(ws, row: int, col: int, fill):
-    r, c = _merge_anchor(ws, row, col)
-    ws.cell(row=r, column=c).fill = fill
-
-def pintar_cambio(ws, row: int, col_jerarquia: int, col_nombre: int, fill=RED_FILL):
-    # pinta jerarquía + nombre (respetando merges)
-    pintar_celda(ws, row, col_jerarquia, fill)
-    pintar_celda(ws, row, col_nombre, fill)
-
-def desplazar_merges_por_insercion(ws, fila_insercion: int, cantidad: int):
-    old_ranges = [str(rng) for rng in ws.merged_cells.ranges]
-    ws.merged_cells = MultiCellRange() 
-
-    for r in old_ranges:
-        min_col, min_row, max_col, max_row = range_boundaries(r)
-        if max_row < fila_insercion:
-            new_r = r 
-        elif min_row >= fila_insercion:
-            new_r = f"{get_column_letter(min_col)}{min_row + cantidad}:{get_column_letter(max_col)}{max_row + cantidad}"
-        else:
-            new_r = f"{get_column_letter(min_col)}{min_row}:{get_column_letter(max_col)}{max_row + cantidad}"
-        ws.merge_cells(new_r)
-
-def snapshot_row_dims(ws, desde_fila: int):
-    snap = {}
-    for r, dim in list(ws.row_dimensions.items()):
-        if r >= desde_fila:
-            snap[r] = {
-                "height": dim.height, "hidden": dim.hidden, "outlineLevel": dim.outlineLevel,
-                "collapsed": dim.collapsed, "thickTop": dim.thickTop, "thickBot": dim.thickBot
-            }
-    return snap
-
-def aplicar_row_dims_corridos(ws, snap, desde_fila: int, cantidad: int):
-    for r in list(ws.row_dimensions.keys()):
-        if r >= desde_fila: del ws.row_dimensions[r]
-    for old_r in sorted(snap.keys()):
-        new_r = old_r + cantidad
-        dim = ws.row_dimensions[new_r]
-        props = snap[old_r]
-        for k, v in props.items(): 
-            if hasattr(dim, k): setattr(dim, k, v)
-
-# --- GENERADORES EXCEL ---
-
-def borrar_sobrantes_excel(archivo_original, lista_nombres_borrar):
-    # Función "Solo Borrar"
-    try:
-        wb = openpyxl.load_workbook(archivo_original)
-        sheet_name = 'LISTA' if 'LISTA' in wb.sheetnames else wb.sheetnames[0]
-        ws = wb[sheet_name]
-        col_jerarquia = -1; col_nombre = -1; max_matches = 0
-        for col in range(1, 20):
-            matches = 0
-            for row in range(1, 50):
-                val = str(ws.cell(row=row, column=col).value).lower()
-                if any(k in val for k in EQUIVALENCIAS.keys()): matches += 1
-            if matches > max_matches: max_matches = matches; col_jerarquia = col; col_nombre = col + 1 
-        if col_jerarquia == -1: return None 
-        
-        nombres_a_borrar_limpios = set([limpiar_nombre(n) for n in lista_nombres_borrar])
-        for row in ws.iter_rows(min_row=1, max_row=ws.max_row):
-            cell_nombre = row[col_nombre - 1]
-            if not cell_nombre.value: continue
-            val_nombre_limpio = limpiar_nombre(str(cell_nombre.value))
-            if val_nombre_limpio in nombres_a_borrar_limpios:
-                ws.cell(row=cell_nombre.row, column=col_jerarquia).value = None
-                cell_nombre.value = None
-                # 🔴 Marcar cambio en rojo al borrar
-                pintar_cambio(ws, cell_nombre.row, col_jerarquia, col_nombre, RED_FILL)
-
-        output = BytesIO(); wb.save(output); output.seek(0)
-        return output
-    except Exception as e:
-        st.error(f"⚠️ Error al borrar: {e}")
-        return None
+if 'confirmed_pairs' not in st.session_state: st.session_state.confirmed_pairs = decisiones.IndiceDecisiones()
+if 'rejected_pairs' not in st.session_state: st.session_state.rejected_pairs = decisiones.IndiceDecisiones()
+if 'estado_matching' not in st.session_state: st.session_state.estado_matching = None
+if 'huellas_decision' not in st.session_state: st.session_state.huellas_decision = {}  # (uid_f, uid_s) -> (huella PARTE, huella LISTA)
 
-def generar_excel_completo(archivo_original, lista_borrar, lista_agregar_dicts):
-    # Función "Todo en Uno": Borra + Agrega
-    try:
-        wb = openpyxl.load_workbook(archivo_original)
-        sheet_name = 'LISTA' if 'LISTA' in wb.sheetnames else wb.sheetnames[0]
-        ws = wb[sheet_name]
-        
-        col_jerarquia = -1; col_nombre = -1; max_matches = 0
-        for col in range(1, 20):
-            matches = 0
-            for row in range(1, 50):
-                val = str(ws.cell(row=row, column=col).value).lower()
-                if any(k in val for k in EQUIVALENCIAS.keys()): matches += 1
-            if matches > max_matches: max_matches = matches; col_jerarquia = col; col_nombre = col + 1 
-        if col_jerarquia == -1: return None 
-
-        # 1. BORRAR (Si hay lista de borrado)
-        if lista_borrar:
-            nombres_a_borrar_limpios = set([limpiar_nombre(n) for n in lista_borrar])
-            for row in ws.iter_rows(min_row=1, max_row=ws.max_row):
-                cell_nombre = row[col_nombre - 1]
-                if not cell_nombre.value: continue
-                val_nombre_limpio = limpiar_nombre(str(cell_nombre.value))
-                if val_nombre_limpio in nombres_a_borrar_limpios:
-                    ws.cell(row=cell_nombre.row, column=col_jerarquia).value = None
-                    cell_nombre.value = None
-                    # 🔴 Marcar cambio en rojo al borrar
-                    pintar_cambio(ws, cell_nombre.row, col_jerarquia, col_nombre, RED_FILL)
-
-        # 2. INSERTAR
-        target_row = -1
-        for row in range(1, ws.max_row + 1):
-            row_values = [str(ws.cell(row=row, column=c).value).upper() for c in range(1, 10)]
-            row_str = " ".join([v for v in row_values if v != 'None'])
-            if "ARRIBO A2" in row_str or "ARRIBOS A2" in row_str:
-                target_row = row
-                break
-        
-        if target_row != -1 and len(lista_agregar_dicts) > 0:
-            count = len(lista_agregar_dicts)
-            snap_dims = snapshot_row_dims(ws, target_row)
-            
-            ws.insert_rows(target_row, amount=count)
-            desplazar_merges_por_insercion(ws, target_row, count)
-            aplicar_row_dims_corridos(ws, snap_dims, target_row, count)
-            
-            source_row_idx = target_row - 1
-            model_dim = ws.row_dimensions[source_row_idx]
-            for i in range(count):
-                rd = ws.row_dimensions[target_row + i]
-                if model_dim.height is not None:
-                    rd.height = model_dim.height
-            
-            for i, persona in enumerate(lista_agregar_dicts):
-                current_row = target_row + i
-                for col in range(1, ws.max_column + 1):
-                    source_cell = ws.cell(row=source_row_idx, column=col)
-                    target_cell = ws.cell(row=current_row, column=col)
-                    if source_cell.has_style:
-                        target_cell.font = copy(source_cell.font)
-                        target_cell.border = copy(source_cell.border)
-                        target_cell.fill = copy(source_cell.fill)
-                        target_cell.number_format = copy(source_cell.number_format)
-                        target_cell.protection = copy(source_cell.protection)
-                        target_cell.alignment = copy(source_cell.alignment)
-                
-                jerarquia_corta = abreviar_jerarquia(str(persona['Jerarquia']))
-                ws.cell(row=current_row, column=col_jerarquia).value = jerarquia_corta
-                ws.cell(row=current_row, column=col_nombre).value = str(persona['Nombre']).upper()
-                
-                # 🔴 Marcar cambio en rojo al agregar (DESPUÉS DE COPIAR ESTILOS)
-                pintar_cambio(ws, current_row, col_jerarquia, col_nombre, RED_FILL)
-
-        output = BytesIO(); wb.save(output); output.seek(0)
-        return output
-    except Exception as e:
-        st.error(f"❌ Error crítico generando el Excel: {e}")
-        return None
+@st.cache_data(max_entries=16, show_spinner="Generando Excel...")
+def exportaciones_memo(file_hash, borrar, agregar, motor_excel, _archivo_bytes):
+    """Memoizado por (hash del archivo, conjunto a borrar, personas a agregar, motor): un rerun sin cambios no toca el libro."""
+    from excel_salida import generar_exportaciones
+
+    personas = [{'Jerarquia': j, 'Nombre': n} for j, n in agregar]
+    return generar_exportaciones(BytesIO(_archivo_bytes), list(borrar), personas, clave=file_hash, motor_excel=motor_excel, avisar=st.error)
+
+@st.cache_data(max_entries=8, show_spinner="Generando Excel...")
+def exportaciones_hojas_memo(file_hash, cambios, _archivo_bytes):
+    """Igual que exportaciones_memo para el modo multi-hoja: cambios = ((hoja, borrar, agregar), ...)."""
+    from excel_salida import generar_exportaciones_hojas
+
+    por_hoja = {hoja: (list(borrar), [{'Jerarquia': j, 'Nombre': n} for j, n in agregar]) for hoja, borrar, agregar in cambios}
+    return generar_exportaciones_hojas(BytesIO(_archivo_bytes), por_hoja, clave=file_hash, avisar=st.error)
 
 # --- ANALISIS ---
-def detecting_duplicados(df, nombre_origen):
-    if df is None or df.empty: return
-    duplicados = df[df.duplicated(subset=['n_clean'], keep=False)]
-    if not duplicados.empty:
-        nombres = [str(n) for n in duplicados['Nombre'].unique()]
-        st.markdown(f'<div class="duplicate-alert">⚠️ <b>Duplicados en {nombre_origen}:</b> {", ".join(nombres[:3])}...</div>', unsafe_allow_html=True)
-
-def calcular_analisis(df_p, df_l, umbral_det, umbral_auto):
-    sobran = df_l.copy(); sobran['found'] = False
-    faltan_temp = [] 
-    for idx_p, row_p in df_p.iterrows():
-        candidatos = sobran[sobran['j_norm'] == row_p['j_norm']]
-        encontrado = False
-        for idx_l, row_l in candidatos.iterrows():
-            if row_l['found']: continue
-            if fuzz.token_set_ratio(row_p['n_clean'], row_l['n_clean']) >= umbral_auto:
-                encontrado = True; sobran.at[idx_l, 'found'] = True; break
-        if not encontrado:
-            for idx_l, row_l in sobran.iterrows():
-                if row_l['found']: continue
-                pair_id = f"{row_p['unique_id']}|{row_l['unique_id']}"
-                if pair_id in st.session_state.confirmed_pairs:
-                    encontrado = True; sobran.at[idx_l, 'found'] = True; break
-        if not encontrado: faltan_temp.append(row_p)
-    detective_matches = [] 
-    df_sobran_reales = sobran[~sobran['found']]
-    for f in faltan_temp:
-        best_match = None; best_score = 0
-        for idx_s, s in df_sobran_reales.iterrows():
-            pair_id = f"{f['unique_id']}|{s['unique_id']}"
-            if pair_id in st.session_state.rejected_pairs: continue 
-            score = fuzz.token_sort_ratio(f['n_clean'], s['n_clean'])
-            if score > umbral_det and score < umbral_auto: 
-                if score > best_score: best_score = score; best_match = s
-        if best_match is not None:
-            detective_matches.append({'falta': f, 'sobra': best_match})
-    return faltan_temp, df_sobran_reales, detective_matches
-
-def ejecutar_analisis_completo(pf, lf):
-    with st.spinner("Procesando..."):
-        st.session_state.analisis_listo = False
-        df_p = procesar_input(st.session_state.p_txt, pf)
-        df_l = procesar_input(st.session_state.l_txt, lf)
-        if df_p is not None and df_l is not None:
-            detecting_duplicados(df_p, "PARTE")
-            detecting_duplicados(df_l, "LISTA")
-            u_auto = st.session_state.get('umbral_auto', 95)
-            u_det = st.session_state.get('umbral_det', 65)
-            faltan, sobran, detective = calcular_analisis(df_p, df_l, u_det, u_auto)
-            st.session_state.df_faltan = faltan
-            st.session_state.df_sobran = sobran
-            st.session_state.detective_candidates = detective
-            st.session_state.total_parte = len(df_p)
-            st.session_state.total_lista = len(df_l)
-            st.session_state.analisis_listo = True
-        else:
-            st.error("Error: Datos no válidos.")
+@st.cache_resource(show_spinner=False)
+def ejecutor_analisis():
+    """Pool de análisis compartido por todas las sesiones del proceso."""
+    return trabajos.Ejecutor()
+
+@st.cache_resource(show_spinner=False)
+def precargar_nucleo():
+    """Importa el núcleo en un hilo aparte, una vez por proceso: el primer ANALIZAR no espera pandas/openpyxl/scipy."""
+    def precargar():
+        for modulo in ("conciliacion", "excel_salida"): importlib.import_module(modulo)
+    threading.Thread(target=precargar, name="precarga", daemon=True).start()
+
+def mostrar_duplicados():
+    """Aviso por origen con los grupos completos de posibles duplicados (conciliacion.detectar_duplicados)."""
+    import pandas as pd
+
+    for nombre_origen, grupos in st.session_state.get('duplicados', {}).items():
+        if not grupos: continue
+        filas = sum(len(g['ids']) for g in grupos)
+        st.markdown(f'<div class="duplicate-alert">⚠️ <b>Posibles duplicados en {nombre_origen}:</b> {len(grupos)} grupos, {filas} filas</div>', unsafe_allow_html=True)
+        with st.expander(f"Ver duplicados de {nombre_origen}"):
+            st.dataframe(pd.DataFrame([{'Grupo': n, 'Jerarquia': g['jerarquia'], 'Nombre': nombre, 'Idéntico': g['exacto']}
+                                       for n, g in enumerate(grupos, start=1) for nombre in g['nombres']]), hide_index=True, use_container_width=True)
+
+def firma_entradas(lf):
+    """Huella de lo cargado (textos y contenido del archivo): si cambia, el análisis en curso ya no sirve."""
+    h = hashlib.sha1(f"{st.session_state.p_txt}\x00{st.session_state.l_txt}\x00".encode())
+    if lf is not None: h.update(lf.getvalue())
+    return h.hexdigest()
+
+def lanzar_analisis(pf, lf):
+    """Encola el análisis en el ejecutor compartido; la sesión guarda el Trabajo y la UI sigue respondiendo."""
+    import conciliacion
+
+    cancelar_analisis()
+    st.session_state.analisis_listo = False
+    vectorizado = st.session_state.get('motor_vectorizado', True)
+    memoria = memoria_decisiones().instantanea()  # lo que lee el trabajo es exactamente la versión de la clave
+    firma = firma_entradas(lf)
+    parametros = dict(umbral_det=st.session_state.get('umbral_det', 65), umbral_auto=st.session_state.get('umbral_auto', 95), vectorizado=vectorizado,
+                      detective_optimo=st.session_state.get('detective_optimo', True), perfilar=st.session_state.pop('perfilar_proximo', False),
+                      base_delta=(lf.name if lf is not None else "texto") if st.session_state.get('modo_delta') else None,
+                      candidatos=K_CANDIDATOS if st.session_state.get('indice_fonetico') else 0)
+    # Copias: las decisiones de la sesión pueden cambiar mientras el trabajo corre
+    confirmados = st.session_state.confirmed_pairs.copia(); rechazados = st.session_state.rejected_pairs.copia()
+    multihoja = st.session_state.get('modo_multihoja') and lf is not None
+    clave = hashlib.sha1(repr((firma, multihoja, sorted(parametros.items()), confirmados.pares(), rechazados.pares(), memoria.version)).encode()).hexdigest()
+    archivo_p = None
+    if pf is not None: archivo_p = BytesIO(pf.getvalue()); archivo_p.name = pf.name
+    archivo_l = None
+    if lf is not None: archivo_l = BytesIO(lf.getvalue()); archivo_l.name = lf.name
+    if multihoja:
+        # Las hojas se reparten entre procesos; las decisiones por unique_id y el modo delta son de una sola hoja
+        parametros.pop('base_delta')
+        pool = trabajos.pool_procesos() if trabajos.PROCESOS > 1 else None
+        st.session_state.trabajo_analisis = ejecutor_analisis().enviar(clave, conciliacion.analisis_hojas, st.session_state.p_txt, archivo_p, archivo_l, memoria=memoria, pool=pool, **parametros)
+    else:
+        st.session_state.trabajo_analisis = ejecutor_analisis().enviar(clave, conciliacion.analisis_completo, st.session_state.p_txt, archivo_p, st.session_state.l_txt, archivo_l,
+                                                                       confirmados=confirmados, rechazados=rechazados, memoria=memoria, **parametros)
+    st.session_state.firma_trabajo = firma
+
+def cancelar_analisis():
+    trabajo = st.session_state.pop('trabajo_analisis', None)
+    if trabajo is not None and not trabajo.hecho: ejecutor_analisis().cancelar(trabajo)
+
+def publicar_analisis(trabajo):
+    """Vuelca a la sesión el resultado de un Trabajo terminado."""
+    st.session_state.pop('trabajo_analisis', None)
+    try:
+        r = trabajo.resultado()
+    except trabajos.Cancelado:
+        return
+    except Exception as e:
+        st.error(f"Error en el análisis: {e}"); return
+    st.session_state.tiempos_analisis = r['crono']
+    if r['perfil']: st.session_state.ultimo_perfil = r['perfil']
+    if r['info_carga']: st.session_state.info_carga = r['info_carga']
+    if r['error']: st.error(f"Error: {r['error']}"); return
+    st.session_state.duplicados = r['duplicados']
+    st.session_state.resultado_hojas = r.get('hojas')
+    if r.get('hojas') is not None:
+        st.session_state.total_parte = r['total_parte']
+        st.session_state.analisis_listo = True
+        return
+    # El resultado puede ser compartido con otra sesión: la tabla se comparte, del EstadoMatching solo se copian las máscaras
+    st.session_state.resumen_delta = r['resumen_delta']
+    st.session_state.resultado = r['resultado']
+    st.session_state.estado_matching = r['estado'].copia() if r['estado'] is not None else None
+    st.session_state.total_parte = r['total_parte']
+    st.session_state.total_lista = r['total_lista']
+    st.session_state.analisis_listo = True
+
+@st.fragment(run_every=0.5)
+def progreso_analisis():
+    """Barra de progreso que se refresca sola; al terminar el trabajo dispara un rerun completo para publicarlo."""
+    trabajo = st.session_state.get('trabajo_analisis')
+    if trabajo is None: return
+    if trabajo.hecho: st.rerun()
+    c1, c2 = st.columns([5, 1], vertical_alignment="center")
+    c1.progress(trabajo.progreso, text=f"{trabajo.texto}... {trabajo.progreso:.0%}")
+    c2.button("Cancelar", key="cancelar_analisis", on_click=cancelar_analisis, type="secondary")
 
 # --- HISTORIAL & ACTIONS ---
+def aplicar_decision(accion, uid_f, uid_s, pf, lf):
+    # Con estado vigente solo se mueven las filas afectadas; si no, re-análisis completo
+    estado = st.session_state.get('estado_matching')
+    if estado is None or not st.session_state.analisis_listo or not estado.conoce(uid_f, uid_s):
+        lanzar_analisis(pf, lf); return
+    getattr(estado, accion)(uid_f, uid_s)  # la vista se recalcula desde el estado en el próximo rerun
+
+def recordar_decision(tipo, f, s, etiqueta):
+    hp, hl = decisiones.huella(f['j_norm'], f['n_clean']), decisiones.huella(s['j_norm'], s['n_clean'])
+    st.session_state.huellas_decision[(f['unique_id'], s['unique_id'])] = (hp, hl)
+    memoria_decisiones().guardar(tipo, hp, hl, etiqueta)
+
 def confirmar_match(f, s, pf, lf):
-    st.session_state.confirmed_pairs[f"{f['unique_id']}|{s['unique_id']}"] = f"{f['Nombre']} ↔ {s['Nombre']}"
-    ejecutar_analisis_completo(pf, lf)
+    etiqueta = f"{f['Nombre']} ↔ {s['Nombre']}"
+    st.session_state.confirmed_pairs.agregar(f['unique_id'], s['unique_id'], etiqueta)
+    recordar_decision(decisiones.CONFIRMADO, f, s, etiqueta)
+    aplicar_decision('confirmar', f['unique_id'], s['unique_id'], pf, lf)
 
 def rechazar_match(f, s, pf, lf):
-    st.session_state.rejected_pairs[f"{f['unique_id']}|{s['unique_id']}"] = f"{f['Nombre']} ≠ {s['Nombre']}"
-    ejecutar_analisis_completo(pf, lf)
-
-def deshacer_decision(pair_id, tipo, pf, lf):
-    if tipo == 'confirmado': del st.session_state.confirmed_pairs[pair_id]
-    elif tipo == 'rechazado': del st.session_state.rejected_pairs[pair_id]
-    ejecutar_analisis_completo(pf, lf)
+    etiqueta = f"{f['Nombre']} ≠ {s['Nombre']}"
+    st.session_state.rejected_pairs.agregar(f['unique_id'], s['unique_id'], etiqueta)
+    recordar_decision(decisiones.RECHAZADO, f, s, etiqueta)
+    aplicar_decision('rechazar', f['unique_id'], s['unique_id'], pf, lf)
+
+def deshacer_decision(uid_f, uid_s, tipo, pf, lf):
+    if tipo == 'confirmado': st.session_state.confirmed_pairs.quitar(uid_f, uid_s)
+    elif tipo == 'rechazado': st.session_state.rejected_pairs.quitar(uid_f, uid_s)
+    huellas = st.session_state.huellas_decision.pop((uid_f, uid_s), None)
+    if huellas: memoria_decisiones().olvidar(*huellas)
+    aplicar_decision('deshacer_confirmacion' if tipo == 'confirmado' else 'deshacer_rechazo', uid_f, uid_s, pf, lf)
 
 def limpiar_parte_callback(): st.session_state.p_txt = ""; st.session_state.p_key += 1; st.session_state.analisis_listo = False
 def limpiar_lista_callback(): st.session_state.l_txt = ""; st.session_state.l_key += 1; st.session_state.analisis_listo = False
@@ -495,47 +345,175 @@ with col_c2:
         l_file = st.file_uploader("L", type=["xlsx"], key=f"l_file_{st.session_state.l_key}", label_visibility="collapsed")
         with st.expander("O pegar texto"):
             st.session_state.l_txt = st.text_area("L", height=100, key=f"l_txt_{st.session_state.l_key}", value=st.session_state.l_txt, label_visibility="collapsed", placeholder="Pegar Lista...")
+        if l_file is not None and st.session_state.get('info_carga'):
+            info = st.session_state.info_carga
+            st.caption(f"📄 Hoja {info['hoja']}: {info['filas_leidas']} filas leídas en {info['ms']:.0f} ms")
 
 st.markdown("<br>", unsafe_allow_html=True)
 if st.button("🔍 ANALIZAR AHORA", type="primary", use_container_width=True):
-    ejecutar_analisis_completo(p_file, l_file)
+    lanzar_analisis(p_file, l_file)
+if 'trabajo_analisis' in st.session_state:
+    if st.session_state.firma_trabajo != firma_entradas(l_file): cancelar_analisis()  # cambiaron los datos: el resultado ya no sirve
+    elif st.session_state.trabajo_analisis.hecho: publicar_analisis(st.session_state.trabajo_analisis)
+    else: progreso_analisis()
+if st.session_state.analisis_listo: mostrar_duplicados()
 
 # --- SIDEBAR ---
+def panel_tiempos():
+    import pandas as pd
+
+    for clave, titulo in (('tiempos_analisis', "Último análisis"), ('tiempos_descargas', "Última generación de Excel")):
+        crono = st.session_state.get(clave)
+        if crono is None: continue
+        st.caption(f"{titulo}: {crono.ms_total:.0f} ms")
+        st.dataframe(pd.DataFrame(crono.etapas), hide_index=True, use_container_width=True)
+    if st.session_state.get('perfilar_proximo'): st.caption("🧪 El próximo análisis se perfila con cProfile.")
+    else: st.button("🧪 Perfilar próximo análisis", on_click=lambda: st.session_state.update(perfilar_proximo=True), type="secondary")
+    perfil = st.session_state.get('ultimo_perfil')
+    if perfil:
+        with open(perfil['ruta'], 'rb') as f:
+            st.download_button("⬇️ Perfil (.prof)", f.read(), file_name=os.path.basename(perfil['ruta']), mime="application/octet-stream")
+        with st.expander("Resumen cProfile"): st.code(perfil['resumen'], language="text")
+
 with st.sidebar:
     st.header("⚙️ Configuración")
     st.session_state.umbral_det = st.slider("Detective", 50, 90, 65)
     st.session_state.umbral_auto = st.slider("Automático", 80, 100, 95)
+    st.session_state.motor_vectorizado = st.toggle("Motor vectorizado", value=True, help="Desactivar para volver al cálculo fila por fila original.")
+    st.session_state.detective_optimo = st.toggle("Detective 1 a 1", value=True, help="Asignación óptima: cada fila de la LISTA se sugiere a una sola persona del PARTE.")
+    st.session_state.modo_multihoja = st.toggle("Multi-hoja", value=False, help="Concilia el PARTE contra cada hoja con forma de plantel de la LISTA (en paralelo) y descarga un solo libro con todas las hojas corregidas.")
+    st.session_state.indice_fonetico = st.toggle("Índice fonético", value=False, help=f"Cada nombre se puntúa solo contra sus {K_CANDIDATOS} candidatos más parecidos (trigramas + grafía: B/V, LL/Y, S/Z/C, H muda). Mucho más rápido en LISTAS grandes; aproximado (motor vectorizado).")
+    st.session_state.modo_delta = st.toggle("Modo delta", value=False, help="Reutiliza los pares de la corrida anterior de la misma LISTA/hoja y solo puntúa las filas nuevas, editadas o sin pareja (motor vectorizado).")
+    resumen = st.session_state.get('resumen_delta')
+    if resumen and resumen['previa']: st.caption(f"Δ {resumen['reutilizados']} pares reutilizados · {resumen['a_puntuar_parte']} filas de PARTE puntuadas")
+    st.session_state.vista_compacta = st.toggle("Vista compacta", value=True, help="Faltantes en una grilla con casilla Listo y conflictos paginados; desactivar para la vista fila por fila.")
+    st.session_state.motor_excel = st.radio("Motor Excel", ["openpyxl", "xml"], format_func={"openpyxl": "openpyxl (carga completa)", "xml": "XML directo"}.get, disabled=st.session_state.modo_multihoja,
+                                            help="XML directo reescribe solo la hoja LISTA dentro del xlsx; si el libro tiene tablas, comentarios, hipervínculos o fórmulas compartidas vuelve a openpyxl.")
+    if st.session_state.modo_multihoja: st.caption("Multi-hoja exporta siempre con openpyxl (corrige varias hojas del libro).")
+    if st.toggle("Mostrar tiempos", key="ver_tiempos"): panel_tiempos()
+    memoria = memoria_decisiones()
+    if memoria:
+        c1, c2 = st.columns([4, 1], vertical_alignment="center")
+        c1.caption(f"💾 {len(memoria)} decisiones guardadas (se aplican en cada análisis)")
+        if c2.button("🗑", key="olvidar_memoria", help="Olvidar todas las decisiones guardadas"):
+            memoria.olvidar_todo(); st.session_state.huellas_decision = {}
+            if st.session_state.analisis_listo: lanzar_analisis(p_file, l_file)
+            st.rerun()
     st.divider()
     if st.session_state.confirmed_pairs:
         st.caption("Unidos")
-        for pid, lbl in list(st.session_state.confirmed_pairs.items()):
+        for uid_f, uid_s, lbl in st.session_state.confirmed_pairs.pares():
             c1, c2 = st.columns([4,1])
             c1.caption(lbl)
-            if c2.button("↩", key=f"dc_{pid}"): deshacer_decision(pid, 'confirmado', p_file, l_file); st.rerun()
+            if c2.button("↩", key=f"dc_{uid_f}|{uid_s}"): deshacer_decision(uid_f, uid_s, 'confirmado', p_file, l_file); st.rerun()
     if st.session_state.rejected_pairs:
         st.caption("Separados")
-        for pid, lbl in list(st.session_state.rejected_pairs.items()):
+        for uid_f, uid_s, lbl in st.session_state.rejected_pairs.pares():
             c1, c2 = st.columns([4,1])
             c1.caption(lbl)
-            if c2.button("↩", key=f"dr_{pid}"): deshacer_decision(pid, 'rechazado', p_file, l_file); st.rerun()
+            if c2.button("↩", key=f"dr_{uid_f}|{uid_s}"): deshacer_decision(uid_f, uid_s, 'rechazado', p_file, l_file); st.rerun()
 
 # --- RESULTADOS ---
-if st.session_state.analisis_listo:
+CONFLICTOS_POR_PAGINA = 15
+
+def tabla_faltan(final_verde):
+    """Vista compacta: una sola grilla con columna Listo en vez de una fila de widgets por persona."""
+    import pandas as pd
+
+    uids = final_verde['unique_id'].tolist()
+    df = pd.DataFrame({
+        'Listo': [uid in st.session_state.checked_items for uid in uids],
+        'Jerarquía': final_verde['Jerarquia'].astype(str).str.upper().tolist(),
+        'Nombre': final_verde['Nombre'].astype(str).str.upper().tolist(),
+    })
+    # La clave depende de las filas: si la lista cambia, la grilla no arrastra ediciones de otras posiciones
+    clave = "faltan_" + hashlib.sha1("|".join(uids).encode()).hexdigest()[:12]
+    editado = st.data_editor(df, key=clave, hide_index=True, use_container_width=True, height=min(500, 35 * (len(df) + 1) + 3),
+                             disabled=['Jerarquía', 'Nombre'], column_config={'Listo': st.column_config.CheckboxColumn("Listo", width="small")})
+    marcados = {uid for uid, listo in zip(uids, editado['Listo']) if listo}
+    st.session_state.checked_items = (st.session_state.checked_items - set(uids)) | marcados
+    st.caption(f"{len(marcados)} de {len(uids)} cargados")
+
+def paginar_conflictos(candidatos):
+    """Devuelve solo la página vigente de conflictos (con controles ◀ ▶ si hay más de una)."""
+    paginas = max(1, -(-len(candidatos) // CONFLICTOS_POR_PAGINA))
+    pagina = min(st.session_state.get('pagina_conflictos', 0), paginas - 1)
+    st.session_state.pagina_conflictos = pagina
+    if paginas > 1:
+        c1, c2, c3 = st.columns([1, 4, 1], vertical_alignment="center")
+        c1.button("◀", key="pag_ant", disabled=pagina == 0, on_click=lambda: st.session_state.update(pagina_conflictos=pagina - 1))
+        c2.caption(f"Página {pagina + 1} de {paginas} · {len(candidatos)} conflictos")
+        c3.button("▶", key="pag_sig", disabled=pagina == paginas - 1, on_click=lambda: st.session_state.update(pagina_conflictos=pagina + 1))
+    return candidatos[pagina * CONFLICTOS_POR_PAGINA:(pagina + 1) * CONFLICTOS_POR_PAGINA]
+
+def resultados_multihoja(l_file):
+    """Resumen por hoja (solo lectura; los conflictos no se tocan en el Excel) y una sola descarga con todas las hojas corregidas."""
+    import pandas as pd
+    from conciliacion import datos_exportacion
+
+    hojas = st.session_state.resultado_hojas
+    cambios = []
+    st.divider()
+    for tab, (nombre, r) in zip(st.tabs(list(hojas)), hojas.items()):
+        res = r['resultado']
+        verde, rojo, (conflictos_f, conflictos_s) = res.separar()
+        final_verde, final_rojo = res.filas(verde), res.filas(rojo)
+        cambios.append((nombre, *datos_exportacion(final_verde, final_rojo)))
+        with tab:
+            m1, m2, m3, m4, m5 = st.columns(5)
+            with m1: st.metric("Parte", st.session_state.total_parte)
+            with m2: st.metric("Lista", r['total_lista'])
+            with m3: st.metric("Faltan", len(final_verde))
+            with m4: st.metric("Sobran", len(final_rojo))
+            with m5: st.metric("En Duda", len(conflictos_f), delta_color="off")
+            cr1, cr2 = st.columns(2)
+            with cr1:
+                st.markdown("### ✅ Falta Agregar")
+                if final_verde.empty: st.success("Lista Completa.")
+                else: st.dataframe(final_verde[['Jerarquia', 'Nombre']], hide_index=True, use_container_width=True, height=400)
+            with cr2:
+                st.markdown("### ❌ Sobra")
+                if final_rojo.empty: st.success("Limpio.")
+                else: st.dataframe(final_rojo[['Jerarquia', 'Nombre']], hide_index=True, use_container_width=True, height=400)
+            if len(conflictos_f):
+                st.caption("🕵️ **CONFLICTOS DETECTADOS** (quedan sin tocar en el Excel)")
+                st.dataframe(pd.DataFrame({'PARTE': res.filas(conflictos_f)['Nombre'].tolist(), 'LISTA': res.filas(conflictos_s)['Nombre'].tolist()}), hide_index=True, use_container_width=True)
+
+    if l_file is not None:
+        st.markdown("### 📥 ACCIONES Y DESCARGAS")
+        archivo_bytes = l_file.getvalue()
+        with medicion.cronometro('descargas') as crono:
+            xls_clean, xls_full = exportaciones_hojas_memo(hashlib.sha1(archivo_bytes).hexdigest(), tuple(cambios), archivo_bytes)
+        if crono.etapas: st.session_state.tiempos_descargas = crono
+        c1, c2 = st.columns(2)
+        with c1:
+            st.caption(f"Opción A: Solo Borrar Sobrantes ({len(hojas)} hojas)")
+            if xls_clean:
+                st.download_button("🗑️ Solo Borrar", xls_clean, file_name=f"LIMPIO_{l_file.name}", mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", type="secondary", use_container_width=True)
+        with c2:
+            st.caption(f"Opción B: Actualizar Todo ({len(hojas)} hojas)")
+            if xls_full:
+                st.download_button("🔄 Actualizar Todo", xls_full, file_name=f"FINAL_{l_file.name}", mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", type="primary", use_container_width=True)
+
+if st.session_state.analisis_listo and st.session_state.get('resultado_hojas') is not None:
+    resultados_multihoja(l_file)
+elif st.session_state.analisis_listo:
+    from conciliacion import datos_exportacion
+
     st.divider()
     
-    ids_conflict_f = [m['falta']['unique_id'] for m in st.session_state.detective_candidates]
-    ids_conflict_s = [m['sobra']['unique_id'] for m in st.session_state.detective_candidates]
-    final_verde = [f for f in st.session_state.df_faltan if f['unique_id'] not in ids_conflict_f]
-    final_rojo = st.session_state.df_sobran[~st.session_state.df_sobran['unique_id'].isin(ids_conflict_s)]
+    res = st.session_state.resultado
+    verde, rojo, (conflictos_f, conflictos_s) = res.separar(st.session_state.estado_matching)
+    final_verde, final_rojo = res.filas(verde), res.filas(rojo)
 
     # --- ZONA DE ESTADO PROFESIONAL (HUD STYLE + GIF) ---
-    if not final_verde and final_rojo.empty and not st.session_state.detective_candidates:
+    if final_verde.empty and final_rojo.empty and not len(conflictos_f):
         # 1. Popups
         st.toast("VALIDACIÓN EXITOSA: Datos cruzados.", icon="🛡️")
         
         # 2. Leer GIF Local y convertir a Base64 para mostrarlo en HTML
         gif_html = ""
-        gif_b64 = get_img_as_base64("ok.gif") # Busca 'ok.gif' en la raíz
+        gif_b64 = gif_exito_b64("ok.gif") # Busca 'ok.gif' en la raíz (cacheado y en miniatura)
         
         if gif_b64:
             # Si encuentra el gif, muestra la version animada
@@ -560,32 +538,36 @@ if st.session_state.analisis_listo:
         st.markdown("### 📥 ACCIONES Y DESCARGAS")
         st.markdown('<div style="background-color: #111; padding: 15px; border-radius: 8px; border: 1px solid #444; margin-bottom: 25px;">', unsafe_allow_html=True)
         
+        archivo_bytes = l_file.getvalue()
+        borrar, agregar = datos_exportacion(final_verde, final_rojo)
+        with medicion.cronometro('descargas') as crono:
+            xls_clean, xls_full = exportaciones_memo(hashlib.sha1(archivo_bytes).hexdigest(), borrar, agregar, st.session_state.get('motor_excel', 'openpyxl'), archivo_bytes)
+        if crono.etapas: st.session_state.tiempos_descargas = crono  # sin etapas = salió de la caché
+
         c1, c2 = st.columns(2)
         with c1:
             st.caption("Opción A: Solo Borrar Sobrantes")
-            l_file.seek(0)
-            xls_clean = borrar_sobrantes_excel(l_file, final_rojo['Nombre'].tolist())
             if xls_clean:
                 st.download_button("🗑️ Solo Borrar", xls_clean, file_name=f"LIMPIO_{l_file.name}", mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", type="secondary", use_container_width=True)
         
         with c2:
             st.caption("Opción B: Actualizar Todo (Borrar + Agregar)")
-            l_file.seek(0)
-            xls_full = generar_excel_completo(l_file, final_rojo['Nombre'].tolist(), final_verde)
             if xls_full:
                 st.download_button("🔄 Actualizar Todo", xls_full, file_name=f"FINAL_{l_file.name}", mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", type="primary", use_container_width=True)
         
         st.markdown('</div>', unsafe_allow_html=True)
 
-    if st.session_state.detective_candidates:
+    if len(conflictos_f):
         st.markdown("<br>", unsafe_allow_html=True)
         st.caption("🕵️ **CONFLICTOS DETECTADOS**")
         h_det = st.columns([3, 0.3, 3, 1, 1])
         h_det[0].caption("PARTE")
         h_det[2].caption("LISTA")
         
-        for m in st.session_state.detective_candidates:
-            f = m['falta']; s = m['sobra']
+        candidatos = list(zip(conflictos_f, conflictos_s))
+        if st.session_state.get('vista_compacta', True): candidatos = paginar_conflictos(candidatos)
+        for pos_f, pos_s in candidatos:
+            f = res.fila(pos_f); s = res.fila(pos_s)
             cols = st.columns([3, 0.2, 3, 0.6, 0.6], vertical_alignment="center")
             with cols[0]: st.markdown(f'<div class="conflict-container"><div class="c-badge">{f["Jerarquia"]}</div><div class="c-name">{f["Nombre"]}</div></div>', unsafe_allow_html=True)
             with cols[1]: st.markdown('<div class="arrow-icon">↔</div>', unsafe_allow_html=True)
@@ -601,14 +583,15 @@ if st.session_state.analisis_listo:
     cr1, cr2 = st.columns(2)
     with cr1:
         st.markdown("### ✅ Falta Agregar")
-        if not final_verde: st.success("Lista Completa.")
+        if final_verde.empty: st.success("Lista Completa.")
+        elif st.session_state.get('vista_compacta', True): tabla_faltan(final_verde)
         else:
             h = st.columns([2, 4, 1.5])
             h[0].caption("JERARQUÍA")
             h[1].caption("NOMBRE")
             h[2].caption("ACCIÓN")
             st.markdown("<hr style='margin: 0;'>", unsafe_allow_html=True)
-            for p in final_verde:
+            for p in final_verde.to_dict('records'):
                 checked = p['unique_id'] in st.session_state.checked_items
                 r = st.columns([2, 4, 1.5], vertical_alignment="center")
                 with r[0]: st.markdown(f'<div class="unified-text">{str(p["Jerarquia"]).upper()}</div>', unsafe_allow_html=True)
@@ -636,4 +619,7 @@ if st.session_state.analisis_listo:
     with m2: st.metric("Lista", st.session_state.total_lista)
     with m3: st.metric("Faltan", len(final_verde))
     with m4: st.metric("Sobran", len(final_rojo))
-    with m5: st.metric("En Duda", len(st.session_state.detective_candidates), delta_color="off")
+    with m5: st.metric("En Duda", len(conflictos_f), delta_color="off")
+
+# Al final del script: la página ya se dibujó cuando arranca la precarga
+precargar_nucleo()
@@ -0,0 +1,87 @@
+"""Tiempos por etapa y perfil opcional, sin Streamlit.
+
+Las funciones del núcleo marcan sus etapas con `etapa(...)`; solo se mide algo si hay un
+`cronometro(...)` activo en el contexto (en la app, uno por análisis y otro por descarga).
+Cada etapa sale además como una línea JSON en el logger "control.tiempos".
+"""
+import contextvars
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import tempfile
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger("control.tiempos")
+logger.setLevel(logging.INFO)  # independiente del nivel ERROR global de la app
+DIR_PERFILES = os.path.join(tempfile.gettempdir(), "control_psa_perfiles")
+
+_activo = contextvars.ContextVar("cronometro", default=None)
+
+
+class Cronometro:
+    def __init__(self, operacion):
+        self.operacion = operacion
+        self.etapas = []  # [{'etapa', 'ms', ...datos}] en orden de finalización
+        self.ms_total = 0.0
+
+    def registrar(self, nombre, ms, **datos):
+        fila = {'etapa': nombre, 'ms': round(ms, 1), **datos}
+        self.etapas.append(fila)
+        logger.info(json.dumps({'operacion': self.operacion, **fila}, ensure_ascii=False, default=str))
+
+
+@contextmanager
+def cronometro(operacion):
+    """Activa un Cronometro para todo lo que corra dentro del bloque (mismo hilo/contexto)."""
+    crono = Cronometro(operacion); token = _activo.set(crono); t0 = time.perf_counter()
+    try:
+        yield crono
+    finally:
+        _activo.reset(token)
+        crono.ms_total = round((time.perf_counter() - t0) * 1000, 1)
+        logger.info(json.dumps({'operacion': operacion, 'etapa': 'total', 'ms': crono.ms_total}))
+
+
+@contextmanager
+def etapa(nombre, **datos):
+    """Mide el bloque si hay cronómetro activo. El dict que devuelve puede completarse adentro (p. ej. filas)."""
+    crono = _activo.get()
+    if crono is None:
+        yield datos
+        return
+    t0 = time.perf_counter()
+    try:
+        yield datos
+    finally:
+        crono.registrar(nombre, (time.perf_counter() - t0) * 1000, **datos)
+
+
+def registrar(nombre, ms, **datos):
+    """Agrega al cronómetro activo una etapa medida en otro lado (p. ej. en un proceso hijo)."""
+    crono = _activo.get()
+    if crono is not None: crono.registrar(nombre, ms, **datos)
+
+
+@contextmanager
+def perfil(activo, nombre="analisis", lineas=25):
+    """cProfile del bloque si `activo`: deja un .prof en DIR_PERFILES y devuelve {'ruta', 'resumen'} (None si no)."""
+    if not activo:
+        yield None
+        return
+    resultado = {}
+    prof = cProfile.Profile(); prof.enable()
+    try:
+        yield resultado
+    finally:
+        prof.disable()
+        os.makedirs(DIR_PERFILES, exist_ok=True)
+        ruta = os.path.join(DIR_PERFILES, f"{nombre}_{time.strftime('%Y%m%d_%H%M%S')}.prof")
+        prof.dump_stats(ruta)
+        texto = io.StringIO()
+        pstats.Stats(prof, stream=texto).sort_stats('cumulative').print_stats(lineas)
+        resultado.update(ruta=ruta, resumen=texto.getvalue())
+        logger.info(json.dumps({'operacion': nombre, 'etapa': 'perfil', 'ruta': ruta}))
@@ -0,0 +1,278 @@
+"""Motor de matching PARTE ↔ LISTA sin bucles iterrows.
+
+Primero resuelve los nombres idénticos (hash join sobre n_clean) y después
+puntúa solo el resto, bloque por bloque de jerarquía, con matrices de score
+calculadas en lote por rapidfuzz (multi-hilo). Con `candidatos=k` el auto-match
+puntúa cada nombre solo contra los k que propone el índice fonético (indice.py)
+en vez de todo el bloque: deja de ser exacto, a cambio de no crecer con la LISTA.
+"""
+import copy
+import zlib
+from collections import defaultdict
+
+import numpy as np
+from rapidfuzz import fuzz as rf_fuzz, process as rf_process
+from rapidfuzz.distance import OSA
+from thefuzz import utils as fuzz_utils
+
+from indice import IndiceCandidatos, K_CANDIDATOS, nombre_fonetico
+from trabajos import avance
+
+FILAS_POR_LOTE = 256  # filas de PARTE por matriz (acota la memoria en bloques grandes)
+UMBRAL_DUPLICADO = 94  # token_sort_ratio sobre la forma fonética; además cada par pasa por _misma_persona
+
+
+def preparar_claves(nombres):
+    """Mismo preproceso que aplica thefuzz (full_process + force_ascii) antes de puntuar."""
+    return [fuzz_utils.full_process(str(n), force_ascii=True) for n in nombres]
+
+
+def _agrupar(jerarquias):
+    grupos = defaultdict(list)
+    for pos, j in enumerate(jerarquias): grupos[j].append(pos)
+    return grupos
+
+
+def matriz_scores(claves_a, claves_b, scorer=rf_fuzz.token_set_ratio, score_cutoff=None, workers=-1):
+    """Matriz len(a)×len(b) redondeada igual que thefuzz (int(round(score)))."""
+    m = rf_process.cdist(claves_a, claves_b, scorer=scorer, score_cutoff=score_cutoff, dtype=np.float64, workers=workers)
+    return np.rint(m)
+
+
+def matriz_candidatos(nombres_a, claves_a, indice, claves_b, k, scorer=rf_fuzz.token_set_ratio, score_cutoff=None, workers=-1):
+    """Como matriz_scores, pero solo puntúa los pares que el índice (armado sobre b) propone; el resto queda en 0."""
+    m = np.zeros((len(claves_a), len(claves_b)))
+    filas, cols = indice.candidatos(nombres_a, k)
+    if filas.size:
+        m[filas, cols] = rf_process.cpdist([claves_a[i] for i in filas], [claves_b[c] for c in cols], scorer=scorer,
+                                           score_cutoff=score_cutoff, dtype=np.float64, workers=workers)
+    return np.rint(m)
+
+
+def _indexar_unicos(nombres):
+    """Hash join de nombres idénticos: (lista de nombres distintos, posición de cada fila en esa lista)."""
+    unicos = {}
+    inv = np.fromiter((unicos.setdefault(n, len(unicos)) for n in nombres), dtype=np.int64, count=len(nombres))
+    return list(unicos), inv
+
+
+def emparejar_automatico(n_clean_p, j_norm_p, n_clean_l, j_norm_l, umbral_auto, workers=-1, candidatos=0, prohibidos=None):
+    """
+    Devuelve (match_p, usado_l): posición de LISTA asignada a cada fila de PARTE (-1 si no hay)
+    y máscara de filas de LISTA consumidas. Mismo criterio que el bucle original: dentro de la
+    misma jerarquía, cada PARTE toma la primera LISTA libre con token_set_ratio >= umbral_auto
+    (con `candidatos`, la primera entre las que propone el índice del bloque).
+    `prohibidos` ({fila PARTE: {filas LISTA}}): pares rechazados que no se emparejan aunque alcancen el umbral.
+    """
+    n_clean_p = [str(n) for n in n_clean_p]; n_clean_l = [str(n) for n in n_clean_l]
+    match_p = np.full(len(n_clean_p), -1, dtype=np.int64)
+    usado_l = np.zeros(len(n_clean_l), dtype=bool)
+    grupos_l = _agrupar(j_norm_l)
+    cutoff = max(0, umbral_auto - 1)
+    hechas = 0
+
+    for j, pos_p in _agrupar(j_norm_p).items():
+        pos_l = grupos_l.get(j)
+        if not pos_l: continue
+
+        # 1. HASH JOIN: cada nombre distinto se puntúa una sola vez; los idénticos valen 100 sin puntuar
+        unicos_l, inv_l = _indexar_unicos([n_clean_l[k] for k in pos_l])
+        claves_l = preparar_claves(unicos_l)
+        indice = IndiceCandidatos(unicos_l) if candidatos else None
+        exactos = {n: u for u, n in enumerate(unicos_l) if n}
+        pos_l = np.asarray(pos_l)
+        disponible = np.ones(len(pos_l), dtype=bool)
+
+        # 2. RESIDUO: matriz de scores por lotes, asignación en el orden original de PARTE
+        for ini in range(0, len(pos_p), FILAS_POR_LOTE):
+            avance((hechas + ini) / len(n_clean_p))
+            lote = pos_p[ini:ini + FILAS_POR_LOTE]
+            unicos_p, inv_p = _indexar_unicos([n_clean_p[i] for i in lote])
+            if indice is None: ok_u = matriz_scores(preparar_claves(unicos_p), claves_l, score_cutoff=cutoff, workers=workers) >= umbral_auto
+            else: ok_u = matriz_candidatos(unicos_p, preparar_claves(unicos_p), indice, claves_l, candidatos, score_cutoff=cutoff, workers=workers) >= umbral_auto
+            for u, n in enumerate(unicos_p):
+                if n in exactos: ok_u[u, exactos[n]] = True
+            for fila, i in enumerate(lote):
+                libres = ok_u[inv_p[fila], inv_l] & disponible
+                if prohibidos and prohibidos.get(i): libres &= ~np.isin(pos_l, list(prohibidos[i]))
+                k = int(libres.argmax())
+                if libres[k]:
+                    disponible[k] = False
+                    match_p[i] = pos_l[k]; usado_l[pos_l[k]] = True
+            if not disponible.any(): break
+        hechas += len(pos_p)
+    return match_p, usado_l
+
+
+def _palabras_equivalentes(a, b):
+    """Misma palabra salvo un typo (OSA <= 1) que no esté en la terminación: JUAN/JUANA, FRANCISCO/FRANCISCA, DANIEL/DANIELA son otros nombres."""
+    if a == b: return True
+    if OSA.distance(a, b) > 1: return False
+    return a[:-1] != b[:-1] and not a.startswith(b) and not b.startswith(a)
+
+
+def _misma_persona(a, b):
+    """Mismas palabras (en orden o con los apellidos invertidos) con a lo sumo un typo por palabra, nunca en la terminación."""
+    pa, pb = a.split(), b.split()
+    if len(pa) != len(pb): return False
+    return any(all(map(_palabras_equivalentes, x, y)) for x, y in ((pa, pb), (sorted(pa), sorted(pb))))
+
+
+def agrupar_parecidos(n_clean, j_norm, umbral=UMBRAL_DUPLICADO, k=K_CANDIDATOS, workers=-1):
+    """
+    [(jerarquía, [posiciones])] de filas que parecen la misma persona cargada dos veces: dentro de cada
+    jerarquía, nombres idénticos o con token_sort_ratio >= umbral sobre la forma fonética (la grafía no
+    cuenta como diferencia) entre los k candidatos del índice, agrupados por transitividad (componentes
+    conexas). Cada arista pasa además por _misma_persona: mismas palabras salvo un typo por palabra, así
+    PEREZ JUAN y PEREZ JUANA no se unen ni encadenan grupos. Solo grupos de 2 filas o más.
+    """
+    from scipy import sparse
+    from scipy.sparse.csgraph import connected_components
+
+    n_clean = [str(n) for n in n_clean]
+    grupos = []
+    for j, pos in _agrupar(j_norm).items():
+        if len(pos) < 2: continue
+        unicos, inv = _indexar_unicos([n_clean[i] for i in pos])
+        a, b = [], []
+        if len(unicos) > 1:
+            claves = preparar_claves([nombre_fonetico(u) for u in unicos]); indice = IndiceCandidatos(unicos)
+            for ini in range(0, len(unicos), FILAS_POR_LOTE):
+                f, c = indice.candidatos(unicos[ini:ini + FILAS_POR_LOTE], k + 1)  # +1: cada nombre es su propio candidato
+                f = f + ini; distintos = f != c
+                par = np.unique(np.minimum(f, c)[distintos] * len(unicos) + np.maximum(f, c)[distintos])  # cada par una vez
+                if not par.size: continue
+                f, c = par // len(unicos), par % len(unicos)
+                s = np.rint(rf_process.cpdist([claves[i] for i in f], [claves[i] for i in c], scorer=rf_fuzz.token_sort_ratio,
+                                              score_cutoff=max(0, umbral - 1), workers=workers))
+                f, c = f[s >= umbral], c[s >= umbral]
+                misma = np.fromiter((_misma_persona(claves[x], claves[y]) for x, y in zip(f, c)), dtype=bool, count=len(f))
+                a.append(f[misma]); b.append(c[misma])
+        a = np.concatenate(a) if a else np.zeros(0, dtype=np.int64); b = np.concatenate(b) if b else np.zeros(0, dtype=np.int64)
+        _, componente = connected_components(sparse.coo_matrix((np.ones(len(a)), (a, b)), shape=(len(unicos), len(unicos))), directed=False)
+        por_componente = defaultdict(list)
+        for p, comp in zip(pos, componente[inv]): por_componente[comp].append(p)
+        grupos.extend((j, filas) for filas in por_componente.values() if len(filas) > 1)
+    return grupos
+
+
+def _huellas(ids):
+    """Entero estable por unique_id (crc32, igual en todos los procesos) para desempatar."""
+    return np.fromiter((zlib.crc32(str(uid).encode()) for uid in ids), dtype=np.uint64, count=len(ids))
+
+
+def _desempate(huellas_f, huellas_s):
+    """Valor en [0, 1) fijo por par (PARTE, LISTA): no depende de qué otras filas entren al solver."""
+    mezcla = (huellas_f[:, None] * np.uint64(0x9E3779B97F4A7C15)) ^ (huellas_s[None, :] * np.uint64(0xC2B2AE3D27D4EB4F))
+    return (mezcla % np.uint64(1_000_003)).astype(np.float64) / 1_000_003
+
+
+def _asignacion_optima(pesos, desempate=None):
+    """
+    Asignación 1 a 1 de peso máximo sobre una matriz de pesos (0 = sin arista). Devuelve [(fila, col)].
+    Con `desempate` (misma forma, valores en [0, 1)) los empates de peso se resuelven siempre igual: el óptimo
+    de la matriz entera y el de cada componente por separado coinciden.
+    """
+    from scipy.optimize import linear_sum_assignment
+
+    # Solo entran al solver las filas/columnas con algún candidato válido
+    filas = np.flatnonzero(pesos.any(axis=1)); cols = np.flatnonzero(pesos.any(axis=0))
+    if not filas.size: return []
+    sub = pesos[np.ix_(filas, cols)]
+    if desempate is not None:  # la suma de los desempates de una asignación es < 1: nunca pesa más que un punto de score
+        sub = np.where(sub > 0, sub + desempate[np.ix_(filas, cols)] / (min(sub.shape) + 1), 0)
+    r, c = linear_sum_assignment(sub, maximize=True)
+    return sorted((int(filas[a]), int(cols[b])) for a, b in zip(r, c) if sub[a, b] > 0)
+
+
+def _scores_detective(n_clean_f, n_clean_s, umbral_det, workers=-1):
+    if not len(n_clean_f) or not len(n_clean_s): return np.zeros((len(n_clean_f), len(n_clean_s)))
+    return matriz_scores(preparar_claves(n_clean_f), preparar_claves(n_clean_s), scorer=rf_fuzz.token_sort_ratio, score_cutoff=umbral_det, workers=workers)
+
+
+class EstadoMatching:
+    """
+    Resultado mutable de la fase detective. Guarda la matriz F×S una sola vez; confirmar,
+    rechazar o deshacer solo recalcula las filas que competían por las filas tocadas
+    (en modo óptimo, la componente conexa del grafo de candidatos).
+    """
+
+    def __init__(self, ids_f, n_clean_f, ids_s, n_clean_s, umbral_det, umbral_auto, optimo=True, prohibidos=(), workers=-1):
+        self.optimo = optimo
+        self.pos_f = {uid: i for i, uid in enumerate(ids_f)}
+        self.pos_s = {uid: k for k, uid in enumerate(ids_s)}
+        self.huellas_f, self.huellas_s = _huellas(self.pos_f), _huellas(self.pos_s)
+        self.scores = _scores_detective(list(n_clean_f), list(n_clean_s), umbral_det, workers)
+        self.en_banda = (self.scores > umbral_det) & (self.scores < umbral_auto)
+        self.scores.flags.writeable = False; self.en_banda.flags.writeable = False  # compartidas entre copias
+        self.prohibido = np.zeros(self.scores.shape, dtype=bool)
+        self.activo_f = np.ones(len(self.pos_f), dtype=bool)
+        self.activo_s = np.ones(len(self.pos_s), dtype=bool)
+        self.sugerencia = np.full(len(self.pos_f), -1, dtype=np.int64)
+        for uid_f, uid_s in prohibidos:
+            if uid_f in self.pos_f and uid_s in self.pos_s: self.prohibido[self.pos_f[uid_f], self.pos_s[uid_s]] = True
+        self._recalcular(np.arange(len(self.pos_f)))
+
+    def copia(self):
+        """Copia para otra sesión: comparte la matriz de scores (no cambia) y duplica solo lo que mueven las decisiones."""
+        nuevo = copy.copy(self)
+        for attr in ('prohibido', 'activo_f', 'activo_s', 'sugerencia'): setattr(nuevo, attr, getattr(self, attr).copy())
+        return nuevo
+
+    def conoce(self, uid_f, uid_s):
+        return uid_f in self.pos_f and uid_s in self.pos_s
+
+    def sugerencias(self):
+        """[(i_f, i_s)] vigentes, en orden de F."""
+        return [(int(i), int(self.sugerencia[i])) for i in np.flatnonzero(self.sugerencia >= 0)]
+
+    # --- DECISIONES ---
+    def confirmar(self, uid_f, uid_s):
+        i, k = self.pos_f[uid_f], self.pos_s[uid_s]
+        compiten = np.flatnonzero(self.sugerencia == k)
+        libre = self.sugerencia[i]
+        self.activo_f[i] = False; self.activo_s[k] = False; self.sugerencia[i] = -1
+        self._recalcular(compiten[compiten != i], [libre] if libre >= 0 and libre != k else [])
+
+    def rechazar(self, uid_f, uid_s):
+        i, k = self.pos_f[uid_f], self.pos_s[uid_s]
+        self.prohibido[i, k] = True
+        self._recalcular([i], [k])
+
+    def deshacer_confirmacion(self, uid_f, uid_s):
+        i, k = self.pos_f[uid_f], self.pos_s[uid_s]
+        self.activo_f[i] = True; self.activo_s[k] = True
+        self._recalcular([i] + np.flatnonzero(self._validos()[:, k]).tolist(), [k])
+
+    def deshacer_rechazo(self, uid_f, uid_s):
+        i, k = self.pos_f[uid_f], self.pos_s[uid_s]
+        self.prohibido[i, k] = False
+        self._recalcular([i], [k])
+
+    # --- INTERNOS ---
+    def _validos(self):
+        return self.en_banda & ~self.prohibido & self.activo_f[:, None] & self.activo_s[None, :]
+
+    def _recalcular(self, filas, cols=()):
+        v = self._validos()
+        f_mask = np.zeros(len(self.activo_f), dtype=bool); f_mask[np.asarray(filas, dtype=np.int64)] = True
+        if not self.optimo:
+            # Modo clásico: cada fila toma su mejor candidato (el primero ante empates)
+            for i in np.flatnonzero(f_mask):
+                pesos = np.where(v[i], self.scores[i], 0)
+                k = int(pesos.argmax()) if pesos.size else 0
+                self.sugerencia[i] = k if pesos.size and pesos[k] > 0 else -1
+            return
+        # Modo óptimo: se re-resuelve solo la componente conexa que contiene lo tocado
+        c_mask = np.zeros(len(self.activo_s), dtype=bool); c_mask[np.asarray(cols, dtype=np.int64)] = True
+        while True:
+            nuevas_c = c_mask | v[f_mask].any(axis=0)
+            nuevas_f = f_mask | v[:, nuevas_c].any(axis=1)
+            if (nuevas_c == c_mask).all() and (nuevas_f == f_mask).all(): break
+            f_mask, c_mask = nuevas_f, nuevas_c
+        self.sugerencia[f_mask] = -1
+        filas_c = np.flatnonzero(f_mask); cols_c = np.flatnonzero(c_mask)
+        sub = np.ix_(filas_c, cols_c)
+        pesos = np.where(v[sub], self.scores[sub], 0)
+        desempate = _desempate(self.huellas_f[filas_c], self.huellas_s[cols_c])
+        for a, b in _asignacion_optima(pesos, desempate): self.sugerencia[filas_c[a]] = cols_c[b]
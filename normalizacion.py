@@ -0,0 +1,99 @@
+"""Normalización de jerarquías con un único matcher precompilado (se construye una vez por proceso)."""
+import re
+import unicodedata
+from functools import lru_cache
+
+import pandas as pd
+
+EQUIVALENCIAS = {
+    "oficial ayudante": "OFICIAL AYUDANTE", "of ayte": "OFICIAL AYUDANTE", "of. ayte": "OFICIAL AYUDANTE", "ayte": "OFICIAL AYUDANTE",
+    "oficial principal": "OFICIAL PRINCIPAL", "of ppal": "OFICIAL PRINCIPAL", "of. ppal": "OFICIAL PRINCIPAL", "ppal": "OFICIAL PRINCIPAL",
+    "oficial mayor": "OFICIAL MAYOR", "of mayor": "OFICIAL MAYOR", "of. mayor": "OFICIAL MAYOR",
+    "oficial jefe": "OFICIAL JEFE", "of jefe": "OFICIAL JEFE", "of. jefe": "OFICIAL JEFE",
+    "subinspector": "SUBINSPECTOR", "sub inspector": "SUBINSPECTOR", "subinsp": "SUBINSPECTOR",
+    "inspector": "INSPECTOR", "insp": "INSPECTOR",
+    "comisionado mayor": "COMISIONADO MAYOR", "cdo mayor": "COMISIONADO MAYOR", "cdo. mayor": "COMISIONADO MAYOR", "com mayor": "COMISIONADO MAYOR",
+    "comisionado general": "COMISIONADO GENERAL", "cdo general": "COMISIONADO GENERAL", "cdo. general": "COMISIONADO GENERAL", "cdo gral": "COMISIONADO GENERAL",
+    "psa": "PSA", "aux": "AUXILIAR", "auxiliar": "AUXILIAR"
+}
+
+# Alternativas de mayor a menor longitud: ante varias claves en el mismo texto gana la más específica
+_CLAVES = sorted(EQUIVALENCIAS, key=len, reverse=True)
+PATRON_JERARQUIA = re.compile("|".join(map(re.escape, _CLAVES)))
+_PATRON_SOLAPADO = re.compile("(?=(" + PATRON_JERARQUIA.pattern + "))")
+
+
+@lru_cache(maxsize=4096)
+def _resolver(texto_limpio):
+    if texto_limpio in EQUIVALENCIAS: return EQUIVALENCIAS[texto_limpio]
+    claves = [m.group(1) for m in _PATRON_SOLAPADO.finditer(texto_limpio)]
+    if not claves: return ""
+    return EQUIVALENCIAS[max(claves, key=len)]  # la más larga; ante empate, la primera del texto
+
+
+def normalizar_jerarquia(texto):
+    if pd.isna(texto): return ""
+    return _resolver(str(texto).strip().lower())
+
+
+def normalizar_jerarquias(serie):
+    """Versión vectorizada: limpia la columna entera y resuelve cada valor distinto una sola vez."""
+    limpio = serie.where(serie.notna(), "").astype(str).str.strip().str.lower()
+    return limpio.map({v: _resolver(v) for v in limpio.unique()})
+
+
+def abreviar_jerarquia(texto):
+    if pd.isna(texto): return ""
+    t = str(texto).upper()
+    t = t.replace("OFICIAL", "OF")
+    t = t.replace("AYUDANTE", "AYTE")
+    t = t.replace("PRINCIPAL", "PPAL")
+    return t
+
+
+def contiene_jerarquia(texto):
+    """Scorer rápido para detectar la columna de jerarquía (texto ya en minúsculas)."""
+    return PATRON_JERARQUIA.search(texto) is not None
+
+
+# --- NOMBRES ---
+_PARENTESIS = re.compile(r'\([^)]*\)')
+_NO_LETRAS = re.compile(r'[^a-zA-Z\s]')
+
+
+def _sin_marcas(texto):
+    return ''.join(c for c in unicodedata.normalize('NFD', texto) if unicodedata.category(c) != 'Mn')
+
+
+# Tabla de traducción para los acentos de los bloques latinos (equivale a NFD sin marcas);
+# el resto de caracteres no ASCII sigue pasando por unicodedata
+_TABLA_ACENTOS = str.maketrans({chr(c): _sin_marcas(chr(c)) for c in [*range(0xC0, 0x250), *range(0x1E00, 0x1F00)] if _sin_marcas(chr(c)) != chr(c)})
+
+
+def _quitar_acentos(texto):
+    texto = texto.translate(_TABLA_ACENTOS)
+    return texto if texto.isascii() else _sin_marcas(texto)
+
+
+@lru_cache(maxsize=65536)
+def _limpiar_texto(texto):
+    texto = _NO_LETRAS.sub('', _quitar_acentos(_PARENTESIS.sub('', texto)))
+    return texto.strip().upper()
+
+
+def limpiar_nombre(texto):
+    # La caché es solo de str: 1, 1.0 y True son la misma clave para lru_cache pero no el mismo texto
+    if isinstance(texto, str): return _limpiar_texto(texto)
+    if pd.isna(texto): return ""
+    return _limpiar_texto(str(texto))
+
+
+def limpiar_nombres(serie):
+    """Versión vectorizada de limpiar_nombre para una columna entera (mismo resultado byte a byte)."""
+    # El patrón de paréntesis va como texto (puede usar el motor de pyarrow); el de letras va compilado
+    # para conservar la semántica Unicode de \s del módulo re
+    texto = serie.where(serie.notna(), "").astype(str).str.replace(_PARENTESIS.pattern, '', regex=True)
+    texto = texto.str.translate(_TABLA_ACENTOS)
+    no_ascii = ~texto.map(str.isascii).astype(bool)
+    if no_ascii.any(): texto[no_ascii] = texto[no_ascii].map(_sin_marcas)
+    return texto.str.replace(_NO_LETRAS, '', regex=True).str.strip().str.upper()
@@ -0,0 +1,53 @@
+"""Resultado de un análisis en columnas, sin Streamlit.
+
+Una tabla inmutable con las filas de PARTE y de LISTA (solo las columnas que usa la UI) y, encima,
+arrays de posiciones: faltantes, sobrantes y conflictos. La tabla se arma una vez por análisis y la
+comparten los reruns y las sesiones que recibieron el mismo Trabajo; lo único propio de cada sesión
+son las máscaras de su EstadoMatching. Quién está en conflicto se resuelve con un bitmap por posición,
+no recorriendo listas de filas.
+"""
+import numpy as np
+import pandas as pd
+
+COLUMNAS = ['Jerarquia', 'Nombre', 'j_norm', 'n_clean', 'unique_id']
+
+
+def _posiciones(valores, pos):
+    return np.fromiter((pos[v] for v in valores), dtype=np.int64, count=len(valores))
+
+
+class ResultadoAnalisis:
+    """
+    `tabla`: PARTE (posiciones 0..n_parte-1) seguida de LISTA. `base_f`/`base_s`: faltantes y sobrantes
+    que entraron al detective, en el orden de filas/columnas del EstadoMatching. `conflictos`: (f, s) del detective.
+    """
+
+    def __init__(self, df_p, df_l, faltan, sobran, detective):
+        self.n_parte = len(df_p)
+        self.tabla = pd.concat([df_p[COLUMNAS], df_l[COLUMNAS]], ignore_index=True)
+        pos_p = {uid: i for i, uid in enumerate(df_p['unique_id'])}
+        pos_l = {uid: self.n_parte + k for k, uid in enumerate(df_l['unique_id'])}
+        self.base_f = _posiciones([f['unique_id'] for f in faltan], pos_p)
+        self.base_s = _posiciones(sobran['unique_id'].tolist(), pos_l)
+        self.conflictos = (_posiciones([m['falta']['unique_id'] for m in detective], pos_p), _posiciones([m['sobra']['unique_id'] for m in detective], pos_l))
+        for a in (self.base_f, self.base_s, *self.conflictos): a.flags.writeable = False
+
+    def vigente(self, estado=None):
+        """(faltan, sobran, (conflictos_f, conflictos_s)) en posiciones de la tabla, según las decisiones de `estado`."""
+        if estado is None: return self.base_f, self.base_s, self.conflictos
+        pares = np.asarray(estado.sugerencias(), dtype=np.int64).reshape(-1, 2)
+        return self.base_f[estado.activo_f], self.base_s[estado.activo_s], (self.base_f[pares[:, 0]], self.base_s[pares[:, 1]])
+
+    def separar(self, estado=None):
+        """(final_verde, final_rojo, conflictos): faltantes y sobrantes que no están en un conflicto, como posiciones."""
+        faltan, sobran, conflictos = self.vigente(estado)
+        en_conflicto = np.zeros(len(self.tabla), dtype=bool)
+        en_conflicto[conflictos[0]] = True; en_conflicto[conflictos[1]] = True
+        return faltan[~en_conflicto[faltan]], sobran[~en_conflicto[sobran]], conflictos
+
+    def filas(self, posiciones):
+        """DataFrame (vista de trabajo, no se guarda) con las filas de esas posiciones."""
+        return self.tabla.iloc[posiciones]
+
+    def fila(self, posicion):
+        return self.tabla.iloc[int(posicion)]
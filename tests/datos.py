@@ -0,0 +1,10 @@
+"""Planteles sintéticos de bench.generador ya procesados, como los recibe calcular_analisis."""
+from bench.correr import _archivo
+from bench.generador import generar_par, libro_lista
+from conciliacion import procesar_input
+
+
+def planteles(n, semilla=0):
+    """(df_p, df_l): PARTE pegado como texto y LISTA leída desde su xlsx."""
+    texto_parte, personas = generar_par(n, semilla)
+    return procesar_input(texto_parte, None), procesar_input(None, _archivo(libro_lista(personas, semilla=semilla), 'LISTA.xlsx'))
@@ -0,0 +1,61 @@
+"""Almacén de decisiones (SQLite por huella) y su pre-paso en calcular_analisis."""
+import pandas as pd
+import pytest
+
+from conciliacion import calcular_analisis, normalizar
+from decisiones import CONFIRMADO, RECHAZADO, AlmacenDecisiones, huella
+
+
+def _df(*nombres):
+    return normalizar(pd.DataFrame({'Jerarquia': ['OF. AYTE'] * len(nombres), 'Nombre': list(nombres)}))
+
+
+def _huella_fila(df, i=0):
+    return huella(df['j_norm'].iloc[i], df['n_clean'].iloc[i])
+
+
+def test_confirmar_despues_de_rechazar_mueve_el_par(tmp_path):
+    ruta = str(tmp_path / "decisiones.sqlite3")
+    memoria = AlmacenDecisiones(ruta)
+    memoria.guardar(RECHAZADO, "p", "l", "a ≠ b"); memoria.guardar(CONFIRMADO, "p", "l", "a ↔ b")
+    assert memoria.confirmados_de("p") == {"l": "a ↔ b"} and memoria.rechazados_de("p") == {} and len(memoria) == 1
+    recargada = AlmacenDecisiones(ruta)
+    assert recargada.confirmados_de("p") == {"l": "a ↔ b"} and recargada.rechazados_de("p") == {}
+
+
+def test_olvidar_borra_en_memoria_y_en_disco(tmp_path):
+    ruta = str(tmp_path / "decisiones.sqlite3")
+    memoria = AlmacenDecisiones(ruta)
+    memoria.guardar(CONFIRMADO, "p", "l"); memoria.guardar(RECHAZADO, "p", "otra")
+    version = memoria.version
+    memoria.olvidar("p", "l")
+    assert memoria.version > version and memoria.confirmados_de("p") == {} and memoria.rechazados_de("p") == {"otra": ""}
+    recargada = AlmacenDecisiones(ruta)
+    assert len(recargada) == 1 and recargada.rechazados_de("p") == {"otra": ""}
+
+
+def test_instantanea_no_ve_decisiones_posteriores():
+    memoria = AlmacenDecisiones(ruta=None)
+    memoria.guardar(CONFIRMADO, "p", "l")
+    foto = memoria.instantanea()
+    memoria.guardar(RECHAZADO, "p", "l"); memoria.guardar(CONFIRMADO, "q", "m")
+    assert foto.version < memoria.version
+    assert foto.confirmados_de("p") == {"l": ""} and foto.rechazados_de("p") == {} and len(foto) == 1
+
+
+@pytest.mark.parametrize('vectorizado', [True, False], ids=['vectorizado', 'clasico'])
+def test_confirmado_recordado_se_empareja_sin_puntuar(vectorizado):
+    df_p, df_l = _df("PEREZ JUAN"), _df("GOMEZ PEDRO", "SOSA ANA")  # por score no se parecen en nada
+    memoria = AlmacenDecisiones(ruta=None); memoria.guardar(CONFIRMADO, _huella_fila(df_p), _huella_fila(df_l))
+    faltan, sobran, detective, _ = calcular_analisis(df_p, df_l, 65, 95, vectorizado=vectorizado, memoria=memoria.instantanea())
+    assert faltan == [] and detective == []
+    assert sobran.loc[~sobran['found'], 'Nombre'].tolist() == ["SOSA ANA"]
+
+
+@pytest.mark.parametrize('vectorizado', [True, False], ids=['vectorizado', 'clasico'])
+def test_rechazado_recordado_nunca_se_empareja(vectorizado):
+    df_p, df_l = _df("PEREZ JUAN", "SOSA ANA"), _df("PEREZ JUAN", "SOSA ANA")  # mismo nombre: score 100
+    memoria = AlmacenDecisiones(ruta=None); memoria.guardar(RECHAZADO, _huella_fila(df_p), _huella_fila(df_l))
+    faltan, sobran, detective, _ = calcular_analisis(df_p, df_l, 65, 95, vectorizado=vectorizado, memoria=memoria.instantanea())
+    assert [f['Nombre'] for f in faltan] == ["PEREZ JUAN"] and detective == []
+    assert sobran.loc[~sobran['found'], 'Nombre'].tolist() == ["PEREZ JUAN"]
@@ -0,0 +1,51 @@
+"""Modo delta: la segunda corrida reutiliza los pares que no cambiaron y da lo mismo que un análisis completo."""
+import os
+import threading
+
+from conciliacion import calcular_analisis
+from delta import CorridaPrevia
+from tests.datos import planteles
+from tests.test_motor import _resumen
+
+UMBRAL_DET, UMBRAL_AUTO = 65, 95
+
+
+def _editar(df, filas, sufijo):
+    df = df.copy()
+    for i in filas: df.iat[i, df.columns.get_loc('n_clean')] = f"{df['n_clean'].iloc[i]} {sufijo}"
+    return df
+
+
+def _con_delta(df_p, df_l, directorio, **opciones):
+    previa = CorridaPrevia("LISTA.xlsx/LISTA", str(directorio))
+    faltan, sobran, detective, _ = calcular_analisis(df_p, df_l, UMBRAL_DET, UMBRAL_AUTO, **opciones, delta=previa)
+    return _resumen(faltan, sobran, detective), previa.resumen
+
+
+def test_segunda_corrida_reutiliza_y_coincide_con_la_completa(tmp_path):
+    df_p, df_l = planteles(400)
+    _con_delta(df_p, df_l, tmp_path)
+    df_p, df_l = _editar(df_p, [3, 50, 120], "ZAPATA"), _editar(df_l, [7, 200], "IRIGOYEN")
+    resultado, resumen = _con_delta(df_p, df_l, tmp_path)
+    completo = calcular_analisis(df_p, df_l, UMBRAL_DET, UMBRAL_AUTO)
+    assert resumen['reutilizados'] > 0 and resumen['a_puntuar_parte'] < len(df_p)
+    assert resultado == _resumen(*completo[:3])
+
+
+def test_otras_opciones_del_motor_no_reutilizan(tmp_path):
+    df_p, df_l = planteles(200)
+    _con_delta(df_p, df_l, tmp_path)
+    resultado, resumen = _con_delta(df_p, df_l, tmp_path, candidatos=8)
+    assert resumen['previa'] and resumen['reutilizados'] == 0
+    assert resultado == _resumen(*calcular_analisis(df_p, df_l, UMBRAL_DET, UMBRAL_AUTO, candidatos=8)[:3])
+    assert _con_delta(df_p, df_l, tmp_path, candidatos=8)[1]['reutilizados'] > 0
+
+
+def test_guardados_concurrentes_no_se_pisan(tmp_path):
+    df_p, df_l = planteles(100)
+    corridas = [CorridaPrevia("LISTA.xlsx/LISTA", str(tmp_path)) for _ in range(8)]
+    hilos = [threading.Thread(target=c.guardar, args=(df_p, df_l, list(range(len(df_p))), {'umbral_auto': k})) for k, c in enumerate(corridas)]
+    for h in hilos: h.start()
+    for h in hilos: h.join()
+    assert os.listdir(tmp_path) == [os.path.basename(corridas[0].ruta)]
+    assert CorridaPrevia("LISTA.xlsx/LISTA", str(tmp_path))._previa['motor'] in [{'umbral_auto': k} for k in range(8)]
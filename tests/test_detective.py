@@ -0,0 +1,48 @@
+"""Detective 1 a 1 (detective_optimo=True): asignación de peso máximo, cada fila en un solo par, siempre dentro de la banda."""
+import numpy as np
+import pytest
+from thefuzz import fuzz
+
+from conciliacion import calcular_analisis
+from motor import _asignacion_optima
+from tests.datos import planteles
+
+
+def _goloso(pesos):
+    """1 a 1 tomando siempre la arista más pesada que queda libre."""
+    usadas_f, usadas_s, pares = set(), set(), []
+    for i, k in sorted(zip(*np.nonzero(pesos)), key=lambda p: -pesos[p]):
+        if i in usadas_f or k in usadas_s: continue
+        usadas_f.add(i); usadas_s.add(k); pares.append((int(i), int(k)))
+    return pares
+
+
+def _total(pesos, pares):
+    return sum(pesos[i, k] for i, k in pares)
+
+
+def test_optimo_gana_al_goloso_donde_este_se_equivoca():
+    pesos = np.array([[90, 85], [88, 0]])
+    assert _total(pesos, _goloso(pesos)) == 90
+    assert sorted(_asignacion_optima(pesos)) == [(0, 1), (1, 0)]
+
+
+@pytest.mark.parametrize('semilla', range(20))
+def test_optimo_uno_a_uno_y_nunca_peor_que_el_goloso(semilla):
+    r = np.random.default_rng(semilla)
+    pesos = np.where(r.random((12, 9)) < 0.35, r.integers(66, 95, (12, 9)), 0)
+    pares = _asignacion_optima(pesos)
+    assert len({i for i, _ in pares}) == len(pares) == len({k for _, k in pares})
+    assert all(pesos[i, k] > 0 for i, k in pares)
+    assert _total(pesos, pares) >= _total(pesos, _goloso(pesos))
+
+
+@pytest.mark.parametrize('umbral_det,umbral_auto', [(65, 95), (80, 95)])
+def test_sugerencias_del_analisis(umbral_det, umbral_auto):
+    df_p, df_l = planteles(800)
+    _, _, detective, _ = calcular_analisis(df_p, df_l, umbral_det, umbral_auto, detective_optimo=True)
+    assert detective
+    faltan = [m['falta']['unique_id'] for m in detective]; sobran = [m['sobra']['unique_id'] for m in detective]
+    assert len(set(faltan)) == len(faltan) and len(set(sobran)) == len(sobran)
+    for m in detective:
+        assert umbral_det < fuzz.token_sort_ratio(m['falta']['n_clean'], m['sobra']['n_clean']) < umbral_auto
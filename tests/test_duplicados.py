@@ -0,0 +1,34 @@
+"""detectar_duplicados: la misma persona cargada dos veces sí, otro nombre de pila no."""
+import pandas as pd
+import pytest
+
+from conciliacion import detectar_duplicados, normalizar
+
+
+def _grupos(*nombres):
+    df = normalizar(pd.DataFrame({'Jerarquia': ['OF. AYTE'] * len(nombres), 'Nombre': list(nombres)}))
+    return [sorted(g['nombres']) for g in detectar_duplicados(df)]
+
+
+@pytest.mark.parametrize('nombres', [
+    ('GONZALES PERES JUAN', 'GONZÁLEZ PÉREZ JUAN', 'PEREZ GONZALEZ JUAN', 'GONSALES PEREZ JUAN'),  # grafía y apellidos invertidos
+    ('BILLALBA LUIS', 'VILLALVA LUIS'),
+    ('MARTINEZ GOMEZ CARLOS ALBERTO', 'MARTNIEZ GOMEZ CARLOS ALBERTO'),  # typo
+    ('ROMERO PEDRO', 'ROMERO PEDRO'),
+])
+def test_misma_persona(nombres):
+    assert _grupos(*nombres) == [sorted(nombres)]
+
+
+@pytest.mark.parametrize('nombres', [
+    ('PEREZ JUAN', 'PEREZ JUANA'),
+    ('SOSA FRANCISCO', 'SOSA FRANCISCA'), ('ROMERO ACUNA FRANCISCO JAVIER', 'ROMERO ACUNA FRANCISCA JAVIER'),
+    ('LOPEZ DANIEL', 'LOPEZ DANIELA'),
+    ('PEREZ GOMEZ JUAN', 'PEREZ GOMEZ JUAN CARLOS'),  # nombre contenido en otro
+])
+def test_otro_nombre_de_pila(nombres):
+    assert _grupos(*nombres) == []
+
+
+def test_sin_cadenas_transitivas():
+    assert _grupos('PEREZ JUAN', 'PEREZ JUANA', 'PEREZ JUANA', 'PERES JUAN') == [['PERES JUAN', 'PEREZ JUAN'], ['PEREZ JUANA', 'PEREZ JUANA']]
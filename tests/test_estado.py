@@ -0,0 +1,71 @@
+"""EstadoMatching incremental: tras confirmar, rechazar o deshacer sugiere lo mismo que un análisis completo con esas decisiones."""
+import random
+
+import pytest
+
+from conciliacion import calcular_analisis
+from decisiones import IndiceDecisiones
+from motor import EstadoMatching
+from tests.datos import planteles
+
+UMBRAL_DET, UMBRAL_AUTO = 65, 95
+# Pocos nombres repetidos en muchas filas: casi todos los scores empatan con otro
+NOMBRES_F = ["PEREZ JUAN", "PERES JUAN CARLOS", "GOMEZ ANA", "GOMES ANA MARIA", "SOSA LUIS", "SOSA LUISA", "DIAZ PEDRO", "DIAS PEDRO JOSE"]
+NOMBRES_S = ["PEREZ JUAN C", "PERES JUAN", "GOMEZ ANA M", "GOMES ANNA", "SOSA LUIS A", "SOZA LUISA", "DIAZ PEDRO J", "DIAS PEDRO"]
+
+
+def _sugeridos(estado):
+    ids_f, ids_s = list(estado.pos_f), list(estado.pos_s)
+    return {(ids_f[i], ids_s[k]) for i, k in estado.sugerencias()}
+
+
+def _repetir_decisiones(estado, completo, semilla, pasos=25):
+    """Confirma, rechaza y deshace al azar sobre `estado`; después de cada paso compara con completo(confirmados, rechazados)."""
+    r = random.Random(semilla)
+    confirmados, rechazados, hechas = IndiceDecisiones(), IndiceDecisiones(), []
+    for _ in range(pasos):
+        sugeridos = sorted(_sugeridos(estado))
+        if hechas and (r.random() < 0.3 or not sugeridos):
+            tipo, (uid_f, uid_s) = hechas.pop(r.randrange(len(hechas)))
+            if tipo == 'confirmar': confirmados.quitar(uid_f, uid_s); estado.deshacer_confirmacion(uid_f, uid_s)
+            else: rechazados.quitar(uid_f, uid_s); estado.deshacer_rechazo(uid_f, uid_s)
+        elif sugeridos:
+            par = r.choice(sugeridos); tipo = r.choice(['confirmar', 'rechazar'])
+            (confirmados if tipo == 'confirmar' else rechazados).agregar(*par)
+            getattr(estado, tipo)(*par); hechas.append((tipo, par))
+        assert _sugeridos(estado) == completo(confirmados, rechazados)
+
+
+@pytest.fixture(scope='module')
+def datos():
+    return planteles(600)
+
+
+@pytest.mark.parametrize('optimo', [True, False], ids=['optimo', 'clasico'])
+@pytest.mark.parametrize('semilla', range(3))
+def test_incremental_igual_al_analisis_completo(datos, optimo, semilla):
+    df_p, df_l = datos
+
+    def completo(confirmados, rechazados):
+        _, _, detective, _ = calcular_analisis(df_p, df_l, UMBRAL_DET, UMBRAL_AUTO, detective_optimo=optimo, confirmados=confirmados, rechazados=rechazados)
+        return {(m['falta']['unique_id'], m['sobra']['unique_id']) for m in detective}
+
+    _, _, _, estado = calcular_analisis(df_p, df_l, UMBRAL_DET, UMBRAL_AUTO, detective_optimo=optimo)
+    _repetir_decisiones(estado, completo, semilla)
+
+
+@pytest.mark.parametrize('optimo', [True, False], ids=['optimo', 'clasico'])
+@pytest.mark.parametrize('semilla', range(10))
+def test_incremental_igual_al_completo_con_empates(optimo, semilla):
+    r = random.Random(semilla)
+    faltan = [(f"f{i}", r.choice(NOMBRES_F)) for i in range(14)]; sobran = [(f"s{i}", r.choice(NOMBRES_S)) for i in range(14)]
+
+    def estado_nuevo(confirmados=None, rechazados=None):
+        # Como el análisis completo: los pares confirmados ya no llegan al detective y los rechazados entran prohibidos
+        confirmados, rechazados = confirmados or IndiceDecisiones(), rechazados or IndiceDecisiones()
+        usados = {uid for uid_f, uid_s, _ in confirmados.pares() for uid in (uid_f, uid_s)}
+        f = [(u, n) for u, n in faltan if u not in usados]; s = [(u, n) for u, n in sobran if u not in usados]
+        return EstadoMatching([u for u, _ in f], [n for _, n in f], [u for u, _ in s], [n for _, n in s], 60, UMBRAL_AUTO, optimo,
+                              [(uid_f, uid_s) for uid_f, uid_s, _ in rechazados.pares()])
+
+    _repetir_decisiones(estado_nuevo(), lambda c, rr: _sugeridos(estado_nuevo(c, rr)), semilla, pasos=15)
@@ -0,0 +1,99 @@
+"""Helpers de excel_salida contra las versiones previas (recorrido lineal de merges, copia de estilos atributo por atributo)."""
+from copy import copy
+
+import openpyxl
+from openpyxl.cell.cell import MergedCell
+from openpyxl.styles import Alignment, Border, Font, PatternFill, Side
+from openpyxl.utils import get_column_letter, range_boundaries
+from openpyxl.worksheet.cell_range import MultiCellRange
+
+from excel_salida import ATRIBUTOS_ESTILO, IndiceMerges, aplicar_estilo, plantilla_estilos_fila
+
+FILAS, COLUMNAS = 20, 10
+MERGES = ["C3:D3", "A5:A8", "F10:H12", "B9:B10", "C11:D11", "E9:E13", "G2:I4", "J14:J18", "A15:C15"]
+
+
+def _ancla_lineal(ws, row, col):
+    """Lo que hacía _merge_anchor antes del índice: recorre todos los rangos."""
+    for rng in ws.merged_cells.ranges:
+        if rng.min_row <= row <= rng.max_row and rng.min_col <= col <= rng.max_col: return rng.min_row, rng.min_col
+    return row, col
+
+
+def _desplazar_merges_lineal(ws, fila_insercion, cantidad):
+    """desplazar_merges_por_insercion previo: vacía los merges y los vuelve a combinar todos."""
+    viejos = [str(rng) for rng in ws.merged_cells.ranges]
+    ws.merged_cells = MultiCellRange()
+    for r in viejos:
+        min_col, min_row, max_col, max_row = range_boundaries(r)
+        if max_row < fila_insercion: nuevo = r
+        elif min_row >= fila_insercion: nuevo = f"{get_column_letter(min_col)}{min_row + cantidad}:{get_column_letter(max_col)}{max_row + cantidad}"
+        else: nuevo = f"{get_column_letter(min_col)}{min_row}:{get_column_letter(max_col)}{max_row + cantidad}"
+        ws.merge_cells(nuevo)
+
+
+def _hoja():
+    wb = openpyxl.Workbook(); ws = wb.active
+    for r in range(1, FILAS + 1):
+        for c in range(1, COLUMNAS + 1): ws.cell(r, c, f"{r},{c}")
+    for m in MERGES: ws.merge_cells(m)
+    return ws
+
+
+def _forma(ws, filas):
+    return (sorted(str(r) for r in ws.merged_cells.ranges),
+            [[isinstance(ws.cell(r, c), MergedCell) for c in range(1, COLUMNAS + 1)] for r in range(1, filas + 1)])
+
+
+def test_ancla_igual_al_recorrido_lineal():
+    ws = _hoja(); indice = IndiceMerges(ws)
+    for r in range(1, FILAS + 1):
+        for c in range(1, COLUMNAS + 1): assert indice.ancla(r, c) == _ancla_lineal(ws, r, c)
+
+
+def test_insercion_igual_a_recombinar_todo():
+    # 11: justo debajo de B9:B10, en el borde superior de C11:D11 y en medio de E9:E13 y F10:H12
+    for fila, cantidad in [(11, 3), (9, 1), (2, 2), (19, 4)]:
+        con_indice, lineal = _hoja(), _hoja()
+        indice = IndiceMerges(con_indice)
+        con_indice.insert_rows(fila, amount=cantidad); indice.insertar_filas(fila, cantidad)
+        lineal.insert_rows(fila, amount=cantidad); _desplazar_merges_lineal(lineal, fila, cantidad)
+        assert _forma(con_indice, FILAS + cantidad) == _forma(lineal, FILAS + cantidad)
+        for r in range(1, FILAS + cantidad + 1):
+            for c in range(1, COLUMNAS + 1): assert indice.ancla(r, c) == _ancla_lineal(lineal, r, c)
+
+
+class _SoloApiPublica:
+    """Hoja sin los internos de openpyxl (_cells): fuerza el camino público de plantilla_estilos_fila."""
+
+    def __init__(self, ws): self.ws = ws
+    def __getitem__(self, fila): return self.ws[fila]
+
+
+def _fila_modelo():
+    wb = openpyxl.Workbook(); ws = wb.active
+    fino = Side(style="thin")
+    estilos = [dict(font=Font(name="Arial", size=10, bold=True, color="FF0000FF"), fill=PatternFill(fill_type="solid", fgColor="FFD9D9D9")),
+               dict(border=Border(left=fino, right=fino, top=fino, bottom=fino), number_format="0.00"),
+               dict(alignment=Alignment(horizontal="left", vertical="center", wrap_text=True), font=Font(italic=True)),
+               {}]
+    for col, estilo in enumerate(estilos, start=1):
+        c = ws.cell(5, col, f"m{col}")
+        for a, v in estilo.items(): setattr(c, a, v)
+    ws.cell(5, 7).fill = PatternFill(fill_type="solid", fgColor="FFFFFF00")  # con una celda vacía en el medio
+    return ws
+
+
+def _estilos(ws, fila):
+    return [tuple(repr(getattr(ws.cell(fila, col), a)) for a in ATRIBUTOS_ESTILO) for col in range(1, 9)]
+
+
+def test_plantilla_igual_a_copiar_atributos():
+    ws = _fila_modelo()
+    for col in range(1, 9):  # camino previo: copy() de cada atributo público
+        origen, destino = ws.cell(5, col), ws.cell(6, col)
+        if origen.has_style:
+            for a in ATRIBUTOS_ESTILO: setattr(destino, a, copy(getattr(origen, a)))
+    for fila, hoja in ((7, ws), (8, _SoloApiPublica(ws))):
+        for col, estilo in plantilla_estilos_fila(hoja, 5): aplicar_estilo(ws.cell(fila, col), estilo)
+        assert _estilos(ws, fila) == _estilos(ws, 6)
@@ -0,0 +1,90 @@
+"""El parcheo directo del XML (excel_xml) produce el mismo libro que el motor openpyxl, o cede ante lo que no sabe correr."""
+import re
+import zipfile
+from io import BytesIO
+
+import openpyxl
+import pytest
+from openpyxl.worksheet.formula import ArrayFormula
+
+import excel_xml
+from bench.generador import generar_par, libro_lista
+from excel_salida import generar_exportaciones
+
+HOJA = 'xl/worksheets/sheet1.xml'
+
+
+def _libro(formulas=None):
+    """LISTA sintética (ARRIBO A2 en la fila 21, filas hasta la 33) con `formulas(hoja_xml)` aplicado sobre el XML de la hoja."""
+    _, personas = generar_par(30, 0)
+    datos = libro_lista(personas)
+    if formulas is None: return datos
+    salida = BytesIO()
+    with zipfile.ZipFile(BytesIO(datos)) as origen, zipfile.ZipFile(salida, 'w', zipfile.ZIP_DEFLATED) as destino:
+        for info in origen.infolist():
+            contenido = origen.read(info)
+            destino.writestr(info, formulas(contenido.decode('utf-8')).encode('utf-8') if info.filename == HOJA else contenido)
+    return salida.getvalue()
+
+
+def _con_celdas(celdas):
+    """Agrega al final de cada fila las celdas G{fila} dadas como {fila: xml interior de la celda}."""
+    def aplicar(hoja):
+        return re.sub(r'(<row\b[^>]*\br="(\d+)"[^>]*>)(.*?)(</row>)',
+                      lambda m: m.group(1) + m.group(3) + (f'<c r="G{m.group(2)}">{celdas[int(m.group(2))]}</c>' if int(m.group(2)) in celdas else '') + m.group(4),
+                      hoja, flags=re.S)
+    return aplicar
+
+
+FORMULAS_SIMPLES = _con_celdas({r: f'<f>A{r}*2</f>' for r in range(25, 30)})
+FORMULAS_COMPARTIDAS = _con_celdas({25: '<f t="shared" ref="G25:G29" si="0">A25*2</f>', **{r: '<f t="shared" si="0"/>' for r in range(26, 30)}})
+FORMULA_MATRICIAL = _con_celdas({25: '<f t="array" ref="G25:G26">A25:A26*2</f>'})
+
+
+def _valor(v):
+    return ('array', v.ref, v.text) if isinstance(v, ArrayFormula) else v
+
+
+def _resumen(datos):
+    """Lo que el operador ve del libro: valores y fórmulas, celdas pintadas de rojo, merges y altos de fila."""
+    wb = openpyxl.load_workbook(BytesIO(datos))
+    ws = wb['LISTA']
+    celdas = {(c.row, c.column): (_valor(c.value), c.fill.fgColor.rgb if c.fill.fill_type == 'solid' else None)
+              for fila in ws.iter_rows() for c in fila if c.value is not None or c.fill.fill_type}
+    altos = {r: d.height for r, d in ws.row_dimensions.items() if d.height}
+    return celdas, sorted(str(m) for m in ws.merged_cells.ranges), altos
+
+
+def _refs_de_formulas_coherentes(datos):
+    """Cada fórmula con rango (compartida, matricial) arranca en su propia celda: Excel rechaza el libro si no."""
+    with zipfile.ZipFile(BytesIO(datos)) as z:
+        hoja = z.read(HOJA).decode('utf-8')
+    for celda, ref in re.findall(r'<c\b[^>]*\br="([A-Z]+\d+)"[^>]*>\s*<f\b[^>]*\bref="([^"]+)"', hoja):
+        if ref.split(':')[0] != celda: return False
+    return True
+
+
+def _exportar(datos, motor_excel):
+    _, personas = generar_par(30, 0)
+    borrar = [personas[0][1], personas[5][1]]
+    agregar = [{'Jerarquia': 'CABO', 'Nombre': 'PEREZ JUAN'}, {'Jerarquia': 'SARGENTO', 'Nombre': 'SOSA ANA'}]
+    avisos = []
+    limpio, final = generar_exportaciones(BytesIO(datos), borrar, agregar, motor_excel=motor_excel, avisar=avisos.append)
+    assert not avisos
+    return limpio, final
+
+
+@pytest.mark.parametrize('formulas', [None, FORMULAS_SIMPLES, FORMULAS_COMPARTIDAS, FORMULA_MATRICIAL], ids=['sin_formulas', 'simples', 'compartidas', 'matricial'])
+def test_xml_igual_a_openpyxl(formulas):
+    datos = _libro(formulas)
+    for con_xml, con_openpyxl in zip(_exportar(datos, 'xml'), _exportar(datos, 'openpyxl')):
+        assert _refs_de_formulas_coherentes(con_xml)
+        assert _resumen(con_xml) == _resumen(con_openpyxl)
+
+
+@pytest.mark.parametrize('formulas', [FORMULAS_COMPARTIDAS, FORMULA_MATRICIAL], ids=['compartidas', 'matricial'])
+def test_formulas_con_rango_no_se_corren(formulas):
+    libro = excel_xml.LibroXml(_libro(formulas))
+    assert libro.exportar(['NADIE']) is not None  # sin inserción no se corre nada
+    with pytest.raises(excel_xml.FormatoNoSoportado):
+        libro.exportar([], [{'Jerarquia': 'CABO', 'Nombre': 'PEREZ JUAN'}])
@@ -0,0 +1,19 @@
+"""El motor vectorizado da el mismo resultado que el clásico fila por fila (thefuzz + iterrows)."""
+import pytest
+
+from conciliacion import calcular_analisis
+from tests.datos import planteles
+
+
+def _resumen(faltan, sobran, detective):
+    return ({f['unique_id'] for f in faltan}, set(sobran.loc[~sobran['found'], 'unique_id']),
+            {(m['falta']['unique_id'], m['sobra']['unique_id']) for m in detective})
+
+
+@pytest.mark.parametrize('n', [300, 800])
+@pytest.mark.parametrize('umbral_det,umbral_auto', [(65, 95), (75, 90), (55, 100)])
+def test_vectorizado_igual_al_clasico(n, umbral_det, umbral_auto):
+    df_p, df_l = planteles(n)
+    vectorizado = calcular_analisis(df_p, df_l, umbral_det, umbral_auto, vectorizado=True, detective_optimo=False)
+    clasico = calcular_analisis(df_p, df_l, umbral_det, umbral_auto, vectorizado=False, detective_optimo=False)
+    assert _resumen(*vectorizado[:3]) == _resumen(*clasico[:3])
@@ -0,0 +1,18 @@
+"""limpiar_nombres (columna entera) da lo mismo que limpiar_nombre fila por fila."""
+import numpy as np
+import pandas as pd
+
+from normalizacion import limpiar_nombre, limpiar_nombres
+
+VALORES = ["González Pérez, Juan", "MUÑOZ  peña", "  Ibáñez   (franco) José  ", "O'Connor-Díaz", "Núñez\tRocío", "Agüero Ç ø ß Ł",
+           "Đặng Thị", "Ｆｕｌｌ width", "", "   ", "(solo nota)", None, np.nan, 1, 1.0, True, 2.5, "Pérez 2º", "ÀÉÎÕÜ àéîõü", "Ñandú"]
+
+
+def test_vectorizado_igual_fila_por_fila():
+    serie = pd.Series(VALORES, dtype=object)
+    assert limpiar_nombres(serie).tolist() == [limpiar_nombre(v) for v in VALORES]
+
+
+def test_cache_distingue_tipos():
+    assert limpiar_nombre(1) == "" and limpiar_nombre(True) == "TRUE"
+    assert limpiar_nombre(True) == "TRUE" and limpiar_nombre(1) == ""
@@ -0,0 +1,138 @@
+"""Análisis en segundo plano, sin Streamlit.
+
+Un Ejecutor por proceso (en la app, vía st.cache_resource) con un pool de hilos compartido por
+todas las sesiones. Cada envío devuelve un Trabajo con progreso y cancelación; dos sesiones que
+envían exactamente lo mismo mientras el primero sigue en curso comparten el mismo Trabajo.
+
+El progreso lo alimentan las funciones del núcleo con `tramo(...)` / `avance(...)`, que no
+hacen nada fuera de un Trabajo; `avance` es además el punto donde se corta un trabajo cancelado.
+"""
+import contextvars
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import CancelledError, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+
+# rapidfuzz ya reparte cada matriz entre todos los núcleos: pocos análisis simultáneos alcanzan
+HILOS = int(os.environ.get("CONTROL_PSA_HILOS_ANALISIS", 0)) or max(1, min(4, (os.cpu_count() or 2) // 2))
+PROCESOS = int(os.environ.get("CONTROL_PSA_PROCESOS_HOJAS", 0)) or (os.cpu_count() or 1)
+
+_trabajo = contextvars.ContextVar("trabajo", default=None)
+_tramo = contextvars.ContextVar("tramo", default=(0.0, 1.0))
+
+
+class Cancelado(Exception):
+    """El trabajo se canceló mientras corría."""
+
+
+class Trabajo:
+    def __init__(self, clave):
+        self.clave = clave
+        self.futuro = None
+        self.progreso = 0.0
+        self.texto = "En cola"
+        self.referencias = 1  # sesiones esperando este resultado
+        self._cancelar = threading.Event()
+
+    @property
+    def cancelado(self):
+        return self._cancelar.is_set()
+
+    @property
+    def hecho(self):
+        return self.futuro is not None and self.futuro.done()
+
+    def resultado(self):
+        """Resultado de la función; Cancelado si se canceló (en cola o corriendo)."""
+        try:
+            return self.futuro.result()
+        except CancelledError:
+            raise Cancelado() from None
+
+
+class Ejecutor:
+    def __init__(self, hilos=HILOS):
+        self._pool = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix="analisis")
+        self._activos = {}  # clave -> Trabajo en cola o corriendo
+        self._lock = threading.Lock()
+
+    def enviar(self, clave, funcion, *args, **kwargs):
+        """Encola funcion(*args, **kwargs); si ya hay un Trabajo vivo con la misma clave, devuelve ese."""
+        with self._lock:
+            trabajo = self._activos.get(clave)
+            if trabajo is not None and not trabajo.cancelado:
+                trabajo.referencias += 1
+                return trabajo
+            trabajo = Trabajo(clave); self._activos[clave] = trabajo
+            trabajo.futuro = self._pool.submit(self._correr, trabajo, funcion, args, kwargs)
+        trabajo.futuro.add_done_callback(lambda _: self._soltar(trabajo))
+        return trabajo
+
+    def cancelar(self, trabajo):
+        """Deja de esperar el Trabajo; se corta recién cuando ninguna sesión lo espera."""
+        with self._lock:
+            trabajo.referencias -= 1
+            if trabajo.referencias > 0: return
+            trabajo._cancelar.set()
+            trabajo.futuro.cancel()  # si todavía no empezó, no llega a correr
+            if self._activos.get(trabajo.clave) is trabajo: del self._activos[trabajo.clave]
+
+    def _soltar(self, trabajo):
+        with self._lock:
+            if self._activos.get(trabajo.clave) is trabajo: del self._activos[trabajo.clave]
+
+    @staticmethod
+    def _correr(trabajo, funcion, args, kwargs):
+        token = _trabajo.set(trabajo)
+        try:
+            avance(0.0)
+            return funcion(*args, **kwargs)
+        except Cancelado:
+            raise
+        except Exception:
+            logging.exception(f"Análisis {trabajo.clave[:12]} falló")
+            raise
+        finally:
+            _trabajo.reset(token)
+
+
+_pool_procesos = None
+_lock_pool = threading.Lock()
+
+
+def pool_procesos():
+    """ProcessPoolExecutor compartido para repartir hojas entre núcleos (spawn: el proceso de la app tiene hilos)."""
+    global _pool_procesos
+    with _lock_pool:
+        if _pool_procesos is None:
+            _pool_procesos = ProcessPoolExecutor(max_workers=PROCESOS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool_procesos
+
+
+@contextmanager
+def tramo(desde, hasta, texto):
+    """El bloque ocupa [desde, hasta] del tramo que lo contiene (o de la barra); los avance() de adentro son relativos a él."""
+    trabajo = _trabajo.get()
+    if trabajo is None:
+        yield
+        return
+    d, h = _tramo.get()
+    desde, hasta = d + (h - d) * desde, d + (h - d) * hasta
+    token = _tramo.set((desde, hasta)); trabajo.texto = texto
+    try:
+        avance(0.0)
+        yield
+    finally:
+        _tramo.reset(token)
+    trabajo.progreso = max(trabajo.progreso, hasta)
+
+
+def avance(fraccion):
+    """Informa la fracción hecha del tramo actual. Si el trabajo fue cancelado, corta con Cancelado."""
+    trabajo = _trabajo.get()
+    if trabajo is None: return
+    if trabajo.cancelado: raise Cancelado()
+    desde, hasta = _tramo.get()
+    trabajo.progreso = max(trabajo.progreso, desde + (hasta - desde) * min(1.0, fraccion))